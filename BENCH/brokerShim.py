@@ -0,0 +1,160 @@
+# *********************************************************************
+# Minimal MQTT (3.1.1) broker used by the benchmark of CityAlarm
+# It accepts the EPU (and EACs), acknowledges EA published with QoS 1,
+# forwards them to subscribers (QoS 0) and gives each publication to an
+# in-process callback, so the benchmark receives the EA without a client
+# Sessions, retained messages and QoS 2 are not supported
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import asyncio
+import struct
+
+########################################################
+
+## Types of MQTT control packets
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+########################################################
+
+def encodeLength(n):
+    data = b""
+    while True:
+        byte = n % 128
+        n = n // 128
+        if n > 0:
+            byte = byte | 0x80
+        data = data + bytes((byte,))
+        if n == 0:
+            return data
+
+def encodePacket(kind, flags, body):
+    return bytes(((kind << 4) | flags,)) + encodeLength(len(body)) + body
+
+def encodeString(s):
+    return struct.pack(">H", len(s)) + s
+
+## MQTT topic filters, with the wildcards + and #
+def topicMatches(pattern, topic):
+    p = pattern.split("/")
+    t = topic.split("/")
+    for i, level in enumerate(p):
+        if level == "#":
+            return True
+        if i >= len(t) or (level != "+" and level != t[i]):
+            return False
+    return len(p) == len(t)
+
+########################################################
+
+class brokerShim():
+    ## onPublish(topic, payload) is called for every received publication
+    def __init__(self, port=1883, onPublish=None):
+        self.port = port
+        self.onPublish = onPublish
+        self.subscriptions = {}  # writer -> list of topic filters
+        self.published = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.session, "", self.port)
+        return self.server
+
+    async def readPacket(self, reader):
+        header = await reader.readexactly(1)
+        length = 0
+        multiplier = 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length = length + (byte & 0x7F) * multiplier
+            if byte & 0x80 == 0:
+                break
+            multiplier = multiplier * 128
+        body = await reader.readexactly(length)
+        return (header[0] >> 4, header[0] & 0x0F, body)
+
+    ## Communication with a connected client
+    async def session(self, reader, writer):
+        try:
+            while True:
+                (kind, flags, body) = await self.readPacket(reader)
+
+                if kind == CONNECT:
+                    writer.write(encodePacket(CONNACK, 0, b"\x00\x00"))
+
+                elif kind == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    (size,) = struct.unpack_from(">H", body)
+                    topic = body[2:2 + size].decode()
+                    position = 2 + size
+                    if qos > 0:
+                        packetId = body[position:position + 2]
+                        position = position + 2
+                        writer.write(encodePacket(PUBACK, 0, packetId))
+                    self.deliver(topic, body[position:])
+
+                elif kind == SUBSCRIBE:
+                    packetId = body[:2]
+                    position = 2
+                    granted = b""
+                    while position < len(body):
+                        (size,) = struct.unpack_from(">H", body, position)
+                        pattern = body[position + 2:position + 2 + size].decode()
+                        position = position + 3 + size
+                        self.subscriptions.setdefault(writer, []).append(pattern)
+                        granted = granted + b"\x00"
+                    writer.write(encodePacket(SUBACK, 0, packetId + granted))
+
+                elif kind == UNSUBSCRIBE:
+                    self.subscriptions.pop(writer, None)
+                    writer.write(encodePacket(UNSUBACK, 0, body[:2]))
+
+                elif kind == PINGREQ:
+                    writer.write(encodePacket(PINGRESP, 0, b""))
+
+                elif kind == DISCONNECT:
+                    break
+
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+
+        finally:
+            self.subscriptions.pop(writer, None)
+            writer.close()
+
+    def deliver(self, topic, payload):
+        self.published = self.published + 1
+        if self.onPublish is not None:
+            self.onPublish(topic, payload)
+
+        packet = None
+        for writer, patterns in list(self.subscriptions.items()):
+            if any(topicMatches(p, topic) for p in patterns):
+                if packet is None:
+                    packet = encodePacket(PUBLISH, 0, encodeString(topic.encode()) + payload)
+                writer.write(packet)
+
+########################################################
+
+## The shim can also run on its own, as a broker for tests
+if __name__ == '__main__':
+    import sys
+
+    async def main(port):
+        server = await brokerShim(port).start()
+        print("MQTT broker shim waiting connections at port", port, "...")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1883))
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+# *********************************************************************
+# Load generator and benchmark of CityAlarm
+# It simulates a fleet of virtual EDUs, spread over an area, sending ER to
+# a running EPU with the timing of the EDU (detections checked every fs
+# seconds, refreshes every fx seconds), and receives the EA published by
+# the EPU through an in-process MQTT broker shim (or an external broker)
+# Throughput and ER->EA latency percentiles are reported at the end
+# No sensor hardware (grovepi) is needed
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import asyncio
+import json
+import os
+import random
+import sys, getopt
+import time
+
+## The classes of ER and EA and the framing of the EPU
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "EPU"))
+from cityalarm import ER, isBinary, eaFromBinary, eaFromDict
+from erFraming import MAGIC, HEADER, encodeFrame
+
+from brokerShim import brokerShim
+
+##############################################################################
+
+## Parameters of the benchmark. They can be provided as command-line options
+numberEDU = 1000
+firstEDU = 1000  # id of the first virtual EDU
+ipEPU = "127.0.0.1"
+portEPU = 55055
+broker = "shim"  # "shim" (in-process broker) or the address of an external broker
+portBroker = 1883
+topic = "CityAlarm_EPU1"
+connectionMode = "single"  # "single" or "persistent", as in the EDU
+erFormat = "json"  # "json" or "binary", as in the EDU
+fs = 5  # Sensing frequency (s)
+fx = 60  # Refresh frequency (s)
+detection = 0.01  # Probability of new events at each sensing, for an EDU without events
+hold = 120  # Mean time (s) during which events remain detected
+duration = 60  # Duration of the benchmark (s)
+warmup = 5  # Time (s) before the measures, while the EPU connects to the broker
+area = (41.10, -8.70, 41.20, -8.55)  # la1, lo1, la2, lo2 (Porto, Portugal)
+seed = 1
+
+##############################################################################
+
+## A virtual EDU. Its position identifies its EA (the EPU should not correlate ER)
+class virtualEDU():
+    def __init__(self, idEDU, la, lo, fleet):
+        self.id = idEDU
+        self.la = la
+        self.lo = lo
+        self.fleet = fleet
+        self.idER = 1
+        self.events = []
+        self.clearAt = 0
+        self.nextRefresh = 0
+        self.writer = None
+
+    async def run(self):
+        rng = self.fleet.rng
+        await asyncio.sleep(rng.uniform(0, fs))
+
+        while self.fleet.running:
+            now = time.monotonic()
+
+            if len(self.events) > 0 and now >= self.clearAt:
+                self.events = []
+
+            if len(self.events) == 0:
+                ## New EI are detected: an ER is sent at once
+                if rng.random() < detection:
+                    self.events = sorted(rng.sample(range(1, 17), rng.randint(1, 5)))
+                    self.clearAt = now + rng.expovariate(1 / hold)
+                    self.nextRefresh = now + fx
+                    await self.sendER()
+
+            elif now >= self.nextRefresh:
+                self.nextRefresh = self.nextRefresh + fx
+                await self.sendER()
+
+            await asyncio.sleep(fs)
+
+        if self.writer is not None:
+            self.writer.close()
+
+    async def sendER(self):
+        er = ER(self.id, self.idER, time.ctime(), self.la, self.lo)
+        self.idER = self.idER + 1
+        for y in self.events:
+            er.putEventType(y)
+
+        if erFormat == "binary":
+            payload = er.toBinary()
+        else:
+            payload = er.toJSON().encode()
+
+        self.fleet.sent[(self.la, self.lo)] = time.monotonic()
+        self.fleet.numberER = self.fleet.numberER + 1
+
+        try:
+            if connectionMode == "persistent":
+                await self.sendFramed(payload)
+            else:
+                await self.sendSingle(payload)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.fleet.errors = self.fleet.errors + 1
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+    async def sendSingle(self, payload):
+        reader, writer = await asyncio.open_connection(ipEPU, portEPU)
+        try:
+            writer.write(payload)
+            writer.write_eof()
+            reply = await reader.read()
+            if reply.startswith(b"BUSY"):
+                self.fleet.busy = self.fleet.busy + 1
+        finally:
+            writer.close()
+
+    async def sendFramed(self, payload):
+        if self.writer is None:
+            reader, self.writer = await asyncio.open_connection(ipEPU, portEPU)
+            self.writer.write(MAGIC)
+            asyncio.ensure_future(self.readReplies(reader))
+        self.writer.write(encodeFrame(payload))
+        await self.writer.drain()
+
+    ## Replies of the EPU (BUSY) in the persistent connection
+    async def readReplies(self, reader):
+        try:
+            while True:
+                (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                reply = await reader.readexactly(size)
+                if reply.startswith(b"BUSY"):
+                    self.fleet.busy = self.fleet.busy + 1
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+
+##############################################################################
+
+class fleetBenchmark():
+    def __init__(self):
+        self.rng = random.Random(seed)
+        self.running = True
+
+        self.sent = {}  # (la, lo) -> time of the last ER of the EDU not matched to an EA
+        self.latencies = []
+        self.numberER = 0
+        self.numberEA = 0
+        self.cleared = 0
+        self.busy = 0
+        self.errors = 0
+
+        (la1, lo1, la2, lo2) = area
+        self.edus = []
+        for i in range(numberEDU):
+            la = round(self.rng.uniform(la1, la2), 6)
+            lo = round(self.rng.uniform(lo1, lo2), 6)
+            self.edus.append(virtualEDU(firstEDU + i, la, lo, self))
+
+    ## An EA published by the EPU. It is matched to the last ER of the EDU at the same position
+    def receiveEA(self, payload, received):
+        try:
+            if isBinary(payload):
+                ea = eaFromBinary(payload)
+            else:
+                ea = eaFromDict(json.loads(payload.decode()))
+        except Exception:
+            self.errors = self.errors + 1
+            return
+
+        self.numberEA = self.numberEA + 1
+        if ea.getState() == "cleared":
+            self.cleared = self.cleared + 1
+            return
+
+        sent = self.sent.pop((round(ea.getLatitude(), 6), round(ea.getLongitude(), 6)), None)
+        if sent is not None:
+            self.latencies.append(received - sent)
+
+    async def connectBroker(self):
+        loop = asyncio.get_running_loop()
+
+        if broker == "shim":
+            ## The copies of the EA in the geohash subtopics (EPU -g) are not counted
+            shim = brokerShim(portBroker, lambda t, p: "/geo/" in t or self.receiveEA(p, time.monotonic()))
+            await shim.start()
+            print("MQTT broker shim waiting for the EPU at port", portBroker, "...")
+            return
+
+        ## External broker, through a paho client
+        import paho.mqtt.client as mqtt
+        client = mqtt.Client("")
+        client.on_message = lambda c, u, m: loop.call_soon_threadsafe(self.receiveEA, m.payload, time.monotonic())
+        client.connect(broker, portBroker)
+        client.subscribe(topic)
+        client.subscribe(topic + "/bin")
+        client.loop_start()
+
+    async def run(self):
+        await self.connectBroker()
+
+        tasks = [asyncio.ensure_future(edu.run()) for edu in self.edus]
+        print("Simulating", numberEDU, "EDUs for", duration, "seconds (after", warmup, "seconds of warm-up)...")
+
+        await asyncio.sleep(warmup)
+        self.reset()
+
+        start = time.monotonic()
+        last = (start, 0, 0)
+        while time.monotonic() - start < duration:
+            await asyncio.sleep(min(5, duration - (time.monotonic() - start)))
+            now = time.monotonic()
+            print("%5.0f s: ER sent %d (%.1f/s), EA received %d (%.1f/s), busy %d, errors %d" %
+                  (now - start, self.numberER, (self.numberER - last[1]) / (now - last[0]),
+                   self.numberEA, (self.numberEA - last[2]) / (now - last[0]), self.busy, self.errors))
+            last = (now, self.numberER, self.numberEA)
+
+        ## EA of the last ER may still be on their way
+        self.running = False
+        await asyncio.sleep(1)
+        elapsed = time.monotonic() - start
+        for task in tasks:
+            task.cancel()
+
+        self.report(elapsed)
+
+    ## Measures of the warm-up are discarded
+    def reset(self):
+        self.latencies = []
+        self.numberER = 0
+        self.numberEA = 0
+        self.cleared = 0
+        self.busy = 0
+        self.errors = 0
+
+    def report(self, elapsed):
+        print("\nBenchmark of", numberEDU, "EDUs (" + connectionMode + ", " + erFormat + ") during", round(elapsed, 1), "s")
+        print("ER sent:", self.numberER, "(%.1f ER/s)" % (self.numberER / elapsed))
+        print("EA received:", self.numberEA, "(%.1f EA/s), cleared: %d" % (self.numberEA / elapsed, self.cleared))
+        print("ER refused (busy):", self.busy, "- errors:", self.errors)
+
+        if len(self.latencies) == 0:
+            print("No EA could be matched to an ER.")
+            return
+
+        latencies = sorted(self.latencies)
+        print("ER->EA latency (ms) of", len(latencies), "EA:")
+        for p in (50, 90, 99, 99.9):
+            i = min(len(latencies) - 1, int(len(latencies) * p / 100))
+            print("  p%-5s %8.2f" % (p, latencies[i] * 1000))
+        print("  max    %8.2f" % (latencies[-1] * 1000))
+
+##############################################################################
+
+def main(argv):
+    global numberEDU, firstEDU, ipEPU, portEPU, broker, portBroker, topic, connectionMode, erFormat
+    global fs, fx, detection, hold, duration, warmup, area, seed
+
+    ## Parse arguments from the command-line
+    opts, ars = getopt.getopt(argv, "hn:u:e:b:c:f:s:x:p:t:a:", ["edus=", "first=", "epu=", "broker=", "connection=", "format=", "fs=", "fx=", "detection=", "hold=", "duration=", "area=", "seed=", "topic=", "warmup="])
+    for opt, arg in opts:
+        if opt == "-h":
+            print("eduFleet.py -n <EDUs> -u <first idEDU> -e <ipEPU:port> -b <shim:port|ipBroker:port> -c <single|persistent> -f <json|binary> -s <fs> -x <fx> -p <detection probability> -t <duration (s)> -a <la1,lo1,la2,lo2> --hold <s> --warmup <s> --seed <n> --topic <topic>")
+            sys.exit(1)
+        elif opt in ("-n", "--edus"):
+            numberEDU = int(arg)
+        elif opt in ("-u", "--first"):
+            firstEDU = int(arg)
+        elif opt in ("-e", "--epu"):
+            (ipEPU, port) = arg.split(":")
+            portEPU = int(port)
+        elif opt in ("-b", "--broker"):
+            (broker, port) = arg.split(":")
+            portBroker = int(port)
+        elif opt in ("-c", "--connection"):
+            connectionMode = arg
+        elif opt in ("-f", "--format"):
+            erFormat = arg
+        elif opt in ("-s", "--fs"):
+            fs = float(arg)
+        elif opt in ("-x", "--fx"):
+            fx = float(arg)
+        elif opt in ("-p", "--detection"):
+            detection = float(arg)
+        elif opt == "--hold":
+            hold = float(arg)
+        elif opt in ("-t", "--duration"):
+            duration = float(arg)
+        elif opt in ("-a", "--area"):
+            area = tuple(float(v) for v in arg.split(","))
+        elif opt == "--warmup":
+            warmup = float(arg)
+        elif opt == "--seed":
+            seed = int(arg)
+        elif opt == "--topic":
+            topic = arg
+    ########
+
+    asyncio.run(fleetBenchmark().run())
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -13,6 +13,13 @@ import paho.mqtt.client as mqtt
 from time import sleep
 import sys, getopt
 import atexit
+import os
+
+## The shared package is in the parent directory of the EAC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from cityalarm.elements import isBinary, eaFromBinary
+from cityalarm.geohash import boxTopics
 
 ## Constants and variables
 debug = True
@@ -20,6 +27,11 @@ ipBroker = "127.0.0.1"
 
 requestEA = "CityAlarm_EPU1"
 
+## Area of interest (la1,lo1,la2,lo2). When defined, only the geohash subtopics of the EPU covering it
+## are subscribed (the EPU has to publish them, with the same number of levels)
+box = None
+geohashLevels = 5
+
 #Main code of this EAC
 ###############################################################
 
@@ -51,20 +63,29 @@ def on_disconnect(client,userdata,rc):
 ###############################################################
 
 def on_message(client,userdata,ea):
+    ## EA in the compact binary format (CityAlarm_EPUu/bin) are shown in the JSON format
+    if isBinary(ea.payload):
+        print ("Received Emergency Alarm (binary format):")
+        try:
+            print (eaFromBinary(ea.payload).toJSON())
+        except ValueError as e:
+            print ("Invalid EA:", e)
+        return
+
     print ("Received Emergency Alarm:")
     print (ea.payload.decode())
     
 ###############################################################
 
 def main(argv):
-    global requestEA,ipBroker, debug
+    global requestEA,ipBroker, debug, box, geohashLevels
         
     ## Parse arguments from the command-line
-    ## Options: debug idU ipEPU portEPU
-    opts, ars = getopt.getopt(argv,"hd:i:m:",["debug=","ipBroker=","requestEA="])
+    ## Options: debug idU ipEPU portEPU box geohashLevels
+    opts, ars = getopt.getopt(argv,"hd:i:m:b:g:",["debug=","ipBroker=","requestEA=","box=","geohash="])
     for opt,arg in opts:
         if opt == "-h":
-            print ("edu.py -d <debug> -i <ipBroker> -m <requestEA>")
+            print ("edu.py -d <debug> -i <ipBroker> -m <requestEA> -b <la1,lo1,la2,lo2> -g <geohash levels>")
             sys.exit(1)
         elif opt in ("-d", "--debug"):
             if arg == "True":
@@ -75,6 +96,10 @@ def main(argv):
             ipBroker = arg
         elif opt in ("-m", "--requestEA"):
             requestEA = arg
+        elif opt in ("-b", "--box"):
+            box = [float(v) for v in arg.split(",")]
+        elif opt in ("-g", "--geohash"):
+            geohashLevels = int(arg)
     ######## 
         
     if debug:
@@ -89,9 +114,16 @@ def main(argv):
     
     clientmqtt.connect(ipBroker)
         
-    clientmqtt.subscribe(requestEA)
-    if debug:
-        print ("Subscribing to the MQTT Broker with topic:", requestEA)
+    ## Only the EA of the area of interest are received
+    if box is not None:
+        topics = boxTopics(requestEA, box[0], box[1], box[2], box[3], geohashLevels)
+    else:
+        topics = [requestEA]
+
+    for topic in topics:
+        clientmqtt.subscribe(topic)
+        if debug:
+            print ("Subscribing to the MQTT Broker with topic:", topic)
     
     atexit.register(exit_handler)
     
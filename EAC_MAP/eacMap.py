@@ -17,7 +17,11 @@ import folium
 import json
 
 ## Supporting classes
-from elementsEAC import EA,GPS,ListEA
+from elementsEAC import EA,GPS,ListEA,isBinary,eaFromBinary,eaFromDict,boxTopics
+from elementsEAC import getLogger,configureLog
+
+## Structured log, written in the background
+logEAC = getLogger("eac")
 
 ##############################################################################
 
@@ -26,8 +30,18 @@ debug = True
 ipBroker = "192.168.0.122"  # The IP address of the MQTT Broker - can be provided as a command-line argument
 requestEA = "CityAlarm_EPU1"  # MQTT subject to be subscribed to
 
+## Area of interest (la1,lo1,la2,lo2). When defined, only the geohash subtopics of the EPU covering it
+## are subscribed (the EPU has to publish them, with the same number of levels)
+box = None
+geohashLevels = 5
+
+## Levels and sampling of the log (for example, "eac=debug:100"), and its file
+logSpec = None
+logPath = None
+
 ## Frequency to refresh the map
 refreshTime = 120  # After 120s, Emergency Alarms that were not refreshed will be removed from the list of active EA
+trackedTime = 1800 # EA tracked by the EPU (with a state) are removed after 1800s without news, if they are never cleared
 
 ## List of all alarms
 alarms = ListEA()
@@ -66,7 +80,7 @@ class mapRefresher (threading.Thread):
         threading.Thread.__init__(self)
 
     def run(self):
-        global refreshTime, alarms, debug
+        global refreshTime, trackedTime, alarms, debug
 
         while True:
             time.sleep(refreshTime)
@@ -75,7 +89,7 @@ class mapRefresher (threading.Thread):
                 print ("Updating list of received EA")
 
             ## Remove old EAs
-            alarms.updateAlarms(refreshTime, debug)
+            alarms.updateAlarms(refreshTime, trackedTime, debug)
 
             plotMap()
 
@@ -135,30 +149,36 @@ def on_disconnect(client, userdata, rc):
 def on_message(client, userdata, message):
     global debug, alarms
 
-    ## Received message (alarm) from the MQTT broker
-    received = message.payload.decode()
+    try:
+        ## Received message (alarm) from the MQTT broker, in the binary or the JSON format
+        if isBinary(message.payload):
+            ea = eaFromBinary(message.payload)
+        else:
+            ## Reconstructing the EA
+            ea = eaFromDict(json.loads(message.payload.decode()))
 
-    if debug:
-        print("Received Emergency Alarm:")
-        print(received) # it is in the JSON format
+        logEAC.trace("ea_received", ea=ea.getId(), sl=ea.getSeverityLevel(), state=ea.getState(), topic=message.topic)
 
-    try:
-        ## Reconstructing the EA
-        parsed_data = json.loads(received)
-        ea = EA(parsed_data["id"], parsed_data["timestamp"], parsed_data["gps"]["la"],parsed_data["gps"]["lo"])
-        ea.setSeverityLevel(parsed_data["sl"])
-        types = parsed_data["events"]
-        for t in types:
-            ea.putEvent(t)
+        ## The subscribed cells may be larger than the area of interest
+        if box is not None and not insideBox(ea):
+            return
 
-        ## Inserting (updating) alarm
-        alarms.putAlarm(ea, debug)
+        ## Inserting (updating) or removing alarm
+        if ea.getState() == "cleared":
+            alarms.removeAlarm(ea.getId(), debug)
+        else:
+            alarms.putAlarm(ea, debug)
 
         plotMap()
 
     except Exception as e:
-        print ("Error when processing EA...")
-        print (e)
+        logEAC.error("ea_invalid", error=str(e), topic=message.topic)
+
+##############################################################################
+
+def insideBox(ea):
+    (la1, lo1, la2, lo2) = box
+    return min(la1, la2) <= ea.getLatitude() <= max(la1, la2) and min(lo1, lo2) <= ea.getLongitude() <= max(lo1, lo2)
 
 ##############################################################################
 
@@ -173,14 +193,14 @@ def exit_handler():
 
 ## Main code of the EAC_Map
 def main(argv):
-    global requestEA, ipBroker, debug
+    global requestEA, ipBroker, debug, box, geohashLevels, logSpec, logPath, trackedTime
 
     ## Parse arguments from the command-line
-    ## Options: debug idU ipEPU portEPU
-    opts, ars = getopt.getopt(argv, "hd:i:m:", ["debug=", "ipBroker=", "requestEA="])
+    ## Options: debug idU ipEPU portEPU box geohashLevels logSpec logPath trackedTime
+    opts, ars = getopt.getopt(argv, "hd:i:m:b:g:", ["debug=", "ipBroker=", "requestEA=", "box=", "geohash=", "log=", "logfile=", "tracked="])
     for opt, arg in opts:
         if opt == "-h":
-            print("edu.py -d <debug> -i <ipBroker> -m <requestEA>")
+            print("edu.py -d <debug> -i <ipBroker> -m <requestEA> -b <la1,lo1,la2,lo2> -g <geohash levels> --log <subsystem=level[:sampling]> --logfile <file> --tracked <seconds>")
             sys.exit(1)
         elif opt in ("-d", "--debug"):
             if arg == "True":
@@ -191,8 +211,20 @@ def main(argv):
             ipBroker = arg
         elif opt in ("-m", "--requestEA"):
             requestEA = arg
+        elif opt in ("-b", "--box"):
+            box = [float(v) for v in arg.split(",")]
+        elif opt in ("-g", "--geohash"):
+            geohashLevels = int(arg)
+        elif opt == "--log":
+            logSpec = arg
+        elif opt == "--logfile":
+            logPath = arg
+        elif opt == "--tracked":
+            trackedTime = float(arg)
     ########
 
+    configureLog(logSpec, debug, logPath)
+
     if debug:
         print("Initializing the EAC for emergencies visualization...")
 
@@ -203,10 +235,17 @@ def main(argv):
     clientmqtt.on_message = on_message
 
     clientmqtt.connect(ipBroker)
-    clientmqtt.subscribe(requestEA)
 
-    if debug:
-        print("Subscribing to the MQTT Broker with topic:", requestEA)
+    ## Only the EA of the area of interest are received
+    if box is not None:
+        topics = boxTopics(requestEA, box[0], box[1], box[2], box[3], geohashLevels)
+    else:
+        topics = [requestEA]
+
+    for topic in topics:
+        clientmqtt.subscribe(topic)
+        if debug:
+            print("Subscribing to the MQTT Broker with topic:", topic)
 
     ## It is used to update the current detected EA in the map
     mapRefresher().start()
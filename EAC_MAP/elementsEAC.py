@@ -1,11 +1,22 @@
 # *********************************************************************
 # These are supporting classes for the EAC_Map
+# The Emergency Alarm is shared by all components (cityalarm package,
+# in the root of the repository)
 # Author      : Daniel G. Costa
 # E-mail      : danielgcosta@uefs.br
 # Date        : 2019/09/10
 # *********************************************************************
 
 import time, datetime
+import os
+import sys
+
+## The shared package is in the parent directory of the EAC
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from cityalarm.elements import EA, GPS, eaFromDict, eaFromBinary, isBinary
+from cityalarm.geohash import boxTopics
+from cityalarm.eventLog import getLogger, configureLog
 
 ##############################################################################
 
@@ -16,36 +27,48 @@ class ListEA:
         self.alarms = []
 
     ## Insert a new EA into the list only if comes from an unreported EDU
+    ## EA tracked by the EPU (with a state) are the same EA when they have the same id,
+    ## since the centroid of a cluster moves as its EDU change
     def putAlarm(self, ea, debug):
 
-        lat = ea.getLatitude()
-        lon = ea.getLongitude()
-
-        control = True
-        ## Only insert new EA for new coordinates
-        for alarm in self.alarms:
-            if alarm.getLatitude() == lat and alarm.getLongitude() == lon:  ## Refresh alarm
-                self.alarms.remove(alarm)
-                self.alarms.append(ea)
-                control = False
-                if debug:
-                    print("Removing old EA and inserting updated alarm...")
-
-        if control:
-            if debug:
-                print ("Inserting new EA into the list...")
-            self.alarms.append(ea)
+        if ea.getState() is not None:
+            i = ea.getId()
+            same = lambda alarm: alarm.getId() == i
+        else:
+            lat = ea.getLatitude()
+            lon = ea.getLongitude()
+            same = lambda alarm: alarm.getLatitude() == lat and alarm.getLongitude() == lon
+
+        ## Only insert new EA for new coordinates (or ids)
+        old = [alarm for alarm in self.alarms if same(alarm)]
+        for alarm in old:  ## Refresh alarm
+            self.alarms.remove(alarm)
+        self.alarms.append(ea)
+
+        if debug:
+            print("Removing old EA and inserting updated alarm..." if old else "Inserting new EA into the list...")
+
+    ## Remove an EA cleared by the EPU
+    def removeAlarm(self, i, debug):
+        cleared = [alarm for alarm in self.alarms if alarm.getId() == i]
+        for alarm in cleared:
+            self.alarms.remove(alarm)
+        if debug and cleared:
+            print ("Removing cleared EA with id:", i)
 
     ## Remove old (not refreshed) EA
-    def updateAlarms(self, maxTime, debug):
+    ## EA whose state is tracked by the EPU are removed when they are cleared, or after trackedTime
+    ## (the EPU publishes them again while they are active), in case the EPU restarted and lost them
+    def updateAlarms(self, maxTime, trackedTime, debug):
 
         t = datetime.datetime.strptime(time.ctime(), "%a %b %d %H:%M:%S %Y")
         now = t.timestamp()  # current absolute time (seconds)
 
-        for alarm in self.alarms:
+        for alarm in list(self.alarms):
             alarmTime = datetime.datetime.strptime(alarm.getTimestamp(), "%a %b %d %H:%M:%S %Y").timestamp()
+            limit = maxTime if alarm.getState() is None else trackedTime
 
-            if (now - alarmTime) > maxTime:  ## Old EA. Remove it
+            if (now - alarmTime) > limit:  ## Old EA. Remove it
                 self.alarms.remove(alarm)
                 if debug:
                     print ("Removing old EA with id:", alarm.getId())
@@ -58,54 +81,3 @@ class ListEA:
            print("Id:", ea.getId(), ": Latitude =", ea.getLatitude(), ": Longitude =", ea.getLongitude(), ": Severity =", ea.getSeverityLevel())
 
 ##############################################################################
-
-## Definition of an Emergency Alarm
-class EA():
-    def __init__(self, i, ts, latitude, longitude):
-        self.id = i
-        self.gps = GPS(latitude,longitude)
-        self.timestamp = ts
-        self.events = []
-        self.sl = 0
-
-    def getLatitude (self):
-        return self.gps.la
-
-    def getLongitude (self):
-        return self.gps.lo
-
-    def putEvent(self, y):
-        self.events.append(y)
-
-    def getEventsTypes (self):
-        return self.events
-
-    def setSeverityLevel(self, sev):
-        self.sl = sev
-
-    def getSeverityLevel (self):
-        return self.sl
-
-    def getId(self):
-        return self.id
-
-    def getTimestamp(self):
-        return self.timestamp
-
-    def printValues(self):
-        print ("EA id:",self.id,", Timestamp:",self.timestamp,", Latitude:",self.gps.la,", Longitude:",self.gps.lo, " SL:", self.sl)
-        print ("This EA has the following EI types:")
-        for e in self.events:
-            print ("Type:",e)
-
-    def toJSON(self):
-        return json.dumps(self,default=lambda o: o.__dict__,sort_keys=True, indent=4)
-
-##############################################################################
-
-class GPS():
-    def __init__(self, latitude, longitude):
-        self.la = latitude
-        self.lo = longitude
-
-##############################################################################
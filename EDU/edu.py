@@ -22,6 +22,10 @@ import grovepi  #Has to be installed
 ## Elements to support the operation of the EDU
 from elementsEDU import ListEI,EI,ER
 import moduleGPS
+from eduLink import epuConnection
+from sensorScheduler import sensorTask, sensorScheduler
+from erStore import erForwarder
+from signalFilters import parseFilter
 
 ########################################################
 debug = True  #Used to present trace messages on the screen
@@ -30,8 +34,10 @@ debug = True  #Used to present trace messages on the screen
 idEDU = 1 #ID of the EDU (variable u). It can be provided as command-line options
 fs = 5 #Sensing frequency in seconds
 fx = 60 #Transmission frequency to refresh Events Reports
-la = 0 #Latitude of the EDU
-lo = 0 #Longitude of the EDU
+la = 0 #Latitude of the EDU (last GPS fix)
+lo = 0 #Longitude of the EDU (last GPS fix)
+gps = None #GPS tracker, reading the position of the EDU in a thread of its own (moduleGPS)
+gpsTimeout = 5 #Time (s) waiting for the first GPS fix at startup
 events = ListEI() #List of all possible EI (both detected and undetected)
 idER = 1 #Indicates the current id of generated Events Reports
 
@@ -39,6 +45,23 @@ idER = 1 #Indicates the current id of generated Events Reports
 ## They can be provided as command-line options
 ipEPU = "192.168.0.140" #EPU address
 portEPU = 55055         #EPU port
+connectionMode = "single" #"single" (one connection per ER) or "persistent" (many ER per connection)
+link = None             #Connection to the EPU (eduLink)
+erFormat = "json"       #Format of the ER: "json" or "binary" (compact, accepted by the EPU in both connection modes)
+storePath = "erStore"   #Directory of the ER stored while the EPU is unreachable (SD card)
+drainRate = 5           #Stored ER sent per second when the EPU is reachable again
+forwarder = None        #Thread that sends the ER, storing them while the EPU is down (erStore)
+
+## Sampling period (s) of each sensor. None uses fs. They can be provided as command-line options
+sensorPeriods = {"humidity": None, "noise": 0.5, "smoke": 1, "water": None, "temperature": None}
+reportInterval = 0 #Period (s) of the report of latency and jitter of the sensors. 0 disables the report
+currentEI = 0 #Number of detected EI when the last ER was created
+
+## Rolling-window filter (none, mean, median or rate, and the window size) of each sensor
+## The EI are evaluated with the filtered readings. They can be provided as command-line options
+sensorFilters = {"humidity": "mean:3", "noise": "median:5", "smoke": "mean:4", "water": "none", "temperature": "mean:3"}
+filters = {}
+lockEvents = threading.Lock()
 
 ###############################################
 ## List of possible EI
@@ -62,6 +85,15 @@ possibleEI = [[1,60,1,"Heating"], \
               [15,600,1,"Pollution"], \
               [16,0,0,"Flooding"]]
 
+## Debounce of the EI: type -> (hysteresis, hold time to be detected (s), hold time to be undetected (s))
+## EI not listed change their state at the first reading. They can be provided as command-line options
+debounceEI = {1: (2, 5, 30), \
+              2: (2, 5, 30), \
+              3: (5, 10, 30), \
+              4: (50, 2, 20), \
+              8: (5, 1, 10), \
+              16: (0, 2, 30)}
+
 #####################################################
 ## This part will depend on the employed hardware components
 ## This referece implementation of the EDU is based on the
@@ -76,80 +108,85 @@ sensorWater = 4 #digital D4
 sensorHumidity = 7 # Digital D7
 display = 8 #Numerical display to show the number of detected events: D8
 
-grovepi.pinMode (sensorAudio,"INPUT")
-grovepi.pinMode (sensorSmoke,"INPUT")
-grovepi.pinMode (sensorTemperature,"INPUT")
-grovepi.pinMode (sensorWater,"INPUT")
-grovepi.pinMode (sensorHumidity,"INPUT")
-grovepi.pinMode (display,"OUTPUT")
+## The GrovePi is a single device on the I2C bus: the commands of the sensor threads and of the
+## display can not be interleaved, so every GrovePi call holds this lock
+groveLock = threading.Lock()
+
+def grove(function, *args):
+    with groveLock:
+        return function(*args)
+
+grove(grovepi.pinMode, sensorAudio, "INPUT")
+grove(grovepi.pinMode, sensorSmoke, "INPUT")
+grove(grovepi.pinMode, sensorTemperature, "INPUT")
+grove(grovepi.pinMode, sensorWater, "INPUT")
+grove(grovepi.pinMode, sensorHumidity, "INPUT")
+grove(grovepi.pinMode, display, "OUTPUT")
 
 #####################################################
 ### MAIN CODE ###
 #####################################################
 
-## Thread 1 - transmit an ER every fs seconds
-## This thread senses the environment and transmits the generated ER
-class sensingThread (threading.Thread):
-    global fs, events
-        
-    def __init__(self):
-        threading.Thread.__init__(self)
-      
-    def run(self):
-                
-        currentEI = 0 # This variable is used to avoid the transmission of multiple ER for the same set of detected EI
-        
-        while True:
-            try:                
-                ## Check all connected sensors
-                
-                ## Only humidity is taken from DHT11, since the detectable temperature range is short
-                [temp,humidity] = grovepi.dht(sensorHumidity,0) #0 because the component is the "blue" one; 1 is for the "white" (DHT22) sensor
-                noise = grovepi.analogRead(sensorAudio)
-                noise = 20 * math.log(noise,10) #Simple simplification to return value in dB (approximation, since the sensor is not calibrated)
-                smoke = grovepi.analogRead(sensorSmoke) #MQ-2 reading (is also needs calibration)
-                water = grovepi.digitalRead(sensorWater) #Returns 1 if it is dry, and 0 otherwise
-                temperature = grovepi.temp(sensorTemperature, '1.2') #This sensor has a better temperature range
-                
-                if debug:
-                    print ("\nSensed data at", datetime.datetime.today())
-                    print ("Relative humidity:", humidity, "%")
-                    print ("Noise:", noise, "dB")
-                    print ("Smoke:", smoke, "ppm")
-                    if water == 1:
-                        print ("Water:", water, "- It is dry.")
-                    else:
-                        print ("Water:", water, "- It is wet.")   
-                    print ("Temperature:", temperature, "C")
-                
-                ## Test if any EI was detected.
-                ## The sensors are mapped to the corresponding value of Y
-                detectEI(humidity,events.getEventY(3))
-                detectEI(noise,events.getEventY(8))
-                detectEI(smoke,events.getEventY(4))
-                detectEI(water,events.getEventY(16))
-                ## Temperature is related to two EI (Heating and Freezing)
-                detectEI(temperature,events.getEventY(1))
-                detectEI(temperature,events.getEventY(2))
-                               
-                ## If debug=False, only the LCD display will show information about detected events 
-                showDetectedEI()
-                
-                ## In this thread, a new ER is sent only when the current status of detected
-                ## events is chaged
-                if events.getNumberDetectedEI() == 0:
-                    currentEI = 0
-                elif events.getNumberDetectedEI() > 0 and currentEI != events.getNumberDetectedEI():
-                    if debug:
-                        print ("A new EI was detected. An ER will be created...")
-                    currentEI = events.getNumberDetectedEI()
-                    createER(self)
-                                
-            except (IOError, TypeError) as e:
-                print (str(e))
-            
-            ## Frequency of monitoring
-            time.sleep (fs)
+## Thread 1 - sense the environment
+## Each sensor is read at its own period by the sampling scheduler (sensorScheduler). The slow
+## DHT is read by a thread of its own, so it does not delay the other sensors
+def initializeSensors():
+    global sensorPeriods
+
+    def period(name):
+        return sensorPeriods.get(name) or fs
+
+    for name in sensorPeriods:
+        filters[name] = parseFilter(sensorFilters.get(name, "none"))
+
+    ## Only humidity is taken from DHT11, since the detectable temperature range is short
+    ## 0 because the component is the "blue" one; 1 is for the "white" (DHT22) sensor
+    tasks = [sensorTask("humidity", period("humidity"), lambda: grove(grovepi.dht, sensorHumidity, 0)[1], sensedData("humidity", [3]), slow=True),
+             ## Simple simplification to return value in dB (approximation, since the sensor is not calibrated)
+             sensorTask("noise", period("noise"), lambda: 20 * math.log(grove(grovepi.analogRead, sensorAudio),10), sensedData("noise", [8])),
+             ## MQ-2 reading (is also needs calibration)
+             sensorTask("smoke", period("smoke"), lambda: grove(grovepi.analogRead, sensorSmoke), sensedData("smoke", [4])),
+             ## Returns 1 if it is dry, and 0 otherwise
+             sensorTask("water", period("water"), lambda: grove(grovepi.digitalRead, sensorWater), sensedData("water", [16])),
+             ## This sensor has a better temperature range. Temperature is related to two EI (Heating and Freezing)
+             sensorTask("temperature", period("temperature"), lambda: grove(grovepi.temp, sensorTemperature, '1.2'), sensedData("temperature", [1, 2]))]
+
+    return sensorScheduler(tasks, reportInterval)
+
+## Returns the function that tests the EI related to a sensor (list of values of Y) with each sensed value
+def sensedData(name, types):
+    def sensed(value):
+        global currentEI
+
+        with lockEvents:
+            ## The reading is filtered with the last readings of the sensor
+            now = time.monotonic()
+            value = filters[name].put(value, now)
+            if value is None:
+                return
+
+            ## Test if any EI was detected. The sensor is mapped to the corresponding values of Y
+            readings = events.newReadings()
+            readings[types] = value
+            (mask, detected) = events.evaluate(readings, now)
+
+            ## A new ER is sent only when the current status of detected events is changed
+            if detected == currentEI:
+                return
+            currentEI = detected
+
+        if debug:
+            print ("\nSensed data at", datetime.datetime.today(), "-", name, ":", value)
+
+        ## If debug=False, only the LCD display will show information about detected events
+        showDetectedEI()
+
+        if detected > 0:
+            if debug:
+                print ("A new EI was detected. An ER will be created...")
+            createER(None, True)
+
+    return sensed
 
 ##########################################################################
             
@@ -178,31 +215,11 @@ class refreshThread (threading.Thread):
             
 ###########################################################################
         
-## This method checks if a certain EI can be assumed as detected
-def detectEI(sensed, event):    
-    
-    threshold = event.getThreshold()
-    symbol = event.getMath()
-    
-    if symbol == 1:
-        if sensed >= threshold: # EI detected
-            event.setDetected()
-        else:            
-            event.setUndetected() # EI is undetected
-    else:
-        if sensed <= threshold: # EI detected
-            event.setDetected()                
-        else:            
-            event.setUndetected() # EI is undetected
-
-##########################################################################
-
 def showDetectedEI():
     global events
-    for event in events.getEvents():
-        if event.isDetected():
-            if debug:
-                print ("*** EI ", event.getType(), " is detected ***")
+    if debug:
+        for y in events.getDetectedTypes():
+            print ("*** EI ", y, " is detected ***")
     
     showDisplayNumberEI() # Uses the display
     
@@ -210,13 +227,14 @@ def showDetectedEI():
     
 def showDisplayNumberEI():
     global events, display
-    grovepi.fourDigit_number(display, events.getNumberDetectedEI(), 1)
+    grove(grovepi.fourDigit_number, display, events.getNumberDetectedEI(), 1)
     
 ##########################################################################
     
 ## This method creates the Events Reports
 ## This method is accessed by two concurrent threads
-def createER(self):        
+## ER of new detections are urgent: they are sent before the ER stored while the EPU was down
+def createER(self, urgent=False):        
     global idEDU, idER, la, lo, events
         
     ## Requesting block for the use of this method
@@ -226,23 +244,25 @@ def createER(self):
     ## Current time
     timestamp = time.ctime()
     
+    ## Latest position of the EDU (it may be moving). The last one is kept when there is no fix
+    fix = gps.getFix()
+    if fix is not None:
+        (la, lo) = (fix.latitude, fix.longitude)
+    
     eventsReport = ER(idEDU, idER, timestamp, la, lo)
     idER = idER + 1
     
     ## Insert events. The limit is 5 EI, as described in CityAlam paper
-    countEI = 0
-    for event in events.getEvents():
-        if event.isDetected():
-            countEI = countEI + 1
-            if countEI <= 5:                
-                eventsReport.putEventType (event.getType()) # Only the value of Y is relevant
+    detected = events.getDetectedTypes()
+    for y in detected[:5]:
+        eventsReport.putEventType (y) # Only the value of Y is relevant
     
-    if countEI > 5:
+    if len(detected) > 5:
         if debug:
             print ("More than 5 EI were detected, but only 5 events will be reported.")
         
     ## Send the ER to the EPU
-    transmitER (eventsReport)
+    transmitER (eventsReport, urgent)
     
     ## Releasing this method to be used by other thread
     lock.release()
@@ -250,35 +270,36 @@ def createER(self):
 ##########################################################################
     
 ## Communication with the EPU
-def transmitER(er):
-    global debug, ipEPU, portEPU
+def transmitER(er, urgent=False):
+    global debug, forwarder, erFormat
     
     if debug:
         print ("Transmitting ER generated at " + str(er.getTimestamp()) + ". Number of reported EI: " + str(er.getNumberEI()))
         
-    ## Serializing the ER to the JSON format
-    jsonER = er.toJSON()
-    
-    if debug:
-        print ("\nER in the JSON format:")
-        print (jsonER)
+    payload = None
+    if erFormat == "binary":
+        ## Serializing the ER to the compact binary format (JSON is used if it is not possible)
+        try:
+            payload = er.toBinary()
+            if debug:
+                print ("\nER in the binary format:", len(payload), "bytes")
+        except ValueError as e:
+            if debug:
+                print ("The ER can not be sent in the binary format:", e)
     
-    ## Open connection to the EPU, send ER, and then close the connection
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)    
-    try:
-        s.settimeout(10) # Timeout of 10 seconds
-        s.connect((ipEPU, portEPU))
+    if payload is None:
+        ## Serializing the ER to the JSON format
+        jsonER = er.toJSON()
         
         if debug:
-            print ("\nConnection established to the EPU. Sending ER...")
-        
-        s.sendall(bytes(jsonER, 'utf-8'))
-        s.close()
+            print ("\nER in the JSON format:")
+            print (jsonER)
         
-    except socket.error as e:
-        print ("The EPU could not be contacted. Exiting EDU...")
-        print ("Error:", e)
-        sys.exit(1)
+        payload = bytes(jsonER, 'utf-8')
+    
+    ## The ER is sent by the forwarder through the current connection mode (single or persistent)
+    ## If the EPU can not be contacted, the ER is stored and sent later
+    forwarder.put(payload, urgent)
         
 ##########################################################################
       
@@ -287,7 +308,8 @@ def initializeEI():
     global events, possibleEI
     
     for ei in possibleEI:
-        events.putEvent(ei[0],ei[1],ei[2],ei[3])
+        (hysteresis, holdOn, holdOff) = debounceEI.get(ei[0], (0, 0, 0))
+        events.putEvent(ei[0],ei[1],ei[2],ei[3],hysteresis,holdOn,holdOff)
     
     if debug:
         print ("\nList of configured Events of Interest:")
@@ -305,14 +327,14 @@ def exit_handler():
 
 # main code of the EDU      
 def main(argv):
-    global display, la, lo, debug, idEDU, ipEPU, portEPU
+    global display, la, lo, gps, debug, idEDU, ipEPU, portEPU, connectionMode, link, erFormat, sensorPeriods, reportInterval, storePath, drainRate, forwarder, sensorFilters, debounceEI
     
     ## Parse arguments from the command-line
-    ## Options: debug idU ipEPU portEPU
-    opts, ars = getopt.getopt(argv,"hd:u:i:p:",["debug=","idEDU=","ipEPU=","portEPU="])
+    ## Options: debug idU ipEPU portEPU connectionMode erFormat sensorPeriods reportInterval storePath drainRate sensorFilters debounceEI
+    opts, ars = getopt.getopt(argv,"hd:u:i:p:c:f:",["debug=","idEDU=","ipEPU=","portEPU=","connection=","format=","periods=","report=","store=","drain=","filters=","debounce="])
     for opt,arg in opts:
         if opt == "-h":
-            print ("edu.py -d <debug> -u <idEDU> -i <ipEPU> -p <portEDU>")
+            print ("edu.py -d <debug> -u <idEDU> -i <ipEPU> -p <portEDU> -c <single|persistent> -f <json|binary> --periods <sensor=seconds,...> --report <seconds> --store <directory> --drain <ER/s> --filters <sensor=filter:size,...> --debounce <type=hysteresis:on:off,...>")
             sys.exit(1)
         elif opt in ("-d", "--debug"):
             if arg == "True":
@@ -325,31 +347,77 @@ def main(argv):
             ipEPU = arg
         elif opt in ("-p", "--portEPU"):
             portEPU = int(arg)
+        elif opt in ("-c", "--connection"):
+            connectionMode = arg
+        elif opt in ("-f", "--format"):
+            erFormat = arg
+        elif opt == "--periods":
+            for item in arg.split(","):
+                (name, value) = item.split("=")
+                if name not in sensorPeriods:
+                    print ("Unknown sensor:", name)
+                    sys.exit(1)
+                sensorPeriods[name] = float(value)
+        elif opt == "--report":
+            reportInterval = float(arg)
+        elif opt == "--store":
+            storePath = arg
+        elif opt == "--drain":
+            drainRate = float(arg)
+        elif opt == "--filters":
+            for item in arg.split(","):
+                (name, value) = item.split("=")
+                if name not in sensorPeriods:
+                    print ("Unknown sensor:", name)
+                    sys.exit(1)
+                try:
+                    parseFilter(value)
+                except ValueError as e:
+                    print (e)
+                    sys.exit(1)
+                sensorFilters[name] = value
+        elif opt == "--debounce":
+            for item in arg.split(","):
+                (y, value) = item.split("=")
+                (hysteresis, holdOn, holdOff) = (float(v) for v in value.split(":"))
+                debounceEI[int(y)] = (hysteresis, holdOn, holdOff)
     ########            
     
+    ## Connection to the EPU
+    link = epuConnection(ipEPU, portEPU, connectionMode, debug=debug)
+    
+    ## ER are sent by the forwarder, which keeps them in storePath while the EPU is unreachable
+    forwarder = erForwarder(link, storePath, drainRate)
+    if forwarder.urgent.size() + forwarder.backlog.size() > 0:
+        print (forwarder.urgent.size() + forwarder.backlog.size(), "ER stored in a previous execution will be sent to the EPU")
+    forwarder.start()
+    
     print ("Events Detector Unit is initializing... Ready to detect events.")
     
     ## Initialize display
-    grovepi.fourDigit_init(display)
-    grovepi.fourDigit_brightness(display,6)
+    grove(grovepi.fourDigit_init, display)
+    grove(grovepi.fourDigit_brightness, display, 6)
     time.sleep(.2)
     showDisplayNumberEI()
     
-    ## Get GPS location - only once at startup
+    ## Get GPS location - the tracker keeps reading it, so the ER of mobile EDUs have their current position
     if debug:
         print("Obtaining GPS position...")
-    gps = moduleGPS.groveGPS()    
-    gps.read()
-    la = gps.latitude
-    lo = gps.longitude
+    gps = moduleGPS.gpsTracker()
+    gps.start()
+    fix = gps.waitFix(gpsTimeout)
+    if fix is not None:
+        (la, lo) = (fix.latitude, fix.longitude)
+    elif debug:
+        print ("No GPS fix yet. Default coordinates are used until the GPS finds signal")
     if debug:
         print ("EDU at latitude =", la, "and longitude =", lo)
     
     ## Initialize EI definitions
     initializeEI()    
 
-    ## Initialize thread to read all the sensors
-    checkSensors = sensingThread()    
+    ## Initialize the scheduler that reads all the sensors
+    checkSensors = initializeSensors()
     checkSensors.start()
     
     ## Initialize thread to refresh ER
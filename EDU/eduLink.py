@@ -0,0 +1,233 @@
+# **************************************************
+# Accessory class to transmit Events Reports to the EPU
+# In the "single" mode, a new connection is opened for every ER
+# In the "persistent" mode, one connection carries many ER back to back,
+# each one prefixed by its length (4 bytes, big endian), after the
+# MAGIC preamble. The connection is reopened when it fails and a
+# keep-alive (frame of length 0) is sent when it is idle
+# An overloaded EPU answers "BUSY <seconds>" (as a frame in the persistent
+# mode, "BUSY <seconds> <n>", n being the number of the refused ER in the
+# connection). The EDU waits for the given time before sending again, and
+# the refused ER of persistent connections are handed back (takeRefused)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# **************************************************
+
+import collections
+import select
+import socket
+import struct
+import threading
+import time
+
+###############
+MAGIC = b"CAF1"  # CityAlarm Framing, version 1 (the same of the EPU)
+HEADER = struct.Struct(">I")
+
+## ER kept after being sent in a persistent connection, in case the EPU refuses them
+window = 1024
+
+class epuConnection:
+    
+    def __init__(self, ip, port, mode="single", keepAlive=30, debug=False):
+        self.ip = ip
+        self.port = port
+        self.mode = mode
+        self.keepAlive = keepAlive  # Seconds without ER before a keep-alive is sent
+        self.debug = debug
+        
+        self.timeout = 10  # Timeout of 10 seconds
+        self.retries = 3   # Attempts to reconnect before giving up an ER
+        self.backoff = 0.5 # Initial waiting between attempts (doubled each time)
+        self.replyTimeout = 2  # Waiting for a BUSY reply after an ER (single mode)
+        
+        self.sock = None
+        self.lastSent = time.time()
+        self.retryAfter = 0  # Time before which the EPU asked not to receive ER
+        self.replies = b""   # Frames received from the EPU (persistent mode)
+        self.lock = threading.Lock()
+        
+        self.sequence = 0    # Number of ER sent in the current connection
+        self.sent = collections.deque(maxlen=window)  # (number, ER, tag) of the last sent ER
+        self.refused = []    # (ER, tag) refused by the EPU in the persistent mode
+        
+        if self.mode == "persistent":
+            keepAliveThread(self).start()
+    
+    ## Send an ER (bytes) to the EPU. Raises socket.error if the EPU could not be contacted
+    ## tag is returned with the ER by takeRefused if the EPU refuses it (persistent mode)
+    def send(self, payload, tag=None):
+        if self.mode != "persistent":
+            self.sendSingle(payload)
+            return
+        
+        with self.lock:
+            error = None
+            for attempt in range(self.retries):
+                try:
+                    if self.sock is None:
+                        self.connect()
+                    self.readReplies()
+                    self.waitEPU()
+                    self.sock.sendall(HEADER.pack(len(payload)) + payload)
+                    self.lastSent = time.time()
+                    self.sequence = self.sequence + 1
+                    self.sent.append((self.sequence, payload, tag))
+                    return
+                except socket.error as e:
+                    error = e
+                    self.close()
+                    if self.debug:
+                        print ("Connection to the EPU failed. Reconnecting...")
+                    time.sleep(self.backoff * (2 ** attempt))
+            raise error
+    
+    ## Open connection to the EPU, send ER, and then close the connection
+    ## The ER is sent again (at most retries times) when the EPU is busy
+    def sendSingle(self, payload):
+        for attempt in range(self.retries):
+            self.waitEPU()
+            
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                s.settimeout(self.timeout)
+                s.connect((self.ip, self.port))
+                
+                if self.debug:
+                    print ("\nConnection established to the EPU. Sending ER...")
+                
+                s.sendall(payload)
+                
+                ## The EPU closes the connection after the ER, answering only when it is busy
+                ## Older EPU may keep the connection open without answering: once written, the ER
+                ## is delivered, so no reply is not a failure (sending it again would duplicate it)
+                s.shutdown(socket.SHUT_WR)
+                s.settimeout(self.replyTimeout)
+                reply = b""
+                try:
+                    while True:
+                        data = s.recv(64)
+                        if not data:
+                            break
+                        reply = reply + data
+                except socket.timeout:
+                    pass
+            finally:
+                s.close()
+            
+            if not self.parseBusy(reply):
+                return
+        raise socket.error("The EPU is overloaded")
+    
+    ## Tells if a reply of the EPU is BUSY, keeping the time to wait before sending again
+    ## In the persistent mode, the refused ER is kept to be returned by takeRefused
+    def parseBusy(self, reply):
+        if not reply.startswith(b"BUSY"):
+            return False
+        fields = reply[4:].split()
+        try:
+            seconds = int(fields[0])
+        except (ValueError, IndexError):
+            seconds = 1
+        if len(fields) > 1:
+            self.putRefused(fields[1])
+        self.retryAfter = time.time() + seconds
+        if self.debug:
+            print ("The EPU is busy. Waiting", seconds, "seconds before sending ER...")
+        return True
+    
+    def putRefused(self, number):
+        try:
+            number = int(number)
+        except ValueError:
+            return
+        for (n, payload, tag) in self.sent:
+            if n == number:
+                self.refused.append((payload, tag))
+                return
+        if self.debug:
+            print ("The EPU refused an ER that is no longer kept:", number)
+    
+    ## ER (and their tags) refused by the EPU in the persistent mode since the last call
+    def takeRefused(self):
+        with self.lock:
+            if self.sock is not None:
+                try:
+                    self.readReplies()
+                except socket.error:
+                    self.close()
+            refused = self.refused
+            self.refused = []
+        return refused
+    
+    def waitEPU(self):
+        delay = self.retryAfter - time.time()
+        if delay > 0:
+            time.sleep(delay)
+    
+    ## Read the frames sent by the EPU in the persistent connection, without blocking
+    def readReplies(self):
+        while len(select.select([self.sock], [], [], 0)[0]) > 0:
+            data = self.sock.recv(4096)
+            if not data:
+                raise socket.error("Connection closed by the EPU")
+            self.replies = self.replies + data
+        
+        while len(self.replies) >= HEADER.size:
+            (size,) = HEADER.unpack_from(self.replies)
+            if len(self.replies) < HEADER.size + size:
+                break
+            self.parseBusy(self.replies[HEADER.size:HEADER.size + size])
+            self.replies = self.replies[HEADER.size + size:]
+    
+    def connect(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.settimeout(self.timeout)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            s.connect((self.ip, self.port))
+            s.sendall(MAGIC)
+            self.replies = b""
+            self.sequence = 0
+            self.sent.clear()
+        except socket.error:
+            s.close()
+            raise
+        
+        if self.debug:
+            print ("\nPersistent connection established to the EPU.")
+        self.sock = s
+        self.lastSent = time.time()
+    
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+            self.sock = None
+    
+    ## Keep-alive of an idle persistent connection. A failed connection is closed and reopened by the next ER
+    def ping(self):
+        with self.lock:
+            if self.sock is None or (time.time() - self.lastSent) < self.keepAlive:
+                return
+            try:
+                self.sock.sendall(HEADER.pack(0))
+                self.lastSent = time.time()
+            except socket.error:
+                self.close()
+
+## Thread that keeps the persistent connection alive
+class keepAliveThread (threading.Thread):
+    
+    def __init__(self, link):
+        threading.Thread.__init__(self, daemon=True)
+        self.link = link
+    
+    def run(self):
+        while True:
+            time.sleep(self.link.keepAlive / 2)
+            self.link.ping()
@@ -1,42 +1,118 @@
 # **************************************************
 # Accessory classes for the EDU
 # They model the concepts of Event of Interest and Events Report
+# The Events Report is shared by all components (cityalarm package,
+# in the root of the repository)
 # Author      : Daniel G. Costa
 # E-mail      : danielgcosta@uefs.br
 # Date        : 2019/09/01
 # **************************************************
 
-import json
+import os
+import sys
+import numpy as np
+
+## The shared package is in the parent directory of the EDU
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from cityalarm.elements import ER
 
 ## Models a list of all EI
+## Thresholds, comparisons and detected flags are kept in NumPy arrays indexed by the type (Y)
+## of the EI, so a whole vector of readings is evaluated against all EI at once (evaluate)
+## Each EI has a hysteresis band (a detected EI is only undetected when the reading is beyond the
+## threshold by more than the band) and minimum hold times (s) of the new state before it changes
 class ListEI:   
     
     def __init__(self):
         self.events = []
-    
-    def putEvent(self, y, th, math, txt):
+        self.byType = {}
+        self.threshold = np.zeros(1)
+        self.math = np.zeros(1, dtype=np.int8)
+        self.defined = np.zeros(1, dtype=bool)
+        self.detected = np.zeros(1, dtype=bool)
+        self.hysteresis = np.zeros(1)
+        self.holdOn = np.zeros(1)           # Time (s) the EI has to be sensed before it is detected
+        self.holdOff = np.zeros(1)          # Time (s) the EI has to be missing before it is undetected
+        self.since = np.full(1, np.nan)     # Since when the state of the EI is going to change (NaN if it is not)
+    
+    def putEvent(self, y, th, math, txt, hysteresis=0, holdOn=0, holdOff=0):
         ## math describes if the symbol is <= (0) or >= (1)
-        event = EI(y, th, math, txt)
-        self.events.append(event)        
-    
+        if y >= len(self.threshold):
+            self.resize(y + 1)
+        self.threshold[y] = th
+        self.math[y] = math
+        self.defined[y] = True
+        self.detected[y] = False
+        self.setDebounce(y, hysteresis, holdOn, holdOff)
+
+        event = EI(y, th, math, txt, self)
+        self.events.append(event)
+        self.byType[y] = event
+    
+    def resize(self, size):
+        grow = size - len(self.threshold)
+        self.threshold = np.concatenate((self.threshold, np.zeros(grow)))
+        self.math = np.concatenate((self.math, np.zeros(grow, dtype=np.int8)))
+        self.defined = np.concatenate((self.defined, np.zeros(grow, dtype=bool)))
+        self.detected = np.concatenate((self.detected, np.zeros(grow, dtype=bool)))
+        self.hysteresis = np.concatenate((self.hysteresis, np.zeros(grow)))
+        self.holdOn = np.concatenate((self.holdOn, np.zeros(grow)))
+        self.holdOff = np.concatenate((self.holdOff, np.zeros(grow)))
+        self.since = np.concatenate((self.since, np.full(grow, np.nan)))
+
+    def setDebounce(self, y, hysteresis=0, holdOn=0, holdOff=0):
+        self.hysteresis[y] = hysteresis
+        self.holdOn[y] = holdOn
+        self.holdOff[y] = holdOff
+        self.since[y] = np.nan
+
     def removeEvent(self, event):
         self.events.remove(event)
+        del self.byType[event.getType()]
+        self.defined[event.getType()] = False
+        self.detected[event.getType()] = False
     
     def getEvents (self):
         return self.events
     
     def getEventY (self, y):
-        for event in self.events:
-            if event.getType() == y:  #As the values of y are unique, there is only one answer here
-                return event
+        return self.byType.get(y)  #As the values of y are unique, there is only one answer here
     
     def getNumberDetectedEI(self):
-        numberEI = 0
-        for event in self.events:
-            if event.isDetected():
-                numberEI = numberEI + 1
-        
-        return numberEI
+        return int(np.count_nonzero(self.detected))
+
+    ## Types (Y) of the detected EI, in increasing order
+    def getDetectedTypes(self):
+        return np.nonzero(self.detected)[0].tolist()
+
+    ## Vector of readings for evaluate, indexed by type (Y). NaN means "not sensed"
+    def newReadings(self):
+        return np.full(len(self.threshold), np.nan)
+
+    ## Test all EI with a vector of readings (one value for each type), taken at the time now (s)
+    ## EI without a reading keep their state. The state of an EI only changes when the new state
+    ## was sensed for its hold time (hysteresis is applied to detected EI)
+    ## Returns the bitmask of the detected EI (bit y-1 for the type y, as in the binary ER) and their number
+    def evaluate(self, readings, now=0.0):
+        readings = np.asarray(readings, dtype=float)
+        sensed = self.defined & ~np.isnan(readings)
+        with np.errstate(invalid="ignore"):
+            hit = np.where(self.math == 1, readings >= self.threshold, readings <= self.threshold)
+            cleared = np.where(self.math == 1, readings < self.threshold - self.hysteresis, readings > self.threshold + self.hysteresis)
+        change = sensed & np.where(self.detected, cleared, hit)
+
+        ## Pending changes start now, and readings that confirm the current state cancel them
+        self.since[change & np.isnan(self.since)] = now
+        self.since[sensed & ~change] = np.nan
+
+        with np.errstate(invalid="ignore"):
+            flip = change & (now - self.since >= np.where(self.detected, self.holdOff, self.holdOn))
+        self.detected[flip] = ~self.detected[flip]
+        self.since[flip] = np.nan
+
+        mask = int.from_bytes(np.packbits(self.detected[1:], bitorder="little").tobytes(), "little")
+        return (mask, int(np.count_nonzero(self.detected)))
         
     def printValues(self):
         for event in self.events:
@@ -46,13 +122,15 @@ class ListEI:
                 print ("Type:",  event.getType(),  ": Threshold =", event.getThreshold(), ": Symbol is >=. Description:", event.getDescription())
 
 ## Models an Event of Interest
+## Its detected flag is kept in the arrays of its ListEI
 class EI:
+    __slots__ = ("y", "threshold", "math", "description", "table")
     
-    def __init__(self, idy, th, m, text):
+    def __init__(self, idy, th, m, text, table):
         self.y = idy
-        self.detected = False
         self.threshold = th
         self.math = m
+        self.table = table
         
         #this is not in CityAlarm paper, but it may help to "track" events
         self.description = text 
@@ -70,53 +148,10 @@ class EI:
         return self.math
 
     def setDetected (self):
-        self.detected = True
+        self.table.detected[self.y] = True
     
     def setUndetected (self):
-        self.detected = False
+        self.table.detected[self.y] = False
     
     def isDetected (self):
-        return self.detected
-    
-## Models an Events Report    
-class ER:
-    
-    def __init__(self, u, i, ts, latitude, longitude):
-        self.edu = u
-        self.id = i
-        self.timestamp = ts
-        self.gps = GPS(latitude,longitude)
-        self.events = []  # array of integers (types of detected events)
-    
-    def putEventType(self, y):        
-        self.events.append(y)
-
-    def getTimestamp (self):
-        return self.timestamp
-    
-    def getLatitude (self):
-        return self.la
-
-    def getLongitude (self):
-        return self.lo
-    
-    def getEventsTypes (self):
-        return self.events
-    
-    def getNumberEI(self):        
-        return len(self.events)  # Number of EI in the ER
-        
-    def printValues(self):
-        for y in self.events:
-            print ("Type =",  y)
-            
-    ## This is required to convert the ER to JSON
-    def toJSON(self):
-        return json.dumps(self,default=lambda o: o.__dict__,sort_keys=True, indent=4)
-   
-## Supportive class for the JSON convertion
-class GPS():
-    def __init__(self, latitude, longitude):
-        self.la = latitude
-        self.lo = longitude
-    
+        return bool(self.table.detected[self.y])
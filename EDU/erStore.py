@@ -0,0 +1,334 @@
+# **************************************************
+# Store-and-forward of the Events Reports (ER) of the EDU
+# ER are sent to the EPU by a forwarder thread, so the sensing is never
+# blocked by the network. When the EPU can not be reached, ER are kept in
+# bounded rings of append-only segment files (on the SD card) and sent in
+# order once the EPU is back, at a limited rate and with exponential
+# backoff between failed attempts
+# There are two lanes: urgent ER (new detections) are always sent before
+# the backlog of refreshes, so the backlog never delays fresh reports
+# When a ring is full, its oldest segment is discarded
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# **************************************************
+
+import collections
+import glob
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+
+###############
+RECORD = struct.Struct(">II")   # length of the ER, crc32 of the ER
+CURSOR = struct.Struct(">QQ")   # segment and offset of the next ER to be sent
+
+## Ring of segment files with the ER waiting for the EPU
+class erStore:
+
+    def __init__(self, directory, segmentSize=64 * 1024, maxSegments=16):
+        self.directory = directory
+        self.segmentSize = segmentSize
+        self.maxSegments = maxSegments
+        self.lock = threading.Lock()
+        self.dropped = 0  # ER discarded because the ring was full
+
+        os.makedirs(directory, exist_ok=True)
+        self.segments = sorted(int(os.path.basename(name)[6:-4]) for name in glob.glob(os.path.join(directory, "store-*.log")))
+        self.next = (self.segments[-1] + 1) if self.segments else 1  # Number of the next segment
+
+        ## Position of the next ER to be sent
+        (self.segment, self.offset) = (self.segments[0] if self.segments else 1, 0)
+        try:
+            with open(os.path.join(directory, "cursor"), "rb") as f:
+                (segment, offset) = CURSOR.unpack(f.read(CURSOR.size))
+            if segment in self.segments:
+                (self.segment, self.offset) = (segment, offset)
+            self.next = max(self.next, segment + 1)
+        except (OSError, struct.error):
+            pass
+
+        ## Pending ER of the previous execution (a torn record ends its segment)
+        ## Segments whose ER were all sent are deleted
+        self.pending = 0
+        for s in list(self.segments):
+            count = len(self.readSegment(s, self.offset if s == self.segment else 0)) if s >= self.segment else 0
+            if count == 0 and s == self.segments[0]:
+                os.remove(self.path(s))
+                self.segments.pop(0)
+                continue
+            self.pending = self.pending + count
+        if len(self.segments) > 0 and self.segment != self.segments[0]:
+            (self.segment, self.offset) = (self.segments[0], 0)
+
+        ## New ER always go to a new segment, created by the first put (restarts do not fill the ring)
+        self.file = None
+        self.written = 0
+        self.sent = 0
+
+        ## Segments written since the last sync (fsync is done by the forwarder, not by the sensing)
+        self.dirty = False
+        self.closing = []  # Full segments, closed by the next sync
+
+        ## Records (offset, ER) of the segment being read, from the cursor, so each record is read once
+        self.reading = collections.deque()
+
+    def path(self, segment):
+        return os.path.join(self.directory, "store-%08d.log" % segment)
+
+    ## Records (offset, ER) of a segment, from the given offset
+    def readSegment(self, segment, offset):
+        records = []
+        try:
+            with open(self.path(segment), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return records
+
+        position = 0
+        while position + RECORD.size <= len(data):
+            (size, crc) = RECORD.unpack_from(data, position)
+            payload = data[position + RECORD.size:position + RECORD.size + size]
+            if len(payload) < size or zlib.crc32(payload) != crc:
+                break
+            records.append((offset + position, payload))
+            position = position + RECORD.size + size
+        return records
+
+    def openSegment(self):
+        number = self.next
+        self.next = self.next + 1
+        if len(self.segments) == 0:
+            (self.segment, self.offset) = (number, 0)
+            self.saveCursor()
+        self.segments.append(number)
+        self.file = open(self.path(number), "ab")
+        self.written = 0
+
+        ## The ring is bounded: the oldest segment is discarded
+        while len(self.segments) > self.maxSegments:
+            self.dropSegment()
+
+    def dropSegment(self):
+        oldest = self.segments.pop(0)
+        if oldest == self.segment:
+            lost = len(self.readSegment(oldest, self.offset))
+            (self.segment, self.offset) = (self.segments[0], 0)
+            self.reading.clear()
+            self.saveCursor()
+        else:
+            lost = len(self.readSegment(oldest, 0))
+        self.dropped = self.dropped + lost
+        self.pending = self.pending - lost
+        try:
+            os.remove(self.path(oldest))
+        except OSError:
+            pass
+
+    ## Append an ER. It is handed to the OS at once and made durable by the next sync
+    def put(self, payload):
+        with self.lock:
+            if self.file is None:
+                self.openSegment()
+            elif self.written > 0 and self.written + RECORD.size + len(payload) > self.segmentSize:
+                self.closing.append(self.file)
+                self.openSegment()
+            self.file.write(RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.file.flush()
+            self.written = self.written + RECORD.size + len(payload)
+            self.pending = self.pending + 1
+            self.dirty = True
+
+    ## Write the stored ER to the disk (fsync), out of the lock, so put is not blocked by the SD card
+    def sync(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            (closing, current) = (self.closing, self.file)
+            self.closing = []
+            self.dirty = False
+        for f in closing:
+            os.fsync(f.fileno())
+            f.close()
+        try:
+            if current is not None:
+                os.fsync(current.fileno())
+        except (OSError, ValueError):
+            pass  # Closed meanwhile (close syncs it)
+
+    ## The next ER to be sent, as (segment, offset, ER), or None
+    def peek(self):
+        with self.lock:
+            while self.pending > 0:
+                if len(self.reading) == 0:
+                    self.reading.extend(self.readSegment(self.segment, self.offset))
+                if len(self.reading) > 0:
+                    (offset, payload) = self.reading[0]
+                    return (self.segment, offset, payload)
+
+                ## End of a segment (all its ER were sent): the next one is read
+                if len(self.segments) == 0 or self.segment == self.segments[-1]:
+                    return None
+                os.remove(self.path(self.segment))
+                self.segments.remove(self.segment)
+                (self.segment, self.offset) = (self.segments[0], 0)
+                self.saveCursor()
+            return None
+
+    ## The ER returned by peek (its token) was received by the EPU
+    ## It is ignored if its segment was discarded meanwhile (the ER was already counted as dropped)
+    def advance(self, token):
+        (segment, offset, payload) = token
+        with self.lock:
+            if (segment, offset) != (self.segment, self.offset):
+                return
+            self.reading.popleft()
+            self.offset = self.offset + RECORD.size + len(payload)
+            self.pending = self.pending - 1
+            self.sent = self.sent + 1
+            self.saveCursor()
+
+    def saveCursor(self):
+        name = os.path.join(self.directory, "cursor")
+        with open(name + ".tmp", "wb") as f:
+            f.write(CURSOR.pack(self.segment, self.offset))
+        os.replace(name + ".tmp", name)
+
+    def size(self):
+        return self.pending
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            for f in self.closing:
+                f.close()
+            self.closing = []
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+##########################################################################
+
+## Thread that sends the ER to the EPU (link is an epuConnection)
+## rate is the maximum number of stored ER sent per second after the EPU is back
+class erForwarder (threading.Thread):
+
+    def __init__(self, link, directory, rate=5, maxBackoff=60):
+        threading.Thread.__init__(self, daemon=True)
+        self.link = link
+        self.rate = rate
+        self.maxBackoff = maxBackoff
+
+        self.urgent = erStore(os.path.join(directory, "urgent"))
+        self.backlog = erStore(os.path.join(directory, "backlog"))
+
+        ## ER not yet stored: (urgent, ER)
+        self.fresh = collections.deque()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+        self.down = False     # The last attempt failed
+        self.backoff = 1      # Waiting (s) after the next failure
+        self.nextBacklog = 0  # Time of the next ER of the backlog (rate limit)
+
+    ## Queue an ER to be sent. Urgent ER (new detections) go before the backlog
+    ## While the EPU is down, or behind a backlog, the ER is stored at once
+    def put(self, payload, urgent=False):
+        with self.lock:
+            if urgent and not self.down:
+                self.fresh.append((True, payload))
+            elif urgent:
+                self.urgent.put(payload)
+            elif self.down or self.backlog.size() > 0:
+                self.backlog.put(payload)
+            else:
+                self.fresh.append((False, payload))
+        self.wake.set()
+
+    ## Next ER to be sent: (lane, token, ER, urgent). lane is the erStore of a stored ER (token
+    ## is its position, returned by peek), or None
+    def next(self):
+        with self.lock:
+            for k, (urgent, payload) in enumerate(self.fresh):
+                if urgent:
+                    del self.fresh[k]
+                    return (None, None, payload, True)
+
+        token = self.urgent.peek()
+        if token is not None:
+            return (self.urgent, token, token[2], True)
+
+        with self.lock:
+            if len(self.fresh) > 0:
+                return (None, None, self.fresh.popleft()[1], False)
+
+        if time.time() >= self.nextBacklog:
+            token = self.backlog.peek()
+            if token is not None:
+                self.nextBacklog = time.time() + 1.0 / self.rate
+                return (self.backlog, token, token[2], False)
+        return None
+
+    def run(self):
+        while True:
+            self.urgent.sync()
+            self.backlog.sync()
+            item = self.next()
+            if item is None:
+                self.storeRefused()
+
+                ## Waits for a new ER (or for the next ER of the backlog)
+                self.wake.wait(max(0.01, min(1.0, self.nextBacklog - time.time())) if self.backlog.size() > 0 else 1.0)
+                self.wake.clear()
+                continue
+
+            (lane, token, payload, urgent) = item
+            try:
+                self.link.send(payload, urgent)
+            except socket.error as e:
+                self.failed(lane, payload, urgent, e)
+                continue
+
+            if lane is not None:
+                lane.advance(token)
+            if self.down:
+                print ("The EPU is reachable again.", self.urgent.size() + self.backlog.size(), "stored ER will be sent")
+            self.down = False
+            self.backoff = 1
+            self.storeRefused()
+
+    ## ER refused by an overloaded EPU (persistent mode) are stored to be sent again
+    def storeRefused(self):
+        for (payload, urgent) in self.link.takeRefused():
+            with self.lock:
+                (self.urgent if urgent else self.backlog).put(payload)
+
+    def failed(self, lane, payload, urgent, error):
+        with self.lock:
+            if lane is None:
+                (self.urgent if urgent else self.backlog).put(payload)
+
+            ## Fresh ER are not sent while the EPU is down: they are stored, in order
+            while len(self.fresh) > 0:
+                (u, p) = self.fresh.popleft()
+                (self.urgent if u else self.backlog).put(p)
+            self.down = True
+
+        print ("The EPU could not be contacted:", error, "- ER are stored. Trying again in", self.backoff, "seconds")
+
+        ## ER stored while waiting are written to the disk every second
+        retry = time.time() + self.backoff
+        while time.time() < retry:
+            self.urgent.sync()
+            self.backlog.sync()
+            time.sleep(max(0, min(1.0, retry - time.time())))
+        self.backoff = min(self.maxBackoff, self.backoff * 2)
+
+    def getStatus(self):
+        return {"down": self.down, "urgent": self.urgent.size(), "backlog": self.backlog.size(),
+                "sent": self.urgent.sent + self.backlog.sent, "dropped": self.urgent.dropped + self.backlog.dropped}
@@ -1,6 +1,8 @@
 # **************************************************
 # Accessory class to acess the GPS module (grove)
 # Adapted from http://wiki.seeedstudio.com/Grove-GPS/ and dextergps.py example
+# gpsTracker reads the NMEA stream continuously in a thread of its own and
+# publishes the latest fix as an immutable snapshot, read at no cost by the EDU
 # Author      : Daniel G. Costa
 # E-mail      : danielgcosta@uefs.br
 # Date        : 2019/09/01
@@ -10,6 +12,8 @@ import serial
 import time
 import sys
 import re
+import threading
+import collections
 
 ###############
 ## When the GPS can not find signal and retrive current GPS coordinates
@@ -153,3 +157,127 @@ class groveGPS:
             print( "FAILED: invalid value")
 
         return True
+
+###############
+## Latest position of the GPS. Fixes are immutable, so a reader never sees a partial update
+## timestamp is the UTC time (hhmmss.ss) of the fix and received is its time.monotonic()
+gpsFix = collections.namedtuple("gpsFix", ["latitude", "longitude", "altitude", "speed", "course",
+                                           "quality", "satellites", "timestamp", "received"])
+
+## Longest NMEA sentence accepted (the standard limit is 82 characters)
+maxSentence = 120
+
+## Verify the checksum of a sentence ($...*HH). Returns its fields, or None
+def parseSentence(line):
+    if len(line) < 9 or line[0] != "$" or line[-3] != "*":
+        return None
+    checksum = 0
+    for c in line[1:-3]:
+        checksum ^= ord(c)
+    try:
+        if checksum != int(line[-2:], 16):
+            return None
+    except ValueError:
+        return None
+    return line[1:-3].split(",")
+
+## ddmm.mmmm and hemisphere -> degrees and decimals
+def toDegrees(value, hemisphere):
+    value = float(value)
+    degrees = value // 100 + value % 100 / 60
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+## Thread that reads the GPS. The position of the EDU is getFix() (None until the first fix)
+class gpsTracker (threading.Thread):
+
+    def __init__(self, port='/dev/ttyAMA0', baud=9600):
+        threading.Thread.__init__(self, daemon=True)
+        self.port = port
+        self.baud = baud
+        self.ser = None
+
+        self.fix = None  # Replaced (never changed) by the reader thread
+        self.located = threading.Event()
+        self.buffer = bytearray()
+
+        ## Last values of the sentences that do not carry them (speed and course come from RMC)
+        self.altitude = None
+        self.quality = 0
+        self.satellites = 0
+        self.speed = None
+        self.course = None
+
+        self.sentences = 0
+        self.invalid = 0   # Mangled sentences or wrong checksums
+
+    def getFix(self):
+        return self.fix
+
+    ## Wait (s) for the first fix. Returns the fix, or None
+    def waitFix(self, timeout):
+        self.located.wait(timeout)
+        return self.fix
+
+    def run(self):
+        while True:
+            try:
+                if self.ser is None:
+                    self.ser = serial.Serial(self.port, self.baud, timeout=1)
+                self.feed(self.ser.read(self.ser.in_waiting or 1))
+            except (IOError, OSError) as e:
+                print ("GPS module is unavailable:", e)
+                self.ser = None
+                time.sleep(1)
+
+    ## Incremental parser: bytes of the serial stream are split in sentences
+    def feed(self, data):
+        self.buffer.extend(data)
+        while True:
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                ## A line without end is discarded
+                if len(self.buffer) > maxSentence:
+                    del self.buffer[:]
+                    self.invalid = self.invalid + 1
+                return
+            line = bytes(self.buffer[:end])
+            del self.buffer[:end + 1]
+
+            ## Sometimes multiple GPS data packets come into the stream. The last one is taken
+            start = line.rfind(b"$")
+            if start < 0:
+                continue
+            self.sentences = self.sentences + 1
+            try:
+                self.handleSentence(line[start:].decode("ascii").strip())
+            except (UnicodeDecodeError, ValueError, IndexError):
+                self.invalid = self.invalid + 1
+
+    def handleSentence(self, line):
+        fields = parseSentence(line)
+        if fields is None:
+            self.invalid = self.invalid + 1
+            return
+
+        ## Any talker (GP, GN, GL...)
+        kind = fields[0][2:]
+        if kind == "GGA" and len(fields) >= 10:
+            self.quality = int(fields[6] or 0)
+            self.satellites = int(fields[7] or 0)
+            self.altitude = float(fields[9]) if fields[9] else None
+            if self.quality > 0 and fields[2] and fields[4]:
+                self.publish(toDegrees(fields[2], fields[3]), toDegrees(fields[4], fields[5]), fields[1])
+
+        elif kind == "RMC" and len(fields) >= 9:
+            if fields[2] == "A" and fields[3] and fields[5]:
+                self.speed = float(fields[7]) * 0.514444 if fields[7] else None  # knots -> m/s
+                self.course = float(fields[8]) if fields[8] else None
+                self.publish(toDegrees(fields[3], fields[4]), toDegrees(fields[5], fields[6]), fields[1])
+
+    def publish(self, latitude, longitude, timestamp):
+        self.fix = gpsFix(latitude, longitude, self.altitude, self.speed, self.course,
+                          self.quality, self.satellites, timestamp, time.monotonic())
+        self.located.set()
+
+    def getStatus(self):
+        return {"fix": self.fix, "sentences": self.sentences, "invalid": self.invalid}
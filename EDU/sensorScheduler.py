@@ -0,0 +1,157 @@
+# *********************************************************************
+# Sampling scheduler of the sensors of the EDU
+# Each sensor has its own period and deadline. Fast reads are done by the
+# scheduler thread at their time, while slow reads (the DHT, for example)
+# are done by a reader thread of their own, so they never delay the other
+# sensors. The latency of the reads of each sensor and the jitter of the
+# scheduler (delay between the planned and the actual time of a read) are
+# measured and can be printed as a report
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import collections
+import heapq
+import threading
+import time
+
+########################################################
+
+## Number of recent measures kept to compute the percentiles of a sensor
+window = 256
+
+def percentile(values, p):
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+########################################################
+
+## A sensor read periodically. read() returns the sensed value, given to callback(value)
+## A read longer than the deadline (s) is a deadline miss (the value is still used)
+class sensorTask():
+    def __init__(self, name, period, read, callback, deadline=None, slow=False):
+        self.name = name
+        self.period = period
+        self.read = read
+        self.callback = callback
+        self.deadline = deadline if deadline is not None else period
+        self.slow = slow
+
+        self.latencies = collections.deque(maxlen=window)
+        self.jitters = collections.deque(maxlen=window)
+        self.reads = 0
+        self.misses = 0    # Reads longer than the deadline
+        self.skipped = 0   # Reads not done because the previous one was still running
+        self.errors = 0
+        self.value = None
+        self.busy = False
+
+        if slow:
+            self.requests = collections.deque()
+            self.ready = threading.Event()
+            threading.Thread(target=self.runReader, daemon=True).start()
+
+    ## Read the sensor and give the value to the callback
+    ## Errors of the read or of the callback (display, storage of ER) are counted and the sensing goes on
+    def sample(self, scheduled):
+        start = time.monotonic()
+        self.jitters.append(start - scheduled)
+        try:
+            value = self.read()
+        except (IOError, TypeError, ValueError) as e:
+            self.errors = self.errors + 1
+            print ("Error when reading the sensor", self.name, ":", e)
+            return
+        finally:
+            latency = time.monotonic() - start
+            self.latencies.append(latency)
+            self.reads = self.reads + 1
+            if latency > self.deadline:
+                self.misses = self.misses + 1
+
+        self.value = value
+        try:
+            self.callback(value)
+        except (IOError, TypeError, ValueError) as e:
+            self.errors = self.errors + 1
+            print ("Error when processing the value of the sensor", self.name, ":", e)
+
+    ## Slow reads wait for the reader thread of the sensor
+    def submit(self, scheduled):
+        if self.busy:
+            self.skipped = self.skipped + 1
+            return
+        self.busy = True
+        self.requests.append(scheduled)
+        self.ready.set()
+
+    def runReader(self):
+        while True:
+            self.ready.wait()
+            self.ready.clear()
+            while len(self.requests) > 0:
+                try:
+                    self.sample(self.requests.popleft())
+                finally:
+                    self.busy = False
+
+    def getStatus(self):
+        latencies = list(self.latencies)
+        jitters = list(self.jitters)
+        return {"sensor": self.name, "period": self.period, "value": self.value, "reads": self.reads,
+                "latency_p50": percentile(latencies, 50), "latency_p99": percentile(latencies, 99),
+                "latency_max": max(latencies, default=0.0), "jitter_p50": percentile(jitters, 50),
+                "jitter_p99": percentile(jitters, 99), "jitter_max": max(jitters, default=0.0),
+                "misses": self.misses, "skipped": self.skipped, "errors": self.errors}
+
+########################################################
+
+class sensorScheduler(threading.Thread):
+    ## The report of the sensors is printed every reportInterval seconds (0 disables it)
+    def __init__(self, tasks, reportInterval=0):
+        threading.Thread.__init__(self, daemon=True)
+        self.tasks = tasks
+        self.reportInterval = reportInterval
+
+    def run(self):
+        now = time.monotonic()
+        planned = [(now, k) for k in range(len(self.tasks))]
+        heapq.heapify(planned)
+        nextReport = now + self.reportInterval
+
+        while True:
+            (scheduled, k) = heapq.heappop(planned)
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            task = self.tasks[k]
+            if task.slow:
+                task.submit(scheduled)
+            else:
+                task.sample(scheduled)
+
+            ## Next read of the sensor. Reads that were already missed are not done later
+            following = scheduled + task.period
+            now = time.monotonic()
+            if following < now:
+                task.skipped = task.skipped + int((now - following) / task.period) + 1
+                following = now + task.period - ((now - scheduled) % task.period)
+            heapq.heappush(planned, (following, k))
+
+            if self.reportInterval > 0 and now >= nextReport:
+                nextReport = now + self.reportInterval
+                self.printReport()
+
+    def getStatus(self):
+        return [task.getStatus() for task in self.tasks]
+
+    def printReport(self):
+        print ("\nSensor        period(s)  reads  latency p50/p99/max (ms)   jitter p50/p99/max (ms)  misses skipped errors")
+        for s in self.getStatus():
+            print ("%-12s %9.2f %6d  %7.2f %7.2f %8.2f  %7.2f %7.2f %8.2f  %6d %7d %6d" %
+                   (s["sensor"], s["period"], s["reads"], s["latency_p50"] * 1000, s["latency_p99"] * 1000, s["latency_max"] * 1000,
+                    s["jitter_p50"] * 1000, s["jitter_p99"] * 1000, s["jitter_max"] * 1000, s["misses"], s["skipped"], s["errors"]))
@@ -0,0 +1,67 @@
+# *********************************************************************
+# Rolling-window filters of the readings of the sensors of the EDU
+# Each sensor keeps its last readings (and their times) in a preallocated
+# NumPy ring buffer, and its readings are replaced by the moving average,
+# the median or the rate of change (per second) of the window before the
+# EI are evaluated, so isolated spikes of noisy sensors (MQ-2, sound) do
+# not change the detected EI. Failed reads (NaN, such as those of the DHT)
+# are discarded and never enter the window
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import numpy as np
+
+########################################################
+
+## Kinds of filters: "none" (the reading itself), "mean", "median" and "rate"
+kinds = ("none", "mean", "median", "rate")
+
+class rollingFilter():
+    def __init__(self, kind="none", size=1):
+        if kind not in kinds:
+            raise ValueError("Unknown filter: " + str(kind))
+        if size < 1 or (kind == "rate" and size < 2):
+            raise ValueError("Invalid window size for the filter " + kind + ": " + str(size))
+
+        self.kind = kind
+        self.size = int(size)
+        self.values = np.zeros(self.size)
+        self.times = np.zeros(self.size)
+        self.position = 0  # Where the next reading is written
+        self.count = 0     # Readings in the window
+
+    ## Put a reading taken at the time t (s) and return the filtered value
+    ## Returns None for a failed read (not finite), and for the rate of change until the window has two readings
+    def put(self, value, t):
+        value = float(value)
+        if not np.isfinite(value):
+            return None
+
+        if self.count < self.size:
+            self.count = self.count + 1
+        self.values[self.position] = value
+        self.times[self.position] = t
+        self.position = (self.position + 1) % self.size
+
+        if self.kind == "mean":
+            return float(np.mean(self.values[:self.count]))
+        if self.kind == "median":
+            return float(np.median(self.values[:self.count]))
+        if self.kind == "rate":
+            oldest = self.position if self.count == self.size else 0
+            elapsed = t - self.times[oldest]
+            if self.count < 2 or elapsed <= 0:
+                return None
+            return float((value - self.values[oldest]) / elapsed)
+        return value
+
+    def reset(self):
+        self.position = 0
+        self.count = 0
+
+## filter:size (for example, median:5) -> rollingFilter
+def parseFilter(spec):
+    (kind, _, size) = spec.partition(":")
+    return rollingFilter(kind, int(size or 1))
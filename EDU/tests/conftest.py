@@ -0,0 +1,15 @@
+# *********************************************************************
+# The modules of the EDU import each other by name, as when edu.py runs
+# from its directory, and the shared package from the root of the repository
+# (edu.py itself needs the GrovePi and is not imported by the tests)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import os
+import sys
+
+directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(directory))
+sys.path.insert(0, directory)
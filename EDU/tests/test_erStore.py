@@ -0,0 +1,93 @@
+# *********************************************************************
+# Tests of the ring of stored ER of the EDU (erStore)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import glob
+import os
+
+from erStore import erStore
+
+########################################################
+
+## Send (peek and advance) all stored ER
+def drain(store):
+    sent = []
+    while True:
+        token = store.peek()
+        if token is None:
+            return sent
+        store.advance(token)
+        sent.append(token[2])
+
+def testERAreSentInOrder(tmp_path):
+    store = erStore(str(tmp_path), segmentSize=100)
+    payloads = [b"er%03d" % k for k in range(50)]
+    for p in payloads:
+        store.put(p)
+    store.sync()
+
+    assert store.size() == 50
+    assert drain(store) == payloads
+    assert (store.size(), store.sent, store.dropped) == (0, 50, 0)
+
+    ## Sent segments are deleted, but the one being written
+    assert len(glob.glob(os.path.join(str(tmp_path), "store-*.log"))) == 1
+    store.close()
+
+def testPendingERSurviveARestart(tmp_path):
+    store = erStore(str(tmp_path), segmentSize=64)
+    for k in range(20):
+        store.put(b"er%03d" % k)
+    for k in range(5):
+        store.advance(store.peek())
+    store.close()
+
+    store = erStore(str(tmp_path), segmentSize=64)
+    assert store.size() == 15
+    store.put(b"new")
+    assert drain(store) == [b"er%03d" % k for k in range(5, 20)] + [b"new"]
+    store.close()
+
+def testTornRecordEndsItsSegment(tmp_path):
+    store = erStore(str(tmp_path))
+    for k in range(3):
+        store.put(b"er%03d" % k)
+    store.close()
+
+    [name] = glob.glob(os.path.join(str(tmp_path), "store-*.log"))
+    with open(name, "r+b") as f:
+        f.truncate(os.path.getsize(name) - 2)
+
+    store = erStore(str(tmp_path))
+    assert drain(store) == [b"er000", b"er001"]
+    store.close()
+
+def testFullRingDropsTheOldestSegment(tmp_path):
+    store = erStore(str(tmp_path), segmentSize=100, maxSegments=3)
+    for k in range(100):
+        store.put(b"x%03d" % k)
+
+    assert len(glob.glob(os.path.join(str(tmp_path), "store-*.log"))) == 3
+    assert store.size() + store.dropped == 100
+    sent = drain(store)
+    assert sent == [b"x%03d" % k for k in range(store.dropped, 100)]
+    store.close()
+
+def testAdvanceOfADroppedSegmentIsIgnored(tmp_path):
+    store = erStore(str(tmp_path), segmentSize=100, maxSegments=2)
+    for k in range(3):
+        store.put(b"a" * (10 + k))
+    token = store.peek()
+
+    ## The ring overflows while the ER is being sent: its segment is discarded
+    for k in range(20):
+        store.put(b"b" * 40)
+    pending = store.size()
+    store.advance(token)
+    assert (store.size(), store.sent) == (pending, 0)
+
+    assert drain(store) == [b"b" * 40] * pending
+    store.close()
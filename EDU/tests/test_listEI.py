@@ -0,0 +1,87 @@
+# *********************************************************************
+# Tests of the evaluation of the EI (ListEI), with hysteresis and hold times
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import numpy as np
+
+from elementsEDU import ListEI
+from signalFilters import rollingFilter
+
+########################################################
+
+def createList(**debounce):
+    events = ListEI()
+    events.putEvent(1, 40, 1, "Heating", **debounce)   # >= 40
+    events.putEvent(2, 5, 0, "Freezing")               # <= 5
+    events.putEvent(4, 600, 1, "Smoke")
+    return events
+
+def evaluate(events, now, **values):
+    readings = events.newReadings()
+    for name, value in values.items():
+        readings[{"temperature": 1, "smoke": 4}[name]] = value
+    if "temperature" in values:
+        readings[2] = values["temperature"]
+    return events.evaluate(readings, now)
+
+def testReadingsAreEvaluatedTogether():
+    events = createList()
+
+    assert evaluate(events, 0, temperature=42, smoke=700) == (0b1001, 2)
+    assert events.getDetectedTypes() == [1, 4]
+    assert evaluate(events, 1, temperature=3) == (0b1010, 2)
+
+    ## EI without a reading keep their state
+    assert evaluate(events, 2) == (0b1010, 2)
+    assert events.getEventY(4).isDetected()
+
+def testHysteresisKeepsTheEIDetected():
+    events = createList(hysteresis=2)
+
+    evaluate(events, 0, temperature=41)
+    for t in (39.5, 38.5, 40.5, 38.1):
+        evaluate(events, 1, temperature=t)
+        assert events.getEventY(1).isDetected()
+
+    evaluate(events, 2, temperature=37.9)
+    assert not events.getEventY(1).isDetected()
+
+def testHoldTimes():
+    events = createList(holdOn=10, holdOff=30)
+
+    ## A spike shorter than the hold time is not detected
+    evaluate(events, 0, temperature=45)
+    evaluate(events, 5, temperature=20)
+    evaluate(events, 12, temperature=45)
+    assert not events.getEventY(1).isDetected()
+
+    evaluate(events, 20, temperature=45)
+    evaluate(events, 22, temperature=45)
+    assert events.getEventY(1).isDetected()
+
+    evaluate(events, 30, temperature=20)
+    evaluate(events, 59, temperature=20)
+    assert events.getEventY(1).isDetected()
+    evaluate(events, 60, temperature=20)
+    assert not events.getEventY(1).isDetected()
+
+def testFilteredSpikeIsNotDetected():
+    events = createList()
+    median = rollingFilter("median", 5)
+
+    for k, value in enumerate([300, 310, 2000, 305, float("nan"), 298]):
+        filtered = median.put(value, k)
+        if filtered is not None:
+            evaluate(events, k, smoke=filtered)
+        assert not events.getEventY(4).isDetected()
+    assert median.count == 5
+
+def testRateOfChange():
+    rate = rollingFilter("rate", 3)
+    assert rate.put(10, 0) is None
+    assert rate.put(14, 2) == 2.0
+    assert rate.put(20, 4) == 2.5
+    assert np.isclose(rate.put(21, 5), 7 / 3)
@@ -0,0 +1,116 @@
+# *********************************************************************
+# This class keeps the state of the active Emergency Alarms (EA) of the EPU
+# Each EDU refreshes its ER periodically. The refreshes of the same set of
+# events update the existing EA, which is only published again when its
+# severity level changes (or once every timeout, so the EAC know it is still
+# active). EA that are not refreshed expire and are cleared
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import threading
+import time
+
+########################################################
+
+## State of an active EA
+class alarmState():
+    def __init__(self, key, ea, now):
+        self.key = key
+        self.ea = ea
+        self.lastSeen = now
+        self.published = now
+
+########################################################
+
+class alarmTable():
+    ## timeout is the time (seconds) after which an EA that was not refreshed is cleared
+    ## clock returns the current time (s). The replay of a trace uses the time of the trace
+    def __init__(self, timeout, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self.alarms = {}  # (edu, events) -> alarmState
+        self.byEDU = {}   # edu -> current key of the EDU
+        self.lock = threading.Lock()
+
+    ## Register a computed EA (without id) for the ER of an EDU
+    ## newId is called to get the id of a new EA
+    ## When byEvents is False, the EA of the EDU (or other source) is kept even if its events change
+    ## Returns the list of EA to be published (updated, new and cleared EA)
+    def update(self, edu, ea, newId, byEvents=True):
+        if byEvents:
+            key = (str(edu), frozenset(ea.getEventsTypes()))
+        else:
+            key = (str(edu), None)
+        now = self.clock()
+        publish = []
+
+        with self.lock:
+            state = self.alarms.get(key)
+
+            if state is not None:
+                ## Refresh of an active EA
+                state.lastSeen = now
+                ea.setId(state.ea.getId())
+                if ea.getSeverityLevel() != state.ea.getSeverityLevel() or set(ea.getEventsTypes()) != set(state.ea.getEventsTypes()) \
+                   or (now - state.published) >= self.timeout:
+                    state.ea = ea
+                    state.published = now
+                    publish.append(ea)
+                return publish
+
+            ## The events of the EDU changed: the previous EA is cleared
+            previous = self.byEDU.get(key[0])
+            if previous is not None and previous in self.alarms:
+                old = self.alarms.pop(previous).ea
+                old.setCleared()
+                publish.append(old)
+
+            ea.setId(newId())
+            self.alarms[key] = alarmState(key, ea, now)
+            self.byEDU[key[0]] = key
+            publish.append(ea)
+
+        return publish
+
+    ## Tells if an EDU already has an active EA with the given events
+    def isActive(self, edu, events):
+        with self.lock:
+            key = self.byEDU.get(str(edu))
+            if key is None or key not in self.alarms:
+                return False
+            return key[1] is None or key[1] == frozenset(events)
+
+    ## Remove the EA of an EDU (or other source). Returns the cleared EA
+    def remove(self, edu):
+        cleared = []
+
+        with self.lock:
+            key = self.byEDU.pop(str(edu), None)
+            if key is not None and key in self.alarms:
+                ea = self.alarms.pop(key).ea
+                ea.setCleared()
+                cleared.append(ea)
+
+        return cleared
+
+    ## Remove the EA that were not refreshed in time. Returns the cleared EA
+    def expire(self):
+        now = self.clock()
+        cleared = []
+
+        with self.lock:
+            for key in list(self.alarms):
+                state = self.alarms[key]
+                if (now - state.lastSeen) > self.timeout:
+                    del self.alarms[key]
+                    if self.byEDU.get(key[0]) == key:
+                        del self.byEDU[key[0]]
+                    state.ea.setCleared()
+                    cleared.append(state.ea)
+
+        return cleared
+
+    def getNumberAlarms(self):
+        return len(self.alarms)
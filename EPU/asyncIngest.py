@@ -0,0 +1,125 @@
+# *********************************************************************
+# This class receives Events Reports (ER) from the EDUs using asyncio
+# A single event loop accepts all the connections and reads the ER (single
+# or framed, see erFraming), while the EA are computed and published by the
+# fixed pool of threads of an ingest queue (see erQueue)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import asyncio
+
+import epuMetrics
+import erFraming
+from cityalarm.eventLog import getLogger
+from erFraming import MAGIC, HEADER, encodeFrame, encodeBusy
+
+logIngest = getLogger("ingest")
+
+########################################################
+
+class asyncERServer():
+    ## parser converts the received data (bytes) into an ER (or None)
+    ## queue is the ingestQueue whose workers compute and transmit the EA
+    ## reusePort allows many processes to receive ER at the same port
+    def __init__(self, port, parser, queue, workers, debug, reusePort=False):
+        self.port = port
+        self.reusePort = reusePort
+        self.parser = parser
+        self.queue = queue
+        self.workers = workers
+        self.debug = debug
+
+        ## Maximum size of an ER, to protect the EPU from misbehaving EDUs
+        self.maxSize = erFraming.maxSize
+
+    def serve(self):
+        asyncio.run(self.run())
+
+    async def run(self):
+        server = await asyncio.start_server(self.receiveER, "", self.port, reuse_port=self.reusePort or None)
+        async with server:
+            await server.serve_forever()
+
+    ## Called by the event loop for each connected EDU
+    async def receiveER(self, reader, writer):
+        start = epuMetrics.now()
+        addr = writer.get_extra_info("peername")
+        logIngest.trace("edu_connected", address=addr[0], port=addr[1])
+
+        try:
+            ## The first bytes tell if the EDU uses a framed (persistent) connection
+            try:
+                received = await reader.readexactly(len(MAGIC))
+            except asyncio.IncompleteReadError as e:
+                received = e.partial
+
+            if received == MAGIC:
+                await self.receiveFramed(reader, writer)
+            else:
+                await self.receiveSingle(reader, writer, received, start)
+
+        except (ConnectionError, ValueError) as e:
+            logIngest.error("receive_failed", error=str(e))
+            epuMetrics.increment("errors_connection_total")
+
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    ## The EDU sends a single ER and closes the connection
+    async def receiveSingle(self, reader, writer, received, start):
+        while len(received) < self.maxSize:
+            data = await reader.read(self.maxSize - len(received))
+            if not data:
+                break
+            received = received + data
+        epuMetrics.observe("recv", start)
+
+        if not await self.submitER(received):
+            writer.write(encodeBusy(self.queue.getRetryHint(self.workers)))
+            await writer.drain()
+
+    ## Many ER are received through the same connection, each one prefixed by its length
+    async def receiveFramed(self, reader, writer):
+        sequence = 0  # Number of the ER in the connection
+        while True:
+            try:
+                header = await reader.readexactly(HEADER.size)
+            except asyncio.IncompleteReadError as e:
+                if len(e.partial) > 0:
+                    logIngest.warning("connection_closed", pending=len(e.partial))
+                return
+
+            (size,) = HEADER.unpack(header)
+            if size > self.maxSize:
+                raise ValueError("Frame of " + str(size) + " bytes exceeds the maximum size")
+            if size == 0: # Keep-alive
+                continue
+
+            try:
+                received = await reader.readexactly(size)
+            except asyncio.IncompleteReadError as e:
+                logIngest.warning("connection_closed", pending=HEADER.size + len(e.partial))
+                return
+
+            sequence = sequence + 1
+            if not await self.submitER(received):
+                writer.write(encodeFrame(encodeBusy(self.queue.getRetryHint(self.workers), sequence)))
+                await writer.drain()
+
+    ## Returns False if the ER was refused by the queue (the EDU should retry later)
+    ## The parser (and the journal and recorder it writes) and the wait for space in the queue
+    ## block, so they run in a thread, while the loop stops reading this EDU (and keeps serving the others)
+    async def submitER(self, received):
+        return await asyncio.get_running_loop().run_in_executor(None, self.submit, received)
+
+    def submit(self, received):
+        er = self.parser(received)
+        if er is None:
+            return True
+        return self.queue.put(er, block=self.queue.policy == "block")
@@ -0,0 +1,242 @@
+# *********************************************************************
+# Append-only journal of the received ER and of the generated EA
+# Records are kept in memory-mapped segment files. They are written by a
+# background thread, which flushes (msync) all records of an interval at
+# once (group commit), so the threads of the EPU only append to a queue
+# The acknowledgements of the MQTT broker are also journaled. When the
+# EPU restarts, the last EA id is recovered and the EA that were never
+# acknowledged are published again
+# Each new segment starts with a checkpoint (last EA id) followed by the
+# unacknowledged EA, so older segments can be deleted. A segment is enlarged
+# when the unacknowledged EA would fill more than half of it
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import collections
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+########################################################
+
+## Record: length of the payload, crc32 of kind + payload, kind
+RECORD = struct.Struct(">IIB")
+SEQUENCE = struct.Struct(">Q")
+CHECKPOINT = struct.Struct(">QQ")
+
+KIND_ER = 1          # ER as received (JSON or binary)
+KIND_EA = 2          # sequence + EA (JSON)
+KIND_ACK = 3         # sequence of an EA received by the broker
+KIND_CHECKPOINT = 4  # last EA id + last sequence
+
+########################################################
+
+## Read all records of a journal directory
+## Returns the last EA id, the last sequence and the unacknowledged EA (sequence -> dict)
+## Only the last version of each EA is kept (a refresh or clearing replaces the previous one)
+def readJournal(directory):
+    lastId = 0
+    lastSequence = 0
+    pending = {}  # sequence -> EA (dict)
+    byId = {}     # EA id -> sequence of its last version
+
+    for name in sorted(glob.glob(os.path.join(directory, "journal-*.log"))):
+        with open(name, "rb") as f:
+            data = f.read()
+
+        position = 0
+        while position + RECORD.size <= len(data):
+            (size, crc, kind) = RECORD.unpack_from(data, position)
+            payload = data[position + RECORD.size:position + RECORD.size + size]
+
+            ## End of the written records (or a record interrupted by a crash)
+            if kind == 0 or len(payload) < size or zlib.crc32(bytes((kind,)) + payload) != crc:
+                break
+            position = position + RECORD.size + size
+
+            if kind == KIND_CHECKPOINT:
+                (i, sequence) = CHECKPOINT.unpack(payload)
+                lastId = max(lastId, i)
+                lastSequence = max(lastSequence, sequence)
+
+            elif kind == KIND_EA:
+                (sequence,) = SEQUENCE.unpack_from(payload)
+                ea = json.loads(payload[SEQUENCE.size:].decode())
+                lastId = max(lastId, ea["id"])
+                lastSequence = max(lastSequence, sequence)
+
+                previous = byId.get(ea["id"])
+                if previous is not None:
+                    pending.pop(previous, None)
+                byId[ea["id"]] = sequence
+                pending[sequence] = ea
+
+            elif kind == KIND_ACK:
+                (sequence,) = SEQUENCE.unpack(payload)
+                pending.pop(sequence, None)
+
+    return (lastId, lastSequence, pending)
+
+########################################################
+
+class eaJournal():
+    def __init__(self, directory, commitInterval=0.01, segmentSize=16 * 1024 * 1024, maxSegments=8):
+        self.directory = directory
+        self.commitInterval = commitInterval  # Group commit (s)
+        self.segmentSize = segmentSize
+        self.maxSegments = maxSegments  # Older segments are deleted
+
+        os.makedirs(directory, exist_ok=True)
+        (self.lastId, self.sequence, self.pending) = readJournal(directory)
+        self.recovered = sorted(self.pending.items())
+        self.byId = {ea["id"]: s for (s, ea) in self.pending.items()}
+
+        self.records = collections.deque()
+        self.lock = threading.Lock()
+        self.running = True
+        self.errors = 0  # Failures of the writer
+
+        self.number = 0
+        for name in glob.glob(os.path.join(directory, "journal-*.log")):
+            self.number = max(self.number, int(os.path.basename(name)[8:-4]))
+        self.mm = None
+        self.openSegment()
+
+        self.writer = threading.Thread(target=self.run, daemon=True)
+        self.writer.start()
+
+    ## Last EA id found in the journal (0 if it is empty)
+    def getLastId(self):
+        return self.lastId
+
+    ## Unacknowledged EA of the previous execution, as (sequence, dict)
+    def getRecovered(self):
+        return self.recovered
+
+    def putER(self, received):
+        self.records.append((KIND_ER, received, None, None))
+
+    ## Returns the sequence that identifies this version of the EA (used by putAck)
+    def putEA(self, ea):
+        with self.lock:
+            self.sequence = self.sequence + 1
+            sequence = self.sequence
+        ## The EA is converted to JSON by the writer
+        self.records.append((KIND_EA, None, sequence, ea.toDict()))
+        return sequence
+
+    def putAck(self, sequence):
+        self.records.append((KIND_ACK, SEQUENCE.pack(sequence), sequence, None))
+
+    ########
+
+    ## New segment, starting with the checkpoint and the unacknowledged EA
+    ## The segment is at least twice the size of these records, so the new records always fit
+    def openSegment(self):
+        if self.mm is not None:
+            self.mm.flush()
+            self.mm.close()
+
+        with self.lock:
+            sequence = self.sequence
+        records = [(KIND_CHECKPOINT, CHECKPOINT.pack(self.lastId, sequence))]
+        for (s, ea) in sorted(self.pending.items()):
+            records.append((KIND_EA, SEQUENCE.pack(s) + json.dumps(ea).encode()))
+        needed = sum(RECORD.size + len(payload) for (kind, payload) in records)
+        self.size = max(self.segmentSize, -(-2 * needed // mmap.PAGESIZE) * mmap.PAGESIZE)
+        if self.size > self.segmentSize:
+            print ("The journal has", len(records) - 1, "unacknowledged EA. Segment enlarged to", self.size, "bytes")
+
+        self.number = self.number + 1
+        name = os.path.join(self.directory, "journal-%08d.log" % self.number)
+        with open(name, "w+b") as f:
+            f.truncate(self.size)
+            self.mm = mmap.mmap(f.fileno(), self.size)
+        self.position = 0
+        self.committed = 0
+
+        for (kind, payload) in records:
+            self.putRecord(kind, payload)
+        self.commit()
+
+        ## The new segment has all the state: old segments are only kept as history
+        names = sorted(glob.glob(os.path.join(self.directory, "journal-*.log")))
+        for old in names[:-self.maxSegments]:
+            os.remove(old)
+
+    def writeRecord(self, kind, payload):
+        size = RECORD.size + len(payload)
+        if size > self.segmentSize // 2:
+            print ("Record of", size, "bytes is too large for the journal")
+            return
+        if self.position + size > self.size:
+            self.openSegment()
+        self.putRecord(kind, payload)
+
+    ## Write a record at the current position of the segment
+    def putRecord(self, kind, payload):
+        size = RECORD.size + len(payload)
+        if self.position + size > self.size:
+            raise ValueError("No space for a record of " + str(size) + " bytes in the journal segment")
+
+        self.mm[self.position:self.position + size] = RECORD.pack(len(payload), zlib.crc32(bytes((kind,)) + payload), kind) + payload
+        self.position = self.position + size
+
+    ## msync of the records written since the last commit (from the start of their page)
+    def commit(self):
+        if self.position > self.committed:
+            start = (self.committed // mmap.PAGESIZE) * mmap.PAGESIZE
+            self.mm.flush(start, self.position - start)
+            self.committed = self.position
+
+    ## Keep the state needed by the next checkpoint
+    def track(self, kind, sequence, ea):
+        if kind == KIND_EA:
+            self.lastId = max(self.lastId, ea["id"])
+
+            previous = self.byId.get(ea["id"])
+            if previous is not None:
+                self.pending.pop(previous, None)
+            self.byId[ea["id"]] = sequence
+            self.pending[sequence] = ea
+
+        elif kind == KIND_ACK:
+            ea = self.pending.pop(sequence, None)
+            if ea is not None and self.byId.get(ea["id"]) == sequence:
+                del self.byId[ea["id"]]
+
+    ## Background writer: all records of an interval are committed together
+    ## A failure is reported and the writer goes on (the record being written is lost)
+    def run(self):
+        while self.running:
+            time.sleep(self.commitInterval)
+            try:
+                self.drain()
+            except (OSError, ValueError) as e:
+                self.errors = self.errors + 1
+                print ("Error when writing the journal:", e)
+
+    def drain(self):
+        written = False
+        while len(self.records) > 0:
+            (kind, payload, sequence, ea) = self.records.popleft()
+            if kind == KIND_EA:
+                payload = SEQUENCE.pack(sequence) + json.dumps(ea).encode()
+            self.track(kind, sequence, ea)
+            self.writeRecord(kind, payload)
+            written = True
+        if written:
+            self.commit()
+
+    def close(self):
+        self.running = False
+        self.writer.join()
+        self.drain()
+        self.mm.close()
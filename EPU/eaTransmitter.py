@@ -1,31 +1,118 @@
 # *********************************************************************
 # This class received EA and send it to the requesting EAC
 # It is implemented to communicate through the MQTT protocol
+# A single connection is kept for each broker, with the paho network
+# loop running in the background and reconnecting automatically
 # Author      : Daniel G. Costa
 # E-mail      : danielgcosta@uefs.br
 # Date        : 2019/09/10
 # *********************************************************************
 
 import paho.mqtt.client as mqtt
-from time import sleep
+import threading
+
+import epuMetrics
+from cityalarm.eventLog import getLogger
+
+logPublish = getLogger("publish")
+
+########################################################
+
+## Publishers already created, one for each broker and EPU
+publishers = {}
+lockPublishers = threading.Lock()
+
+## Returns the shared publisher of a broker, creating (and connecting) it at the first use
+def getPublisher(ipBroker, epuId):
+    key = (ipBroker, str(epuId))
+    with lockPublishers:
+        if key not in publishers:
+            publishers[key] = epuMQTT(ipBroker, epuId)
+        return publishers[key]
+
+## Disconnect all publishers (when the EPU exits)
+def closePublishers():
+    with lockPublishers:
+        for publisher in publishers.values():
+            publisher.close()
+        publishers.clear()
 
 ########################################################
 
 class epuMQTT():
-    def __init__(self, ipBroker, epuId):
+    def __init__(self, ipBroker, epuId, qos=1):
         self.broker = ipBroker
         self.description = "CityAlarm_EPU" + str(epuId)
+        self.qos = qos  # With qos 1, EA are kept while the broker is unreachable
+
+        ## Delivery callbacks (and publication time) waiting for the broker, by message id
+        self.pending = {}
+        ## Messages acknowledged before their callbacks were registered
+        self.acked = set()
+        self.lock = threading.Lock()
 
         self.clientmqtt = mqtt.Client("")
+        self.clientmqtt.on_connect = self.on_connect
+        self.clientmqtt.on_disconnect = self.on_disconnect
+        self.clientmqtt.on_publish = self.on_publish
 
-    def publishEA (self, eaJSON):
+        self.clientmqtt.max_inflight_messages_set(100)
+        self.clientmqtt.max_queued_messages_set(10000)
+        self.clientmqtt.reconnect_delay_set(min_delay=1, max_delay=30)
 
         print ("Broker address:", self.broker)
-        self.clientmqtt.connect(self.broker)
+        self.clientmqtt.connect_async(self.broker)
+        self.clientmqtt.loop_start()
 
-        self.clientmqtt.publish (self.description, eaJSON)  # Associating a "topic" to a "payload"
+    def on_connect(self, client, userdata, flags, rc):
+        print ("Connected to the MQTT Broker:", self.broker, "Code:", rc)
 
-        sleep(1)
-        self.clientmqtt.disconnect()
+    def on_disconnect(self, client, userdata, rc):
+        if rc != 0:
+            print ("Connection to the MQTT Broker lost. Reconnecting...")
+
+    def on_publish(self, client, userdata, mid):
+        with self.lock:
+            if mid in self.pending:
+                (callback, start) = self.pending.pop(mid)
+            else:
+                self.acked.add(mid)
+                return
 
-        print("Publishing an Emergency Alarm to the MQTT Broker...")
+        epuMetrics.observe("ack", start)
+        if callback is not None:
+            callback(mid)
+
+    ## Does not wait for the broker. callback(mid) is called when the EA is delivered
+    ## The EA may be published in a subtopic of the EPU (for example, "bin" for the binary format)
+    def publishEA (self, eaJSON, callback=None, subtopic=None):
+
+        topic = self.description
+        if subtopic is not None:
+            topic = topic + "/" + subtopic
+
+        start = epuMetrics.now()
+        info = self.clientmqtt.publish (topic, eaJSON, qos=self.qos)  # Associating a "topic" to a "payload"
+
+        if info.rc == mqtt.MQTT_ERR_QUEUE_SIZE:
+            logPublish.warning("ea_discarded", topic=topic, reason="queue_full")
+            return None
+
+        ## The broker may have acknowledged the EA before this point
+        with self.lock:
+            delivered = info.mid in self.acked
+            if delivered:
+                self.acked.discard(info.mid)
+            else:
+                self.pending[info.mid] = (callback, start)
+
+        if delivered:
+            epuMetrics.observe("ack", start)
+        if delivered and callback is not None:
+            callback(info.mid)
+
+        return info.mid
+
+    def close(self):
+        self.clientmqtt.disconnect()
+        self.clientmqtt.loop_stop()
@@ -11,19 +11,72 @@
 
 # Basic modules
 import atexit
+import os
 import socket
 import threading
 import json
 import datetime
+import signal
+import time
 import haversine
 import numpy as np
 import sys, getopt
 
 ## Elements to support the operation of the EDU
-from elementsEPU import ER, RiskZone, EA
+from elementsEPU import ER, RiskZone, EA, isBinary, erFromBinary, erFromDict, eaFromDict
 
 ## Supportive module to communicate through MQTT
-from eaTransmitter import epuMQTT
+from eaTransmitter import getPublisher, closePublishers
+
+## Geohash subtopics of the EA
+from cityalarm.geohash import geohashSubtopic
+
+## Structured log, written in the background
+from cityalarm.eventLog import getLogger, configureLog
+logIngest = getLogger("ingest")
+logSeverity = getLogger("severity")
+logAlarms = getLogger("alarms")
+logPublish = getLogger("publish")
+
+## Spatial index of the Risk Zones
+from riskIndex import riskIndex
+
+## Risk Zones loaded from GeoJSON (polygons)
+from geoZones import loadGeoJSON
+
+## Cache of the rz of the EDU positions
+from riskCache import riskCache
+
+## Supportive module to receive many ER through persistent connections
+import erFraming
+from erFraming import MAGIC, frameDecoder, encodeFrame, encodeBusy
+
+## Supportive module to receive ER through a single event loop
+from asyncIngest import asyncERServer
+
+## Supportive module to bound the number of ER waiting to be processed
+from erQueue import ingestQueue, workerPool, policies
+
+## Supportive module to measure the latency of each stage of the EPU
+import epuMetrics
+
+## Supportive module to keep a durable journal of ER and EA
+from eaJournal import eaJournal, readJournal
+
+## Supportive module to record the received ER
+from erTrace import traceWriter
+
+## Supportive module to group ER that are scored together
+from erBatcher import erBatcher
+
+## Supportive module to keep the state of active EA
+from alarmTable import alarmTable
+
+## Supportive module to correlate ER of neighbouring EDUs
+from erCorrelator import erCorrelator
+
+## Supportive module to run the EPU as many processes
+from epuSupervisor import epuSupervisor
 
 ########################################################
 debug = True #Used to presente trace messages on the screen
@@ -40,17 +93,107 @@ tmax = 100  #maximum impact of the time function
 
 ## Kepp track of generated Emergency Alarms
 idEA = 1
+lockEA = threading.Lock()
+
+## When the EPU runs as many processes, the ids of EA are shared (see newEAId)
+sharedIdEA = None
+blockIdEA = 1000
+lastIdEA = 0
 
 ## All defined Risk Zones
 listRZ = []
+rzIndex = None  #Spatial index of listRZ, created by initializeRiskZones
+
+## GeoJSON file with the Risk Zones (polygons or circles). None uses definedRZ
+## The file is checked every zonesInterval seconds and reloaded when it changes
+## This parameter can be provided during initialization (command line)
+zonesPath = None
+zonesInterval = 5
+
+## Maximum number of EDU positions whose rz is kept in a cache (LRU). 0 disables the cache
+## This parameter can be provided during initialization (command line)
+rzCacheSize = 65536
+rzCache = None
 
 ## For temporal variable ct (gaussian)
 mu = 12  #average
 sigma = 6 #standard deviation
 
+## Precomputed temporal part of the sl, by day of the week and hour (see initializeTimeTable)
+timeTable = None
+weekdays = {"Mon": 0, "Tue": 1, "Wed": 2, "Thu": 3, "Fri": 4, "Sat": 5, "Sun": 6}
+
 ## To receive ER from the EDUs
 localPort = 55055
 
+## How ER are received: "thread" (one thread per EDU connection) or "async" (single event loop)
+## This parameter can be provided during initialization (command line)
+ingestMode = "thread"
+workers = 8  #Number of threads computing and publishing EA (async mode, or when ER are queued)
+
+## Maximum number of received ER waiting for the workers. In the "thread" mode, 0 computes the EA
+## in the thread of the connection (no queue). In the "async" mode, 0 means 4 ER per worker
+## When the queue is full, the overload policy is applied: "block", "reject" or "shed" (see erQueue)
+## These parameters can be provided during initialization (command line)
+queueDepth = 0
+overloadPolicy = "block"
+ingest = None
+
+## Number of processes of the EPU. All of them receive ER at localPort (SO_REUSEPORT)
+## This parameter can be provided during initialization (command line)
+processes = 1
+
+## ER received within this window (seconds) are scored together. 0 scores each ER on its own
+## This parameter can be provided during initialization (command line, in milliseconds)
+batchWindow = 0
+batcher = None
+
+## Active EA are refreshed by their EDU and cleared after this time (seconds) without a refresh
+## It should be larger than the refresh period of the EDUs (fx). 0 publishes a new EA for every ER
+## This parameter can be provided during initialization (command line)
+alarmTimeout = 180
+alarms = None
+
+## ER from EDUs closer than this distance (km), with common events, are merged in a single EA
+## 0 disables the correlation. This parameter can be provided during initialization (command line)
+correlationDistance = 0
+correlationWindow = 120  #Time (seconds) during which the ER of an EDU is correlated with others
+clock = time.monotonic   #Time of the alarm table and of the correlation (the replay uses the time of the trace)
+correlator = None
+
+## Format of the published EA: "json" (topic CityAlarm_EPUu), "binary" (topic CityAlarm_EPUu/bin) or "both"
+## This parameter can be provided during initialization (command line)
+eaFormat = "json"
+
+## Number of geohash levels of the subtopics where each EA is also published (CityAlarm_EPUu/geo/e/z/3/f/h)
+## EA in the binary format use CityAlarm_EPUu/bin/geo/... 0 disables the geohash subtopics
+## This parameter can be provided during initialization (command line)
+geohashLevels = 0
+
+## Local HTTP port exposing the metrics of the EPU (Prometheus format, /metrics). 0 disables the metrics
+## Worker processes use the following ports (port + number of the worker)
+## This parameter can be provided during initialization (command line)
+metricsPort = 0
+
+## Directory of the journal of ER and EA, used to recover the EA ids and the EA not received by the broker
+## None disables the journal. This parameter can be provided during initialization (command line)
+journalPath = None
+journal = None
+
+## Trace file where the received ER are recorded, with their arrival time (see erReplay.py)
+## None disables the recording. This parameter can be provided during initialization (command line)
+recordPath = None
+recorder = None
+
+## When defined, computed EA are given to this function instead of the MQTT Broker (used by erReplay.py)
+eaSink = None
+
+## Levels and sampling of the log of each subsystem (ingest, severity, alarms, publish, queue), and its file
+## For example, "*=info,ingest=debug:100" traces 1 of every 100 received ER. With debug, all logs are traced
+## These parameters can be provided during initialization (command line)
+logSpec = None
+logPath = None
+
 ## IP address of the MQTT Broker
 ## This parameter can be provided during initialization (command line)
 ipBroker = "192.168.0.122"
@@ -68,66 +211,326 @@ definedRZ = [[41.179220,-8.597667,5,70], \
 ## Receive ER from a EDU
 class receiveERThread(threading.Thread):    
 
-    def __init__(self, c):
+    def __init__(self, c, accepted=None):
         self.con = c
+        self.accepted = accepted  # Time at which the connection was accepted
         threading.Thread.__init__(self)
     
     def run(self):
-        global debug, idEA
-        
-        ## The ER that will be received
-        er = None
+        if self.accepted is not None:
+            epuMetrics.observe("accept", self.accepted)
+        start = epuMetrics.now()
 
-        received = self.con.recv(1024).decode('utf-8')
-        
-        # Reconstructing the ER from the JSON format to the object ER
         try:
-            parsed_data = json.loads(received)
-            er = ER(parsed_data["edu"], parsed_data["id"],parsed_data["timestamp"],parsed_data["gps"]["la"],parsed_data["gps"]["lo"])
-            events = parsed_data["events"]
-            
-            for e in events:
-                er.putEvent (e)
-            print ("Received ER from EDU:", parsed_data["edu"])
-            
-            if debug:
-                er.printTypes()
-        
-        except:
-            print ("Error when processing received ER.")
-        
-        ## Generating the EA
-        numberEI = 0
-        if er is not None:
-            ea = EA(idEA, er.getTimestamp(), er.getLatitude(), er.getLongitude())
-            idEA = idEA + 1
-            
-            for y in er.getEventsTypes():
-                ea.putEvent(y)
-                numberEI = numberEI + 1
-                
-            ## Compute the magnitude of the alarm
-            computeSeveryLevel(ea, numberEI)
-
-            if debug:
-                ea.printValues()
-
-            ## Transmit the EA - MQQT Protocol
-            transmitEA (ea)
+            ## The first bytes tell if the EDU uses a framed (persistent) connection
+            received = b""
+            while len(received) < len(MAGIC):
+                data = self.con.recv(4096)
+                if not data:
+                    break
+                received = received + data
+
+            if received[:len(MAGIC)] == MAGIC:
+                self.receiveFramed(received[len(MAGIC):])
+            else:
+                self.receiveSingle(received, start)
+
+        except (socket.error, ValueError) as e:
+            logIngest.error("receive_failed", error=str(e))
+            epuMetrics.increment("errors_connection_total")
+
+        finally:
+            self.con.close()
+
+    ## A single ER is received and then the EDU closes the connection
+    def receiveSingle(self, received, start):
+        while len(received) < erFraming.maxSize:
+            data = self.con.recv(4096)
+            if not data:
+                break
+            received = received + data
+        epuMetrics.observe("recv", start)
+
+        if not handleER(received):
+            self.con.sendall(encodeBusy(ingest.getRetryHint(workers)))
+
+    ## Many ER are received through the same connection
+    def receiveFramed(self, received):
+        decoder = frameDecoder()
+        data = received
+        sequence = 0  # Number of the ER in the connection
+
+        while True:
+            for frame in decoder.feed(data):
+                sequence = sequence + 1
+                if not handleER(frame):
+                    self.con.sendall(encodeFrame(encodeBusy(ingest.getRetryHint(workers), sequence)))
+
+            data = self.con.recv(4096)
+            if not data:
+                break
+
+        if decoder.pending() > 0:
+            logIngest.warning("connection_closed", pending=decoder.pending())
             
+
+##############################################################################
+
+## Parse a received ER and generate the corresponding EA (or queue it)
+## Returns False if the ER was refused, so the EDU must retry later
+def handleER(received):
+    ## The ER that will be received
+    er = decodeER(received)
+
+    if er is None:
+        return True
+
+    if ingest is None:
+        dispatchER(er)
+        return True
+
+    return ingest.put(er)
+
+##############################################################################
+
+## Parse a received ER, keeping the time at which it was received (see epuMetrics)
+def decodeER(received):
+    if recorder is not None:
+        recorder.put(received)
+
+    start = epuMetrics.now()
+    er = parseER(received)
+    epuMetrics.observe("decode", start)
+
+    if er is not None:
+        er.setReceived(start)
+        if journal is not None:
+            journal.putER(received)
+    return er
+
+##############################################################################
+
+## Refreshes of active EA are the first ER to be dropped when the EPU is overloaded
+## With correlation, the EA is the one of the cluster of the EDU
+def isRefresh(er):
+    global alarms, correlator
+
+    if alarms is None:
+        return False
+
+    source = er.getEDU()
+    if correlator is not None:
+        idCluster = correlator.getCluster(source, er.getEventsTypes())
+        if idCluster is None:
+            return False
+        source = "cluster" + str(idCluster)
+
+    return alarms.isActive(source, er.getEventsTypes())
+
+##############################################################################
+
+## Show the state of the ingest queue (signal SIGUSR1)
+def printQueueStatus(signum, frame):
+    if ingest is not None:
+        print ("Ingest queue:", ingest.getStatus())
+    if rzCache is not None:
+        print ("Cache of rz:", rzCache.getStatus())
+
+##############################################################################
+
+## A parsed ER is scored on its own or sent to the current batch
+def dispatchER(er):
+    global batcher
+
+    if batcher is not None:
+        batcher.put(er)
+    else:
+        processER(er)
+
+##############################################################################
+
+## Reconstructing the ER from the JSON (or binary) format to the object ER
+## Returns None if the received data (bytes) is not a valid ER
+def parseER(received):
+    er = None
+    try:
+        if isBinary(received):
+            er = erFromBinary(received)
         else:
-            print ("Error processing ER when computing EA.")
-            
+            er = erFromDict(json.loads(received.decode('utf-8')))
+        epuMetrics.increment("er_received_total")
+        logIngest.trace("er_received", edu=er.getEDU(), er=er.getId(), events=er.getEventsTypes())
+
+    except Exception as e:
+        logIngest.error("er_invalid", error=str(e), size=len(received))
+        epuMetrics.increment("errors_decode_total")
+        er = None
+
+    return er
+
+##############################################################################
+
+## Generating the EA for a received ER, computing its magnitude and transmitting it
+## This function may be called by concurrent threads
+def processER(er):
+    ## The id of the EA is only defined when it is published
+    ea = EA(None, er.getTimestamp(), er.getLatitude(), er.getLongitude())
+
+    numberEI = 0
+    for y in er.getEventsTypes():
+        ea.putEvent(y)
+        numberEI = numberEI + 1
+
+    ## Compute the magnitude of the alarm
+    start = epuMetrics.now()
+    computeSeveryLevel(ea, numberEI)
+    epuMetrics.observe("severity", start)
+
+    publishAlarm(er, ea)
+
+##############################################################################
+
+## Generating the EA for a batch of ER, with their magnitudes computed together
+def processBatch(ers):
+    eas = []
+    for er in ers:
+        ea = EA(None, er.getTimestamp(), er.getLatitude(), er.getLongitude())
+        for y in er.getEventsTypes():
+            ea.putEvent(y)
+        eas.append(ea)
+
+    ## Compute the magnitude of all alarms
+    start = epuMetrics.now()
+    computeBatchSeverityLevels(eas)
+    epuMetrics.observe("severity", start)
+
+    for er, ea in zip(ers, eas):
+        publishAlarm(er, ea)
+
+##############################################################################
+
+## The id of a new EA. It is shared by all threads
+def newEAId():
+    global idEA, lastIdEA
+
+    with lockEA:
+        ## With worker processes, each one takes blocks of ids from the counter of the supervisor
+        if sharedIdEA is not None and idEA > lastIdEA:
+            with sharedIdEA.get_lock():
+                idEA = sharedIdEA.value
+                sharedIdEA.value = sharedIdEA.value + blockIdEA
+            lastIdEA = idEA + blockIdEA - 1
+
+        i = idEA
+        idEA = idEA + 1
+    return i
+
+##############################################################################
+
+## Transmit a computed EA, unless it is a refresh of an active EA with the same magnitude
+def publishAlarm(er, ea):
+    global alarms, correlator, debug
+
+    ## Correlated ER generate a single EA for each cluster of EDUs
+    source = er.getEDU()
+    cleared = []
+    if correlator is not None:
+        (source, ea, absorbed) = correlateER(er, ea)
+        for c in absorbed:
+            if alarms is not None:
+                cleared.extend(alarms.remove("cluster" + str(c)))
+
+    if alarms is None:
+        ## EA are not tracked: they have no state and the EAC remove them when they are not refreshed
+        publish = [ea]
+        ea.setId(newEAId())
+        ea.setState(None)
+    else:
+        publish = cleared + alarms.update(source, ea, newEAId, correlator is None)
+
+    if len(publish) == 0:
+        logAlarms.trace("ea_refreshed", ea=ea.getId(), edu=er.getEDU())
+
+    for alarm in publish:
+        ## Transmit the EA - MQQT Protocol
+        transmitEA (alarm)
+
+    ## Time from the reception of the ER to the publication of its EA
+    if len(publish) > 0 and er.getReceived() is not None:
+        epuMetrics.observe("end_to_end", er.getReceived())
+
+##############################################################################
+
+## Insert the ER in its cluster of neighbouring ER and create the composite EA of the cluster
+## Returns the source of the composite EA, the EA, and the ids of the clusters absorbed by this one
+def correlateER(er, ea):
+    global correlator, fe
+
+    ## The part of the sl that depends on the position and time of the ER
+    context = ea.getSeverityLevel() - (len(ea.getEventsTypes()) * 20 * fe)
+
+    ((idCluster, la, lo, events, context, numberEDU), absorbed) = correlator.add(er.getEDU(), er.getLatitude(), er.getLongitude(), ea.getEventsTypes(), context)
+
+    composite = EA(None, er.getTimestamp(), la, lo)
+    for y in events:
+        composite.putEvent(y)
+
+    ## The events of all EDUs and the worst position and time of the cluster (at most 5 EI, as in the CityAlarm paper)
+    composite.setSeverityLevel(int(context + (min(len(events), 5) * 20 * fe)))
+
+    if numberEDU > 1:
+        logAlarms.trace("er_correlated", edu=er.getEDU(), cluster=idCluster, edus=numberEDU)
+
+    return ("cluster" + str(idCluster), composite, absorbed)
+
+##############################################################################
+
+## EA that are no longer refreshed by their EDU are cleared
+class alarmExpiryThread(threading.Thread):
+
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+
+    def run(self):
+        global alarms
+
+        while True:
+            time.sleep(max(1, alarms.timeout / 4))
+            expireAlarms()
+
+## Clear the EA that were not refreshed in time (also called by the replay, at the time of the trace)
+def expireAlarms():
+    for ea in alarms.expire():
+        logAlarms.debug("ea_expired", ea=ea.getId())
+
+        transmitEA (ea)
 
 ##############################################################################
 
 def initializeRiskZones():
-    global listRZ
+    global listRZ, rzIndex, rzCache
+
+    zones = []
+    if zonesPath is not None:
+        try:
+            zones = loadGeoJSON(zonesPath)
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            print("The Risk Zones could not be loaded from", zonesPath, ":", e, ". EPU exiting...")
+            sys.exit(1)
+        print (len(zones), "Risk Zones loaded from", zonesPath)
+    else:
+        idRZ = 1
+        for rz in definedRZ:
+            zones.append (RiskZone(idRZ,rz[0],rz[1],rz[2],rz[3]))
+            idRZ = idRZ + 1
 
-    idRZ = 1
-    for rz in definedRZ:
-        listRZ.append (RiskZone(idRZ,rz[0],rz[1],rz[2],rz[3]))
-        idRZ = idRZ + 1
+    ## Only the Risk Zones close to an EDU are tested when computing an EA
+    rzIndex = riskIndex(zones)
+    listRZ = zones
+
+    ## The rz of the positions of fixed EDUs is computed once (those of moving EDUs are not cached)
+    if rzCacheSize > 0:
+        rzCache = riskCache(rzCacheSize, rzIndex)
 
     if debug:
         print ("Defined Risk Zones:")
@@ -136,65 +539,176 @@ def initializeRiskZones():
 
 ##############################################################################
 
+## Reload the Risk Zones when their GeoJSON file changes
+## The new index is built aside and replaces the current one at once: ER being
+## processed keep using the index they took, and no ER waits for the reload
+class riskZonesThread(threading.Thread):
 
-def computeSeveryLevel(ea, ni):
-    global listRZ, fe, fr, ft, rmax, tmax
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+        self.modified = os.stat(zonesPath).st_mtime
 
-    if debug:
-        print ("Computing the magnitude of the EA...")
+    def run(self):
+        global listRZ, rzIndex
+
+        while True:
+            time.sleep(zonesInterval)
+
+            try:
+                modified = os.stat(zonesPath).st_mtime
+                if modified == self.modified:
+                    continue
+                self.modified = modified
+
+                zones = loadGeoJSON(zonesPath)
+                index = riskIndex(zones)
+            except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+                print ("The Risk Zones could not be reloaded from", zonesPath, ":", e, "- the previous ones are kept")
+                continue
+
+            rzIndex = index
+            listRZ = zones
+            if rzCache is not None:
+                rzCache.reset(index)
+            print (len(zones), "Risk Zones reloaded from", zonesPath)
+
+##############################################################################
+
+def computeSeveryLevel(ea, ni):
+    global listRZ, fe, fr, rmax, timeTable
 
     ## If some ER could be received with more than 5 EI, this code has to be used
     #if ni > 5:
     #    ni = 5
 
     ## The impact of the Risk Zone on the emergency
+    start = epuMetrics.now()
     rz = computeAssociatedRZ(ea.getLatitude(),ea.getLongitude()) # Returns from 0 to rmax
+    epuMetrics.observe("rz", start)
 
-    ## The impact of the temporal data on the emergency
-    ta = computeTimeFunction() # Returns from 0 to tmax
-    ct = computeGausseanFunction(datetime.datetime.today().hour) # Gaussian. Returns from 0.0 to 1.0
+    ## The impact of the temporal data on the emergency, at the time of the ER
+    (weekday, hour) = computeTimeIndex(ea.getTimestamp())
 
     ## The magnitude of the EA is a function of ni + rz + ta (CityAlarm paper)
-    sl = (ni * 20 * fe) + (((rz * 100) / rmax) * fr) + (((ta * 100) / tmax) * ft * ct)
+    sl = (ni * 20 * fe) + (((rz * 100) / rmax) * fr) + timeTable[weekday, hour]
 
     ## Truncate do avoid too large float number
     sl =int(sl)
 
-    if debug:
-        print ("Sl of EA:", sl)
+    logSeverity.trace("sl_computed", la=ea.getLatitude(), lo=ea.getLongitude(), rz=rz, sl=sl)
 
     ea.setSeverityLevel(sl)
 
 ##############################################################################
 
+## The same computation of computeSeveryLevel for a list of EA, using arrays
+def computeBatchSeverityLevels(eas):
+    global rzIndex, fe, fr, rmax, timeTable
+
+    logSeverity.trace("batch_computed", size=len(eas))
+
+    ni = np.array([len(ea.getEventsTypes()) for ea in eas], dtype=float)
+    las = np.array([ea.getLatitude() for ea in eas], dtype=float)
+    los = np.array([ea.getLongitude() for ea in eas], dtype=float)
+
+    ## The impact of the Risk Zones on the emergencies
+    start = epuMetrics.now()
+    index = rzIndex
+    if rzCache is None:
+        rz = index.computeBatchRZ(las, los) # From 0 to rmax
+    else:
+        ## Only the positions not in the cache are computed
+        cached = [rzCache.get(index, la, lo) for la, lo in zip(las.tolist(), los.tolist())]
+        missing = [k for k, r in enumerate(cached) if r is None]
+        rz = np.array([0 if r is None else r for r in cached], dtype=float)
+        if len(missing) > 0:
+            rz[missing] = index.computeBatchRZ(las[missing], los[missing])
+            for k in missing:
+                rzCache.put(index, las[k], los[k], float(rz[k]))
+    epuMetrics.observe("rz", start)
+
+    ## The impact of the temporal data on the emergencies, at the time of each ER
+    times = np.array([computeTimeIndex(ea.getTimestamp()) for ea in eas], dtype=np.intp).reshape(-1, 2)
+
+    sl = (ni * 20 * fe) + (((rz * 100) / rmax) * fr) + timeTable[times[:, 0], times[:, 1]]
+
+    ## Truncate do avoid too large float number
+    for ea, value in zip(eas, sl.astype(int).tolist()):
+        ea.setSeverityLevel(value)
+
+##############################################################################
+
 ## This method verifies what is the current Risk Zone associated to the ER and returns the corresponding rz value
 def computeAssociatedRZ(la,lo):
-    global listRZ
+    global rzIndex
+
+    ## The index may be replaced by a reload of the Risk Zones
+    index = rzIndex
+
+    if rzCache is not None:
+        riskLevel = rzCache.get(index, la, lo)
+        if riskLevel is not None:
+            return riskLevel
 
     ## Given RZ center and the EDU position, is this distance minor than the defined radius of a RZ?
     edu = (la, lo)
 
     riskLevel = 0
-    for rz in listRZ:
-        zone = (rz.getLatitude(), rz.getLongitude())
-        distance = haversine.haversine(edu,zone)
+    for rz in index.getCandidates(la, lo): # Sorted by decreasing risk
+        if rz.isPolygon():
+            inside = index.containsPolygon(rz, la, lo)
+        else:
+            zone = (rz.getLatitude(), rz.getLongitude())
+            inside = haversine.haversine(edu,zone) < rz.getRadius()
 
-        if distance < rz.getRadius(): # The EDU is inside the Risk Zone
-            if riskLevel < rz.getRZ(): # Update so the "best" Risk Zone is chosen
-                riskLevel = rz.getRZ()
+        if inside: # The EDU is inside the Risk Zone
+            riskLevel = rz.getRZ() # This is the "best" Risk Zone
+            break
+
+    if rzCache is not None:
+        rzCache.put(index, la, lo, riskLevel)
 
     ## It will be 0 if the EDU is not in a Risk Zone
     return riskLevel
 
 ##############################################################################
 
-def computeTimeFunction():
+## The temporal part of the sl, for each day of the week (0 is Monday) and hour of the day
+## It is computed once, when the EPU starts, since it only depends on tmax, mu and sigma
+def initializeTimeTable():
+    global timeTable, ft, tmax
+
+    timeTable = np.zeros((7, 24))
+    for weekday in range(7):
+        ta = computeTimeFunction(weekday) # Returns from 0 to tmax
+        for hour in range(24):
+            ct = computeGausseanFunction(hour) # Gaussian. Returns from 0.0 to 1.0
+            timeTable[weekday, hour] = ((ta * 100) / tmax) * ft * ct
+
+##############################################################################
+
+## Day of the week and hour of an ER timestamp, created by the EDU with time.ctime()
+## When the timestamp is not valid, the current time of the EPU is used
+def computeTimeIndex(timestamp):
+    try:
+        weekday = weekdays[timestamp[:3]]
+        hour = int(timestamp[11:13])
+        if 0 <= hour <= 23:
+            return (weekday, hour)
+    except (KeyError, ValueError, TypeError):
+        pass
+
+    today = datetime.datetime.today()
+    return (today.weekday(), today.hour)
+
+##############################################################################
+
+def computeTimeFunction(today):
     ## There are different ways to implement this function
     ## We will consider a simple mapping between the day of the week
     global tmax
 
     ## Monday is 0 and Sunday is 6
-    today = datetime.datetime.today().weekday()
     if 0 <= today <= 4: # from Monday to Friday
         return tmax
     elif today == 5:  # Saturday
@@ -213,20 +727,101 @@ def computeGausseanFunction(x):
 
 ##############################################################################
 
-def transmitEA(ea):
-    global idEPU, ipBroker
+## seq identifies an EA already in the journal (when unacknowledged EA are published again)
+def transmitEA(ea, seq=None):
+    global idEPU, ipBroker, eaFormat, journal
 
-    ## Convert the Emergency Alarm to the JSON format
-    jsonEA = ea.toJSON()
+    if eaSink is not None:
+        eaSink(ea)
+        return
 
-    if debug:
-        print("Transmitting the Emergency Alarm", ea.getId())
-        print("EA in the JSON format:")
-        print (jsonEA)
+    publisher = getPublisher(ipBroker,idEPU)
+
+    ## The EA is journaled before it is published, and acknowledged when the broker receives it
+    ## With both formats, the acknowledgement of the JSON EA is used
+    callback = delivered
+    if journal is not None:
+        if seq is None:
+            seq = journal.putEA(ea)
+        callback = lambda mid: acknowledged(mid, seq)
+
+    if eaFormat in ("json", "both"):
+        ## Convert the Emergency Alarm to the JSON format
+        start = epuMetrics.now()
+        jsonEA = ea.toJSON()
+        epuMetrics.observe("serialize", start)
+
+        logPublish.trace("ea_transmitted", ea=ea.getId(), sl=ea.getSeverityLevel(), state=ea.getState(), format="json")
+
+        ## Publish the Emergency Alarm (JSON format) through the connection kept to the MQTT Broker
+        ## This class was created to support the communication to the MQTT
+        start = epuMetrics.now()
+        mid = publisher.publishEA (jsonEA, callback) # This publishes the JSON-based EA to the MQTT Broker
+        countPublished(mid, start)
+
+        ## The same EA in the subtopic of its area, for the EACs subscribing to a bounding box
+        if geohashLevels > 0:
+            publisher.publishEA (jsonEA, None, geohashSubtopic(ea.getLatitude(), ea.getLongitude(), geohashLevels))
+
+    if eaFormat in ("binary", "both"):
+        ## The compact binary format is published in a subtopic (CityAlarm_EPUu/bin)
+        try:
+            start = epuMetrics.now()
+            binaryEA = ea.toBinary()
+            epuMetrics.observe("serialize", start)
+        except ValueError as e:
+            logPublish.error("ea_not_binary", ea=ea.getId(), error=str(e))
+            if journal is not None and eaFormat == "binary":
+                journal.putAck(seq) # It will never be published
+            return
+
+        logPublish.trace("ea_transmitted", ea=ea.getId(), sl=ea.getSeverityLevel(), state=ea.getState(), format="binary", size=len(binaryEA))
+
+        start = epuMetrics.now()
+        if eaFormat == "both":
+            callback = delivered
+        mid = publisher.publishEA (binaryEA, callback, "bin")
+        countPublished(mid, start)
+
+        if geohashLevels > 0:
+            publisher.publishEA (binaryEA, None, "bin/" + geohashSubtopic(ea.getLatitude(), ea.getLongitude(), geohashLevels))
+
+##############################################################################
 
-    ## Connect to the MQTT Broker and publish the Emergency Alarm (JSON format)
-    ## This class was created to support the communication to the MQTT
-    epuMQTT(ipBroker,idEPU).publishEA (jsonEA) # This publishes the JSON-based EA to the MQTT Broker
+## Metrics of a published EA (mid is None when the EA was discarded by the publisher)
+def countPublished(mid, start):
+    epuMetrics.observe("publish", start)
+    if mid is None:
+        epuMetrics.increment("errors_publish_total")
+    else:
+        epuMetrics.increment("ea_published_total")
+
+##############################################################################
+
+## Called by the MQTT publisher when the broker receives an EA
+def delivered(mid):
+    logPublish.trace("ea_delivered", message=mid)
+
+## The same, for EA kept in the journal
+def acknowledged(mid, seq):
+    journal.putAck(seq)
+    delivered(mid)
+
+##############################################################################
+
+## Open the journal, continue the ids of EA and publish again the EA not received by the broker
+def initializeJournal(directory):
+    global journal, idEA
+
+    journal = eaJournal(directory)
+    idEA = max(idEA, journal.getLastId() + 1)
+
+    recovered = journal.getRecovered()
+    if len(recovered) > 0 or journal.getLastId() > 0:
+        print ("Journal recovered: last EA id", journal.getLastId(), "-", len(recovered), "EA not received by the broker")
+
+    for (seq, d) in recovered:
+        transmitEA(eaFromDict(d), seq)
 
 ##############################################################################
 
@@ -235,17 +830,56 @@ def exit_handler():
     if debug:
         print ("Emergency Processor Unit is exiting...")
 
+    closePublishers()
+
+    if journal is not None:
+        journal.close()
+
+    if recorder is not None:
+        recorder.close()
+
 ##############################################################################
 
 def main(argv):
-    global idEPU, ipBroker, fe, fr, ft, localPort, debug
+    global sharedIdEA
+
+    parseOptions(argv)
+
+    ## Create the Risk Zones according to the definitions
+    initializeRiskZones()
+
+    ## Precompute the temporal part of the magnitude of EA
+    initializeTimeTable()
+
+    atexit.register(exit_handler)
+    signal.signal(signal.SIGUSR1, printQueueStatus)
+
+    if processes > 1:
+        ## The supervisor keeps the counter of EA ids and restarts the workers
+        ## Each worker has its own journal. The counter continues after the largest id of all of them
+        start = idEA
+        if journalPath is not None:
+            for k in range(processes):
+                start = max(start, readJournal(os.path.join(journalPath, "worker" + str(k)))[0] + 1)
+        sharedIdEA = epuSupervisor.createCounter(start)
+        epuSupervisor(processes, startEPU, debug, exit_handler).run()
+    else:
+        startEPU()
+
+##############################################################################
+
+## Options of the EPU, also used by the replay tool (erReplay.py)
+def parseOptions(argv):
+    global idEPU, ipBroker, localPort, debug, ingestMode, workers, batchWindow, alarmTimeout, correlationDistance, correlationWindow
+    global eaFormat, processes, queueDepth, overloadPolicy, metricsPort, journalPath, recordPath, zonesPath, geohashLevels, rzCacheSize
+    global logSpec, logPath
 
     ## Parse arguments from the command-line
-    ## Options: debug idEPU ipMQTT
-    opts, ars = getopt.getopt(argv, "hd:e:i:", ["debug=", "idEPU=", "ipBroker="])
+    ## Options: debug idEPU ipMQTT ingestMode workers batchWindow alarmTimeout correlationDistance correlationWindow queueDepth overloadPolicy metricsPort journalPath recordPath zonesPath geohashLevels rzCacheSize logSpec logPath
+    opts, ars = getopt.getopt(argv, "hd:e:i:m:w:b:t:c:n:q:o:z:g:", ["debug=", "idEPU=", "ipBroker=", "mode=", "workers=", "batch=", "timeout=", "correlation=", "window=", "format=", "processes=", "queue=", "overload=", "metrics=", "journal=", "record=", "zones=", "geohash=", "rzcache=", "log=", "logfile="])
     for opt, arg in opts:
         if opt == "-h":
-            print("epu.py -d <debug> -e <idEPU> -i <ipBroker>")
+            print("epu.py -d <debug> -e <idEPU> -i <ipBroker> -m <thread|async> -w <workers> -b <batch window (ms)> -t <alarm timeout (s)> -c <correlation distance (km)> -n <processes> -q <queue depth> -o <block|reject|shed> --window <correlation window (s)> --format <json|binary|both> --metrics <port> --journal <directory> --record <trace file> -z <GeoJSON file> -g <geohash levels> --rzcache <positions> --log <subsystem=level[:sampling],...> --logfile <file>")
             sys.exit(1)
         elif opt in ("-d", "--debug"):
             if arg == "True":
@@ -256,8 +890,50 @@ def main(argv):
             idEPU = arg
         elif opt in ("-i", "--ipBroker"):   # IP address of the MQTT Broker
             ipBroker = arg
+        elif opt in ("-m", "--mode"):   # How ER are received: thread or async
+            ingestMode = arg
+        elif opt in ("-w", "--workers"):   # Number of threads computing EA in the async mode
+            workers = int(arg)
+        elif opt in ("-b", "--batch"):   # Window (ms) to group ER that are scored together
+            batchWindow = float(arg) / 1000
+        elif opt in ("-t", "--timeout"):   # Time (s) after which an EA that is not refreshed is cleared
+            alarmTimeout = float(arg)
+        elif opt in ("-c", "--correlation"):   # Distance (km) between correlated EDUs
+            correlationDistance = float(arg)
+        elif opt == "--window":   # Time (s) during which ER are correlated
+            correlationWindow = float(arg)
+        elif opt == "--format":   # Format of the published EA
+            eaFormat = arg
+        elif opt in ("-n", "--processes"):   # Number of worker processes
+            processes = int(arg)
+        elif opt in ("-q", "--queue"):   # Maximum number of ER waiting for the workers
+            queueDepth = int(arg)
+        elif opt in ("-o", "--overload"):   # What to do when the queue is full
+            overloadPolicy = arg
+        elif opt == "--metrics":   # Local HTTP port of the metrics
+            metricsPort = int(arg)
+        elif opt == "--journal":   # Directory of the journal
+            journalPath = arg
+        elif opt == "--record":   # Trace file of the received ER
+            recordPath = arg
+        elif opt in ("-z", "--zones"):   # GeoJSON file of the Risk Zones
+            zonesPath = arg
+        elif opt in ("-g", "--geohash"):   # Levels of the geohash subtopics of the EA
+            geohashLevels = int(arg)
+        elif opt == "--rzcache":   # Positions whose rz is cached
+            rzCacheSize = int(arg)
+        elif opt == "--log":   # Levels and sampling of the log of each subsystem
+            logSpec = arg
+        elif opt == "--logfile":   # File of the log (the standard output by default)
+            logPath = arg
     ########
 
+    try:
+        configureLog(logSpec, debug, logPath)
+    except (ValueError, OSError) as e:
+        print("Invalid log configuration:", e, ". EPU exiting...")
+        sys.exit(1)
+
     if debug:
         print("Emergency Processor Unit is initializing...")
 
@@ -266,33 +942,144 @@ def main(argv):
         print("The sum of the calibration constants must be equal to 1.0. EPU exiting...")
         sys.exit(1)
 
-    ## Create the Risk Zones according to the definitions
-    initializeRiskZones()
+    if ingestMode not in ("thread", "async"):
+        print("Unknown ingest mode:", ingestMode, ". EPU exiting...")
+        sys.exit(1)
+
+    if eaFormat not in ("json", "binary", "both"):
+        print("Unknown EA format:", eaFormat, ". EPU exiting...")
+        sys.exit(1)
+
+    if geohashLevels < 0 or geohashLevels > 12:
+        print("The geohash levels must be between 0 and 12. EPU exiting...")
+        sys.exit(1)
+
+    if overloadPolicy not in policies:
+        print("Unknown overload policy:", overloadPolicy, ". EPU exiting...")
+        sys.exit(1)
+
+##############################################################################
+
+## Start the threads of the EPU and receive ER from the EDUs
+## With many processes, this is called in each worker process (k is the number of the worker)
+def startEPU(k=None):
+    reusePort = k is not None
+
+    initializeEPU(k)
+
+    ## Latency of the stages and counters, exposed through HTTP
+    if metricsPort > 0:
+        startMetrics(metricsPort + (k or 0))
+
+    ## Trace of the received ER
+    if recordPath is not None:
+        initializeRecorder(recordPath if k is None else recordPath + "." + str(k))
+
+    if reusePort:
+        print("EPU worker", k, "is ready and waiting connections at port", localPort, "...")
+
+    ## Receive ER from the EDU through a single event loop
+    if ingestMode == "async":
+        if not reusePort:
+            print("EPU is ready and waiting connections at port", localPort, "(async mode) ...")
+        asyncERServer(localPort, decodeER, ingest, workers, debug, reusePort).serve()
+        return
 
     ## Receive ER from the EDU
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if reusePort:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     s.bind(("", localPort))
 
-    print("EPU is ready and waiting connections at port", localPort, "...")
+    if not reusePort:
+        print("EPU is ready and waiting connections at port", localPort, "...")
     ## Put the socket into listening mode
     s.listen()
 
     try:
         while True:
+            ## With the "block" policy, no EDU is accepted while the queue is full
+            if ingest is not None and overloadPolicy == "block":
+                ingest.waitSpace()
+
             ## Establish connection with EDU
             c, addr = s.accept()
+            accepted = epuMetrics.now()
 
-            print('\nNew EDU connected:', addr[0], ':', addr[1])
+            logIngest.trace("edu_connected", address=addr[0], port=addr[1])
 
             # Start a new thread to manage the communication and receive ER from the EDU
-            receiveERThread(c).start ()
+            receiveERThread(c, accepted).start ()
 
     except Exception as e:
         print("EPU is closing due to some connection error...")
         print (e)
         s.shutdown(socket.SHUT_RDWR)
 
-    atexit.register(exit_handler)
+##############################################################################
+
+## Create the state and threads that process the ER (k is the number of the worker process)
+def initializeEPU(k=None):
+    global alarms, correlator, batcher, ingest
+
+    ## Keep track of active EA, so refreshes do not create new EA
+    if alarmTimeout > 0:
+        alarms = alarmTable(alarmTimeout, clock)
+        alarmExpiryThread().start()
+
+    ## Merge ER of neighbouring EDUs in a single EA
+    if correlationDistance > 0:
+        correlator = erCorrelator(correlationDistance, correlationWindow, clock)
+
+    ## Group ER that arrive close in time
+    if batchWindow > 0:
+        batcher = erBatcher(processBatch, batchWindow)
+        batcher.start()
+
+    ## Reload the Risk Zones when their file changes
+    if zonesPath is not None:
+        riskZonesThread().start()
+
+    ## Received ER wait in a bounded queue for a fixed pool of threads
+    if ingestMode == "async" and queueDepth <= 0:
+        ingest = ingestQueue(workers * 4, overloadPolicy, isRefresh)
+    elif queueDepth > 0:
+        ingest = ingestQueue(queueDepth, overloadPolicy, isRefresh)
+    if ingest is not None:
+        workerPool(ingest, dispatchER, workers).start()
+
+    ## Durable journal of ER and EA
+    if journalPath is not None:
+        if k is None:
+            initializeJournal(journalPath)
+        else:
+            initializeJournal(os.path.join(journalPath, "worker" + str(k)))
+
+##############################################################################
+
+def initializeRecorder(path):
+    global recorder
+
+    recorder = traceWriter(path)
+    print("Received ER are recorded in", path)
+
+##############################################################################
+
+def startMetrics(port):
+    ## The state of the queue and of the active EA are taken when the metrics are requested
+    if ingest is not None:
+        epuMetrics.putGauge("queue_depth", ingest.size)
+        epuMetrics.putGauge("queue_rejected", lambda: ingest.getStatus()["rejected"])
+        epuMetrics.putGauge("queue_shed", lambda: ingest.getStatus()["shed"])
+    if alarms is not None:
+        epuMetrics.putGauge("active_alarms", alarms.getNumberAlarms)
+    if rzCache is not None:
+        epuMetrics.putGauge("rz_cache_hits", lambda: rzCache.getStatus()["hits"])
+        epuMetrics.putGauge("rz_cache_misses", lambda: rzCache.getStatus()["misses"])
+        epuMetrics.putGauge("rz_cache_size", lambda: rzCache.getStatus()["size"])
+
+    epuMetrics.startMetricsServer(port)
+    print("Metrics of the EPU available at http://127.0.0.1:" + str(port) + "/metrics")
 
 ##############################################################################
 
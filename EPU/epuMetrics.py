@@ -0,0 +1,129 @@
+# *********************************************************************
+# Latency histograms of the stages of the EPU and counters of ER and EA
+# They are exposed in the Prometheus text format by a local HTTP server
+# (GET /metrics). Observations are ignored until the server is started,
+# so the instrumentation costs almost nothing when it is not used
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import bisect
+import http.server
+import threading
+import time
+
+########################################################
+
+## Upper limits (seconds) of the buckets of the histograms, from 10 us to 10 s
+buckets = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+## Stages measured by the EPU, in the order of the pipeline
+stages = ("accept", "recv", "decode", "queue", "rz", "severity", "serialize", "publish", "ack", "end_to_end")
+
+enabled = False
+histograms = {}
+counters = {}
+gauges = {}  # name -> function returning the current value
+lockCounters = threading.Lock()
+
+## Clock used by all measures
+now = time.perf_counter
+
+########################################################
+
+class latencyHistogram():
+    def __init__(self):
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(buckets, seconds)
+        with self.lock:
+            self.counts[i] = self.counts[i] + 1
+            self.sum = self.sum + seconds
+            self.count = self.count + 1
+
+    def snapshot(self):
+        with self.lock:
+            return (list(self.counts), self.sum, self.count)
+
+for stage in stages:
+    histograms[stage] = latencyHistogram()
+
+########################################################
+
+## Record the duration of a stage, given the time (now()) at which it started
+def observe(stage, start):
+    if enabled:
+        histograms[stage].observe(now() - start)
+
+def increment(name, value=1):
+    if enabled:
+        with lockCounters:
+            counters[name] = counters.get(name, 0) + value
+
+def putGauge(name, function):
+    gauges[name] = function
+
+########################################################
+
+## All metrics in the Prometheus text format
+def renderMetrics():
+    lines = []
+
+    lines.append("# HELP cityalarm_epu_stage_seconds Latency of the stages of the EPU")
+    lines.append("# TYPE cityalarm_epu_stage_seconds histogram")
+    for stage in stages:
+        (counts, total, count) = histograms[stage].snapshot()
+        cumulative = 0
+        for le, n in zip(buckets, counts):
+            cumulative = cumulative + n
+            lines.append('cityalarm_epu_stage_seconds_bucket{stage="%s",le="%g"} %d' % (stage, le, cumulative))
+        lines.append('cityalarm_epu_stage_seconds_bucket{stage="%s",le="+Inf"} %d' % (stage, count))
+        lines.append('cityalarm_epu_stage_seconds_sum{stage="%s"} %.9f' % (stage, total))
+        lines.append('cityalarm_epu_stage_seconds_count{stage="%s"} %d' % (stage, count))
+
+    with lockCounters:
+        current = sorted(counters.items())
+    for name, value in current:
+        lines.append("# TYPE cityalarm_epu_%s counter" % name)
+        lines.append("cityalarm_epu_%s %d" % (name, value))
+
+    for name, function in sorted(gauges.items()):
+        lines.append("# TYPE cityalarm_epu_%s gauge" % name)
+        lines.append("cityalarm_epu_%s %d" % (name, function()))
+
+    return "\n".join(lines) + "\n"
+
+########################################################
+
+class metricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        body = renderMetrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    ## Requests are not printed
+    def log_message(self, format, *args):
+        pass
+
+## Start the HTTP server in the background and enable the observations
+def startMetricsServer(port, address="127.0.0.1"):
+    global enabled
+
+    server = http.server.ThreadingHTTPServer((address, port), metricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    enabled = True
+    return server
@@ -0,0 +1,99 @@
+# *********************************************************************
+# This class runs the EPU as a group of worker processes
+# All workers receive ER at the same TCP port (SO_REUSEPORT), so the
+# connections of the EDUs are distributed among them by the kernel.
+# Each worker has its own threads and MQTT connection. The supervisor
+# restarts the workers that stop, and keeps the counter of EA ids, which
+# is shared by all workers
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import traceback
+
+########################################################
+
+class epuSupervisor():
+    ## worker(k) runs the worker k (0 to processes-1) and should never return
+    ## cleanup() is run by a worker before it exits (also when it is stopped by SIGTERM),
+    ## since os._exit skips the atexit handlers
+    def __init__(self, processes, worker, debug, cleanup=None):
+        self.processes = processes
+        self.worker = worker
+        self.debug = debug
+        self.cleanup = cleanup
+        self.children = {}  # pid -> k
+
+    ## Counter shared by the processes. It must be created before the workers
+    @staticmethod
+    def createCounter(start):
+        return multiprocessing.get_context("fork").Value("q", start)
+
+    def spawn(self, k):
+        pid = os.fork()
+        if pid == 0:
+            ## Worker process
+            signal.signal(signal.SIGTERM, self.exitWorker)
+            signal.signal(signal.SIGINT, self.exitWorker)
+            code = 0
+            try:
+                self.worker(k)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                self.finish(code)
+
+        self.children[pid] = k
+        if self.debug:
+            print ("EPU worker", k, "started with pid", pid)
+
+    ## SIGTERM (or SIGINT) of a worker
+    def exitWorker(self, signum, frame):
+        self.finish(0)
+
+    ## Run the cleanup (only once) and exit the worker
+    def finish(self, code):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            if self.cleanup is not None:
+                self.cleanup()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    def stop(self, signum, frame):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        sys.exit(0)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for k in range(self.processes):
+            self.spawn(k)
+
+        ## Restart the workers that stop
+        while True:
+            pid, status = os.wait()
+            k = self.children.pop(pid, None)
+            if k is None:
+                continue
+
+            print ("EPU worker", k, "stopped (status", status, "). Restarting...")
+            time.sleep(1)  # Avoid a loop of restarts of a worker that can not start
+            self.spawn(k)
@@ -0,0 +1,70 @@
+# *********************************************************************
+# This class groups the Events Reports (ER) received in a short window
+# The ER of each group (micro-batch) are scored together by the EPU
+# The ER waiting for a batch are bounded: when the batcher falls behind,
+# put blocks, so the ingest queue fills and its overload policy applies
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import queue
+import threading
+import time
+
+from cityalarm.eventLog import getLogger
+
+logQueue = getLogger("queue")
+
+########################################################
+
+class erBatcher(threading.Thread):
+    ## processor receives the list of ER of a batch
+    ## window is the maximum time (seconds) that the first ER of a batch waits for others
+    ## depth is the maximum number of ER waiting for a batch (by default, two batches)
+    def __init__(self, processor, window, maxBatch=256, depth=None):
+        threading.Thread.__init__(self, daemon=True)
+        self.processor = processor
+        self.window = window
+        self.maxBatch = maxBatch
+        self.pending = queue.Queue(maxsize=depth if depth is not None else 2 * maxBatch)
+
+        self.lock = threading.Lock()
+        self.allDone = threading.Condition(self.lock)
+        self.unfinished = 0  # ER waiting or being processed
+
+    def put(self, er):
+        with self.lock:
+            self.unfinished = self.unfinished + 1
+        self.pending.put(er)
+
+    ## Wait until all ER put in the batcher are processed
+    def join(self):
+        with self.lock:
+            while self.unfinished > 0:
+                self.allDone.wait()
+
+    def run(self):
+        while True:
+            ## Wait for the first ER of the next batch
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.window
+
+            while len(batch) < self.maxBatch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self.processor(batch)
+            except Exception as e:
+                logQueue.error("batch_failed", error=str(e), size=len(batch))
+            finally:
+                with self.lock:
+                    self.unfinished = self.unfinished - len(batch)
+                    if self.unfinished == 0:
+                        self.allDone.notify_all()
@@ -0,0 +1,261 @@
+# *********************************************************************
+# This class correlates the Events Reports (ER) of neighbouring EDUs
+# ER received within a time window, from EDUs closer than a given distance
+# and with at least one common event, are grouped in the same cluster
+# (similar to DBSCAN, with a single ER per EDU). Each cluster generates a
+# single composite Emergency Alarm. The ER are kept in a grid of cells, so
+# only the ER of the neighbouring cells are tested when a new ER arrives
+# Clusters are merged when a new ER links them, but they are not split
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import collections
+import heapq
+import itertools
+import math
+import threading
+import time
+
+########################################################
+
+## Mean radius of the Earth (km)
+earthRadius = 6371.0088
+
+## Order of insertion of the ER, used to break ties in the heaps of the clusters
+sequence = itertools.count()
+
+########################################################
+
+## The last ER of an EDU
+class erPoint():
+    def __init__(self, edu, la, lo, events, context, now):
+        self.edu = edu
+        self.la = la
+        self.lo = lo
+        self.events = events
+        self.context = context  # Part of the sl that depends on the position and time of the ER
+        self.time = now
+        self.cell = None
+        self.cluster = None
+        self.removed = False
+
+########################################################
+
+## A group of correlated ER. Merged clusters point to the cluster that absorbed them
+## The position, events and context of the cluster are updated incrementally
+class erCluster():
+    def __init__(self, i):
+        self.id = i
+        self.parent = None
+        self.members = {}  # edu -> erPoint
+        self.eventCount = collections.Counter()
+        self.sumLa = 0.0
+        self.sumLo = 0.0
+        self.contexts = []  # Heap of (-context, sequence, erPoint). Removed ER are discarded lazily
+
+    def find(self):
+        root = self
+        while root.parent is not None:
+            root = root.parent
+
+        ## Path compression
+        node = self
+        while node.parent is not None and node.parent is not root:
+            node.parent, node = root, node.parent
+
+        return root
+
+    def putPoint(self, point):
+        self.members[point.edu] = point
+        self.eventCount.update(point.events)
+        self.sumLa = self.sumLa + point.la
+        self.sumLo = self.sumLo + point.lo
+        heapq.heappush(self.contexts, (-point.context, next(sequence), point))
+
+        ## Rebuild the heap when most of its ER were already removed
+        if len(self.contexts) > 2 * len(self.members) + 16:
+            self.contexts = [c for c in self.contexts if self.members.get(c[2].edu) is c[2]]
+            heapq.heapify(self.contexts)
+
+    def removePoint(self, point):
+        if self.members.get(point.edu) is point:
+            del self.members[point.edu]
+            self.eventCount.subtract(point.events)
+            self.eventCount += collections.Counter()  # Drop the events that are no longer reported
+            self.sumLa = self.sumLa - point.la
+            self.sumLo = self.sumLo - point.lo
+
+    def getEvents(self):
+        return sorted(self.eventCount)
+
+    ## Mean position of the EDUs of the cluster
+    def getPosition(self):
+        n = len(self.members)
+        return (self.sumLa / n, self.sumLo / n)
+
+    ## The highest context among the ER of the cluster
+    def getContext(self):
+        while self.members.get(self.contexts[0][2].edu) is not self.contexts[0][2]:
+            heapq.heappop(self.contexts)
+        return -self.contexts[0][0]
+
+    def getNumberEDU(self):
+        return len(self.members)
+
+    ## Exchange the contents of two clusters, so the smaller one is always moved into the larger
+    def swap(self, other):
+        (self.members, other.members) = (other.members, self.members)
+        (self.eventCount, other.eventCount) = (other.eventCount, self.eventCount)
+        (self.sumLa, other.sumLa) = (other.sumLa, self.sumLa)
+        (self.sumLo, other.sumLo) = (other.sumLo, self.sumLo)
+        (self.contexts, other.contexts) = (other.contexts, self.contexts)
+
+########################################################
+
+class erCorrelator():
+    ## distance (km) between correlated EDUs, window (s) in which their ER are correlated
+    ## clock returns the current time (s). The replay of a trace uses the time of the trace
+    def __init__(self, distance, window, clock=time.monotonic):
+        self.distance = distance
+        self.window = window
+        self.clock = clock
+
+        ## Cells of about distance x distance km
+        self.cellSize = math.degrees(distance / earthRadius)
+
+        self.cells = {}   # cell -> set of erPoint
+        self.latest = {}  # edu -> erPoint
+        self.arrivals = collections.deque()
+        self.idCluster = 1
+        self.lock = threading.Lock()
+
+    ## Insert the ER of an EDU. Returns the cluster of the ER and the ids of the clusters absorbed by it
+    ## The cluster is returned as a snapshot: (id, latitude, longitude, events, context, number of EDUs)
+    def add(self, edu, la, lo, events, context, now=None):
+        if now is None:
+            now = self.clock()
+        events = frozenset(events)
+
+        with self.lock:
+            self.expire(now)
+
+            ## Only the last ER of each EDU is correlated
+            previous = self.latest.get(edu)
+            if previous is not None:
+                self.removePoint(previous)
+
+            point = erPoint(edu, la, lo, events, context, now)
+
+            ## Clusters of the neighbouring ER with common events
+            ## The EDU stays in its cluster while it reports some of the same events
+            roots = []
+            if previous is not None and not events.isdisjoint(previous.events):
+                roots.append(previous.cluster.find())
+            for other in self.getNeighbours(la, lo):
+                if events.isdisjoint(other.events):
+                    continue
+                if self.computeDistance(point, other) > self.distance:
+                    continue
+                root = other.cluster.find()
+                if root not in roots:
+                    roots.append(root)
+
+            absorbed = []
+            if len(roots) == 0:
+                cluster = erCluster(self.idCluster)
+                self.idCluster = self.idCluster + 1
+            else:
+                ## The oldest cluster absorbs the others
+                roots.sort(key=lambda c: c.id)
+                cluster = roots[0]
+                for other in roots[1:]:
+                    self.merge(cluster, other)
+                    absorbed.append(other.id)
+
+            point.cluster = cluster
+            cluster.putPoint(point)
+
+            point.cell = self.cell(la, lo)
+            self.cells.setdefault(point.cell, set()).add(point)
+            self.latest[edu] = point
+            self.arrivals.append(point)
+
+            (cla, clo) = cluster.getPosition()
+            snapshot = (cluster.id, cla, clo, cluster.getEvents(), cluster.getContext(), cluster.getNumberEDU())
+            return (snapshot, absorbed)
+
+    def cell(self, la, lo):
+        return (math.floor(la / self.cellSize), math.floor(lo / self.cellSize))
+
+    def getNeighbours(self, la, lo):
+        (i, j) = self.cell(la, lo)
+
+        ## A degree of longitude is shorter than a degree of latitude, so more cells are needed
+        scale = math.cos(math.radians(min(abs(la) + self.cellSize, 89.9)))
+        k = math.ceil(1 / scale)
+
+        for di in (-1, 0, 1):
+            for dj in range(-k, k + 1):
+                for point in self.cells.get((i + di, j + dj), ()):
+                    yield point
+
+    ## Equirectangular approximation, accurate at the distances between neighbouring EDUs
+    def computeDistance(self, a, b):
+        x = math.radians(b.lo - a.lo) * math.cos(math.radians((a.la + b.la) / 2))
+        y = math.radians(b.la - a.la)
+        return earthRadius * math.sqrt(x * x + y * y)
+
+    def merge(self, cluster, other):
+        if len(other.members) > len(cluster.members):
+            cluster.swap(other)
+
+        for point in other.members.values():
+            current = cluster.members.get(point.edu)
+            if current is None or current.time < point.time:
+                if current is not None:
+                    cluster.removePoint(current)
+                cluster.putPoint(point)
+
+        ## The absorbed cluster keeps no ER (its heap would keep them alive)
+        other.members = {}
+        other.eventCount = collections.Counter()
+        other.sumLa = 0.0
+        other.sumLo = 0.0
+        other.contexts = []
+        other.parent = cluster
+
+    def removePoint(self, point):
+        if point.removed:
+            return
+        point.removed = True
+
+        cell = self.cells.get(point.cell)
+        if cell is not None:
+            cell.discard(point)
+            if len(cell) == 0:
+                del self.cells[point.cell]
+
+        point.cluster.find().removePoint(point)
+        if self.latest.get(point.edu) is point:
+            del self.latest[point.edu]
+
+    ## Remove the ER older than the window
+    def expire(self, now):
+        while len(self.arrivals) > 0 and (now - self.arrivals[0].time) > self.window:
+            self.removePoint(self.arrivals.popleft())
+
+    ## Id of the cluster in which the EDU is, if its last ER (still in the window) had the same events
+    ## An ER with the same events keeps the EDU in that cluster (it only refreshes the composite EA)
+    def getCluster(self, edu, events):
+        with self.lock:
+            point = self.latest.get(edu)
+            if point is None or point.removed or point.events != frozenset(events):
+                return None
+            if (self.clock() - point.time) > self.window:
+                return None
+            return point.cluster.find().id
+
+    def getNumberEDU(self):
+        return len(self.latest)
@@ -0,0 +1,67 @@
+# *********************************************************************
+# Framing of the Events Reports (ER) sent through persistent connections
+# A framed connection starts with the MAGIC preamble and then carries
+# many ER back to back, each one prefixed by its length (4 bytes, big endian)
+# A frame with length 0 is a keep-alive sent by the EDU and carries no ER
+# Connections that do not start with the preamble are the original format:
+# a single JSON ER, after which the EDU closes the connection
+# When the EPU is overloaded, it answers with BUSY followed by the number of
+# seconds the EDU should wait (as a frame in framed connections, followed by
+# the number of the refused ER in the connection, starting at 1)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import struct
+
+########################################################
+
+MAGIC = b"CAF1"  # CityAlarm Framing, version 1
+HEADER = struct.Struct(">I")
+
+## Maximum size of an ER, to protect the EPU from misbehaving EDUs
+maxSize = 65536
+
+########################################################
+
+def encodeFrame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+## sequence is the number of the refused ER in a framed connection
+def encodeBusy(seconds, sequence=None):
+    if sequence is None:
+        return b"BUSY " + str(int(seconds)).encode()
+    return b"BUSY " + str(int(seconds)).encode() + b" " + str(sequence).encode()
+
+########################################################
+
+## Incremental decoder of a framed stream
+## Received bytes are fed as they arrive and the complete frames are returned
+class frameDecoder():
+    def __init__(self, limit=maxSize):
+        self.buffer = bytearray()
+        self.limit = limit
+
+    def feed(self, data):
+        self.buffer.extend(data)
+
+        frames = []
+        while len(self.buffer) >= HEADER.size:
+            (size,) = HEADER.unpack_from(self.buffer)
+            if size > self.limit:
+                raise ValueError("Frame of " + str(size) + " bytes exceeds the maximum size")
+
+            end = HEADER.size + size
+            if len(self.buffer) < end:
+                break
+
+            if size > 0: # Keep-alive frames are discarded
+                frames.append(bytes(self.buffer[HEADER.size:end]))
+            del self.buffer[:end]
+
+        return frames
+
+    ## Number of bytes of an incomplete frame
+    def pending(self):
+        return len(self.buffer)
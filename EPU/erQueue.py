@@ -0,0 +1,159 @@
+# *********************************************************************
+# Bounded queue of received Events Reports (ER), processed by a fixed
+# pool of threads. When the queue is full, one of the overload policies
+# is applied:
+#   block  - the EPU waits for space (and stops accepting connections)
+#   reject - the ER is refused and the EDU receives a retry hint
+#   shed   - refreshes of active EA are dropped first (the oldest one);
+#            new ER are only refused when no refresh is waiting
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import collections
+import math
+import threading
+import time
+
+import epuMetrics
+from cityalarm.eventLog import getLogger
+
+logQueue = getLogger("queue")
+
+########################################################
+
+policies = ("block", "reject", "shed")
+
+class ingestQueue():
+    ## isRefresh(er) tells if an ER only refreshes an active EA (lower priority)
+    def __init__(self, depth, policy, isRefresh):
+        self.depth = depth
+        self.policy = policy
+        self.isRefresh = isRefresh
+
+        self.fresh = collections.deque()
+        self.refresh = collections.deque()
+        self.lock = threading.Lock()
+        self.notEmpty = threading.Condition(self.lock)
+        self.notFull = threading.Condition(self.lock)
+        self.allDone = threading.Condition(self.lock)
+        self.unfinished = 0  # ER queued or being processed
+
+        ## Counters
+        self.received = 0
+        self.processed = 0
+        self.rejected = 0
+        self.shed = 0
+        self.blocked = 0
+        self.serviceTime = 0.0  # Mean time (s) to process an ER (exponential average)
+
+    def size(self):
+        return len(self.fresh) + len(self.refresh)
+
+    ## Insert an ER. Returns False if it was refused and the EDU should retry later
+    ## With block=False, the "block" policy refuses the ER instead of waiting
+    def put(self, er, block=True):
+        refresh = self.isRefresh(er)
+
+        with self.lock:
+            if self.size() >= self.depth and self.policy == "block" and not block:
+                return False
+
+            self.received = self.received + 1
+
+            if self.size() >= self.depth:
+                if self.policy == "block":
+                    self.blocked = self.blocked + 1
+                    while self.size() >= self.depth:
+                        self.notFull.wait()
+
+                elif self.policy == "shed" and len(self.refresh) > 0:
+                    self.refresh.popleft()
+                    self.unfinished = self.unfinished - 1
+                    self.shed = self.shed + 1
+
+                elif self.policy == "shed" and refresh:
+                    self.shed = self.shed + 1
+                    return True
+
+                else:
+                    self.rejected = self.rejected + 1
+                    return False
+
+            if refresh:
+                self.refresh.append((er, epuMetrics.now()))
+            else:
+                self.fresh.append((er, epuMetrics.now()))
+            self.unfinished = self.unfinished + 1
+            self.notEmpty.notify()
+            return True
+
+    ## New ER are served before refreshes
+    def get(self):
+        with self.lock:
+            while self.size() == 0:
+                self.notEmpty.wait()
+
+            if len(self.fresh) > 0:
+                (er, queued) = self.fresh.popleft()
+            else:
+                (er, queued) = self.refresh.popleft()
+            self.notFull.notify()
+
+        epuMetrics.observe("queue", queued)
+        return er
+
+    ## Wait until the queue has space (used before accepting new connections)
+    def waitSpace(self):
+        with self.lock:
+            while self.size() >= self.depth:
+                self.notFull.wait()
+
+    def done(self, elapsed):
+        with self.lock:
+            self.processed = self.processed + 1
+            self.serviceTime = 0.9 * self.serviceTime + 0.1 * elapsed
+            self.unfinished = self.unfinished - 1
+            if self.unfinished == 0:
+                self.allDone.notify_all()
+
+    ## Wait until all queued ER are processed
+    def join(self):
+        with self.lock:
+            while self.unfinished > 0:
+                self.allDone.wait()
+
+    ## Seconds an EDU should wait before sending again, to empty the queue
+    def getRetryHint(self, workers):
+        return max(1, math.ceil(self.size() * self.serviceTime / workers))
+
+    def getStatus(self):
+        with self.lock:
+            return {"depth": self.size(), "capacity": self.depth, "fresh": len(self.fresh), "refresh": len(self.refresh), \
+                    "received": self.received, "processed": self.processed, "rejected": self.rejected, \
+                    "shed": self.shed, "blocked": self.blocked}
+
+########################################################
+
+## Fixed pool of threads processing the ER of the queue
+class workerPool():
+    def __init__(self, queue, processor, workers):
+        self.queue = queue
+        self.processor = processor
+        self.workers = workers
+
+    def start(self):
+        for _ in range(self.workers):
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            er = self.queue.get()
+            start = time.monotonic()
+            try:
+                self.processor(er)
+            except Exception as e:
+                logQueue.error("process_failed", error=str(e))
+                epuMetrics.increment("errors_process_total")
+            self.queue.done(time.monotonic() - start)
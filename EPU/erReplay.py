@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# *********************************************************************
+# Replay of a trace of ER recorded by the EPU (epu.py --record)
+# The ER are given to the same parsing and scoring path of the EPU, at the
+# recorded pace (1x), N times faster, or as fast as possible (speed 0)
+# The severity levels use the timestamps of the ER, so the EA are the same
+# of the recorded day. The alarm timeout, the correlation window and the
+# expiry of the EA follow the recorded time of the trace, at any speed.
+# The throughput of the run is printed at the end
+# Options after -- are options of the EPU (see epu.py -h)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import os
+import sys, getopt
+import threading
+import time
+
+import epu
+from erTrace import readTrace
+
+########################################################
+
+tracePath = None
+speed = 1  # 1 is the recorded pace, N is N times faster, 0 is as fast as possible
+publish = False  # EA are published to the MQTT Broker of the EPU (-i after --), or only counted
+verbose = False  # Keep the messages of the EPU
+
+numberEA = 0
+lockEA = threading.Lock()
+
+traceTime = 0.0  # Recorded time (s) of the last replayed ER, the clock of the EPU during the replay
+
+########################################################
+
+## Receives the EA when they are not published
+def countEA(ea):
+    global numberEA
+
+    with lockEA:
+        numberEA = numberEA + 1
+
+## Clock of the EPU during the replay
+def getTraceTime():
+    return traceTime
+
+def replay():
+    global traceTime
+
+    numberER = 0
+    refused = 0
+    lag = 0.0  # Largest delay (s) of the ER in relation to the scaled recorded time
+
+    start = time.monotonic()
+    first = None
+    expiry = None  # Recorded time of the next expiry of the EA
+    for (arrival, received) in readTrace(tracePath):
+        if first is None:
+            first = arrival
+
+        if speed > 0:
+            delay = start + (arrival - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+
+        ## The EA are expired at the pace of the trace (as the expiry thread of the EPU does)
+        traceTime = arrival
+        if epu.alarms is not None:
+            if expiry is None:
+                expiry = arrival + max(1, epu.alarmTimeout / 4)
+            elif arrival >= expiry:
+                epu.expireAlarms()
+                expiry = arrival + max(1, epu.alarmTimeout / 4)
+
+        if not epu.handleER(received):
+            refused = refused + 1
+        numberER = numberER + 1
+
+    ## Wait for the ER still in the queue or in the current batch
+    if epu.ingest is not None:
+        epu.ingest.join()
+    if epu.batcher is not None:
+        epu.batcher.join()
+
+    elapsed = time.monotonic() - start
+    recorded = 0 if first is None else arrival - first
+    return (numberER, refused, elapsed, recorded, lag)
+
+########################################################
+
+def main(argv):
+    global tracePath, speed, publish, verbose
+
+    opts, ars = getopt.getopt(argv, "hf:s:pv", ["trace=", "speed=", "publish", "verbose"])
+    for opt, arg in opts:
+        if opt == "-h":
+            print("erReplay.py -f <trace> -s <speed (1, N or 0 for max)> -p (publish EA) -v (verbose) -- <options of the EPU>")
+            sys.exit(1)
+        elif opt in ("-f", "--trace"):
+            tracePath = arg
+        elif opt in ("-s", "--speed"):
+            speed = float(arg)
+        elif opt in ("-p", "--publish"):
+            publish = True
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+    ########
+
+    if tracePath is None:
+        print("A trace file must be given (-f). Exiting...")
+        sys.exit(1)
+
+    epu.debug = False
+    epu.parseOptions(ars)
+
+    ## Timeouts of the EPU follow the recorded time of the trace
+    epu.clock = getTraceTime
+
+    if not publish:
+        epu.eaSink = countEA
+
+    epu.initializeRiskZones()
+    epu.initializeTimeTable()
+    epu.initializeEPU()
+
+    ## The messages of the EPU for each ER would limit the throughput
+    stdout = sys.stdout
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    try:
+        (numberER, refused, elapsed, recorded, lag) = replay()
+    finally:
+        sys.stdout = stdout
+
+    pace = "max" if speed <= 0 else str(speed) + "x"
+    print("Replay of", tracePath, "at", pace, "speed")
+    print("ER replayed:", numberER, "in %.3f s (%.1f ER/s), recorded during %.1f s" % (elapsed, numberER / max(elapsed, 1e-9), recorded))
+    if publish:
+        print("EA published to the MQTT Broker", epu.ipBroker)
+    else:
+        print("EA generated:", numberEA, "(%.1f EA/s)" % (numberEA / max(elapsed, 1e-9)))
+    if refused > 0:
+        print("ER refused by the queue:", refused)
+    if speed > 0:
+        print("Largest delay in relation to the recorded pace: %.1f ms" % (lag * 1000))
+
+    epu.exit_handler()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,71 @@
+# *********************************************************************
+# Trace of the Events Reports (ER) received by the EPU
+# Each ER is recorded as received (JSON or binary), after its arrival time
+# (seconds since the epoch, double) and size: 12 bytes per ER plus the ER
+# The file starts with the MAGIC of the format. Records are buffered and
+# written to the file every second by a background thread
+# Traces are played back by erReplay.py
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import struct
+import threading
+import time
+
+########################################################
+
+MAGIC = b"CATRACE1"
+RECORD = struct.Struct(">dI")
+
+class traceWriter():
+    ## New records are appended to an existing trace
+    def __init__(self, path, flushInterval=1):
+        self.path = path
+        self.flushInterval = flushInterval
+        self.number = 0
+        self.lock = threading.Lock()
+
+        self.file = open(path, "ab", buffering=1024 * 1024)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def put(self, received, arrival=None):
+        if arrival is None:
+            arrival = time.time()
+        with self.lock:
+            self.file.write(RECORD.pack(arrival, len(received)))
+            self.file.write(received)
+            self.number = self.number + 1
+
+    def run(self):
+        while not self.file.closed:
+            time.sleep(self.flushInterval)
+            with self.lock:
+                if not self.file.closed:
+                    self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+########################################################
+
+## Records of a trace as (arrival time, ER). A record interrupted at the end of the file is ignored
+def readTrace(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a trace of ER")
+
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            (arrival, size) = RECORD.unpack(header)
+            received = f.read(size)
+            if len(received) < size:
+                return
+            yield (arrival, received)
@@ -0,0 +1,167 @@
+# *********************************************************************
+# Risk Zones (RZ) loaded from a GeoJSON file (FeatureCollection)
+# Polygon and MultiPolygon features are polygon RZ, and Point features
+# with a "radius" (km) are circular RZ. Each feature has a "risk" (rz) and
+# optionally an "id" in its properties. Coordinates are (longitude, latitude)
+# The edges of each polygon RZ are compiled once in an edge table: the
+# bounding box is divided in horizontal bands, and each band keeps the
+# arrays of the edges crossing it. A point is tested (even-odd rule) only
+# against the edges of its band, so holes and many parts are supported
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import json
+import math
+import numpy as np
+
+from elementsEPU import RiskZone
+
+########################################################
+
+## Mean radius of the Earth (km), as used by the haversine lib
+earthRadius = 6371.0088
+
+## Average number of edges of a band of the edge tables
+edgesPerBand = 8
+maxBands = 256
+
+########################################################
+
+## All RZ of a GeoJSON file. Raises ValueError if the file is not valid
+def loadGeoJSON(path):
+    with open(path) as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError("The GeoJSON file is not an object")
+    if data.get("type") == "FeatureCollection":
+        features = data.get("features", [])
+        if not isinstance(features, list):
+            raise ValueError("The features of the FeatureCollection are not a list")
+    else:
+        features = [data]
+
+    zones = []
+    for k, feature in enumerate(features, 1):
+        if not isinstance(feature, dict):
+            raise ValueError("Feature " + str(k) + " is not an object")
+        properties = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        if not isinstance(properties, dict) or not isinstance(geometry, dict):
+            raise ValueError("Feature " + str(k) + " has invalid properties or geometry")
+        kind = geometry.get("type")
+        coordinates = geometry.get("coordinates")
+        if not isinstance(coordinates, list):
+            raise ValueError("Feature " + str(k) + " has no coordinates")
+
+        if "risk" not in properties:
+            raise ValueError("Feature " + str(k) + " has no risk")
+        risk = properties["risk"]
+        i = properties.get("id", k)
+
+        if kind == "Point":
+            if "radius" not in properties:
+                raise ValueError("Point feature " + str(i) + " has no radius")
+            zones.append(RiskZone(i, coordinates[1], coordinates[0], properties["radius"], risk))
+            continue
+
+        if kind == "Polygon":
+            polygons = [coordinates]
+        elif kind == "MultiPolygon":
+            polygons = coordinates
+        else:
+            raise ValueError("Feature " + str(i) + " has an unsupported geometry: " + str(kind))
+
+        polygons = [[[(p[0], p[1]) for p in ring] for ring in polygon] for polygon in polygons]
+        for polygon in polygons:
+            for ring in polygon:
+                if len(ring) < 3:
+                    raise ValueError("Feature " + str(i) + " has a ring with less than 3 points")
+
+        ## Circle around the bounding box, used to choose the cells of the spatial index
+        (minLa, minLo, maxLa, maxLo) = computeBoundingBox(polygons)
+        la = (minLa + maxLa) / 2
+        lo = (minLo + maxLo) / 2
+        zones.append(RiskZone(i, la, lo, computeDistance(la, lo, maxLa, maxLo), risk, polygons))
+
+    return zones
+
+## Bounding box of polygons: (minimum latitude, minimum longitude, maximum latitude, maximum longitude)
+def computeBoundingBox(polygons):
+    los = [p[0] for polygon in polygons for ring in polygon for p in ring]
+    las = [p[1] for polygon in polygons for ring in polygon for p in ring]
+    return (min(las), min(los), max(las), max(los))
+
+## Haversine distance (km)
+def computeDistance(la1, lo1, la2, lo2):
+    la1, lo1, la2, lo2 = map(math.radians, (la1, lo1, la2, lo2))
+    d = math.sin((la2 - la1) / 2) ** 2 + math.cos(la1) * math.cos(la2) * math.sin((lo2 - lo1) / 2) ** 2
+    return 2 * earthRadius * math.asin(math.sqrt(d))
+
+########################################################
+
+## Edge table of the polygons of a RZ
+class polygonTable():
+    def __init__(self, polygons):
+        (self.minLa, self.minLo, self.maxLa, self.maxLo) = computeBoundingBox(polygons)
+
+        ## Edges of all rings (horizontal edges never cross the ray of a point)
+        edges = []
+        for polygon in polygons:
+            for ring in polygon:
+                for a, b in zip(ring, ring[1:] + ring[:1]):
+                    if a[1] != b[1]:
+                        edges.append((a[0], a[1], b[0], b[1]))
+
+        self.numberBands = max(1, min(maxBands, len(edges) // edgesPerBand))
+        self.height = (self.maxLa - self.minLa) / self.numberBands
+        if self.height <= 0:
+            self.height = 1.0
+
+        bands = [[] for _ in range(self.numberBands)]
+        for edge in edges:
+            first = self.band(min(edge[1], edge[3]))
+            last = self.band(max(edge[1], edge[3]))
+            for b in range(first, last + 1):
+                bands[b].append(edge)
+
+        ## For each band, the arrays x1, y1, y2 and the inverse slope of its edges
+        self.table = []
+        for band in bands:
+            e = np.array(band, dtype=float).reshape(-1, 4)
+            slope = (e[:, 2] - e[:, 0]) / (e[:, 3] - e[:, 1])
+            self.table.append((e[:, 0], e[:, 1], e[:, 3], slope))
+
+    def band(self, la):
+        return min(self.numberBands - 1, max(0, int((la - self.minLa) / self.height)))
+
+    def contains(self, la, lo):
+        if la < self.minLa or la > self.maxLa or lo < self.minLo or lo > self.maxLo:
+            return False
+
+        (x1, y1, y2, slope) = self.table[self.band(la)]
+        crossing = (y1 > la) != (y2 > la)
+        return np.count_nonzero(crossing & (lo < x1 + (la - y1) * slope)) % 2 == 1
+
+    ## The same test for arrays of positions. Returns an array of booleans
+    def containsMany(self, las, los):
+        las = np.asarray(las, dtype=float)
+        los = np.asarray(los, dtype=float)
+        inside = np.zeros(len(las), dtype=bool)
+
+        box = (las >= self.minLa) & (las <= self.maxLa) & (los >= self.minLo) & (los <= self.maxLo)
+        positions = np.nonzero(box)[0]
+        bands = np.clip(((las[positions] - self.minLa) / self.height).astype(np.intp), 0, self.numberBands - 1)
+
+        ## Positions of the same band are tested together against its edges
+        for b in np.unique(bands):
+            p = positions[bands == b]
+            (x1, y1, y2, slope) = self.table[b]
+            la = las[p][:, None]
+            lo = los[p][:, None]
+            crossing = (y1 > la) != (y2 > la)
+            inside[p] = np.count_nonzero(crossing & (lo < x1 + (la - y1) * slope), axis=1) % 2 == 1
+
+        return inside
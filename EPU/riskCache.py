@@ -0,0 +1,76 @@
+# *********************************************************************
+# Cache of the risk level (rz) of the positions of the EDUs
+# Fixed EDUs send the same coordinates with all their ER. The rz of each
+# position (quantized) is kept in a bounded LRU cache, so most ER skip the
+# Risk Zones. Mobile EDUs (with a GPS tracker) rarely repeat a position, so
+# a position is only cached when it is seen for the second time: positions
+# seen once are only remembered (bounded), and the positions of moving EDUs
+# do not evict those of the fixed ones. Entries belong to
+# the spatial index used to compute them: when the Risk Zones are reloaded,
+# the cache is emptied and entries of the previous index are not accepted
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import collections
+import threading
+
+########################################################
+
+class riskCache():
+    ## quantum is the resolution (degrees) of the cached positions (1e-6 is about 0.1 m)
+    def __init__(self, size, index, quantum=0.000001):
+        self.size = size
+        self.quantum = quantum
+        self.index = index
+        self.entries = collections.OrderedDict()  # (la, lo) quantized -> rz
+        self.seen = collections.OrderedDict()     # Positions seen once (not cached yet)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, la, lo):
+        return (round(la / self.quantum), round(lo / self.quantum))
+
+    ## rz of a position computed with the given index, or None
+    def get(self, index, la, lo):
+        key = self.key(la, lo)
+        with self.lock:
+            if index is self.index:
+                risk = self.entries.get(key)
+                if risk is not None:
+                    self.entries.move_to_end(key)
+                    self.hits = self.hits + 1
+                    return risk
+            self.misses = self.misses + 1
+            return None
+
+    def put(self, index, la, lo, risk):
+        key = self.key(la, lo)
+        with self.lock:
+            ## Computed with an index that was already replaced
+            if index is not self.index:
+                return
+            if key not in self.entries:
+                if self.seen.pop(key, None) is None:
+                    self.seen[key] = True
+                    if len(self.seen) > self.size:
+                        self.seen.popitem(last=False)
+                    return
+            self.entries[key] = risk
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    ## The Risk Zones changed: all entries are discarded
+    def reset(self, index):
+        with self.lock:
+            self.index = index
+            self.entries.clear()
+            self.seen.clear()
+
+    def getStatus(self):
+        with self.lock:
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,193 @@
+# *********************************************************************
+# Spatial index of the Risk Zones (RZ) of the EPU
+# The area is divided in a regular grid of cells (in degrees) and each RZ
+# is registered in all cells touched by its bounding box. A lookup returns
+# only the RZ registered in the cell of the EDU, which are then tested
+# with the exact distance by the EPU. The RZ of each cell are sorted by
+# decreasing risk, so the EPU can stop at the first RZ containing the EDU
+# The RZ are also kept in arrays to compute the risk of many EDU at once
+# Polygon RZ are registered by the bounding box of their polygons and are
+# tested with their precompiled edge tables (geoZones)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import math
+import numpy as np
+
+from geoZones import polygonTable, computeBoundingBox
+
+########################################################
+
+## Mean radius of the Earth (km), as used by the haversine lib
+earthRadius = 6371.0088
+
+## The bounding boxes are slightly enlarged so no RZ is missed due to rounding
+margin = 1.01
+
+## RZ touching more cells are always tested (as the wide RZ), so one large RZ does not fill the grid
+maxCells = 10000
+
+########################################################
+
+class riskIndex():
+    ## cellSize is the side of each cell in degrees (0.05 is about 5.5 km)
+    ## By default, it is the median diameter of the circular RZ, so most RZ touch few cells
+    def __init__(self, zones, cellSize=None):
+        if cellSize is None:
+            cellSize = 0.05
+            radii = [rz.getRadius() for rz in zones if not rz.isPolygon()]
+            if len(radii) > 0:
+                cellSize = max(0.001, math.degrees(2 * float(np.median(radii)) / earthRadius))
+
+        self.cellSize = cellSize
+        self.cells = {}
+
+        ## Edge tables of the polygon RZ (id of the RZ -> table)
+        self.tables = {}
+
+        ## RZ too close to the poles or crossing the antimeridian are always tested
+        self.wide = []
+
+        for rz in zones:
+            self.putZone(rz)
+
+        ## Every cell also holds the wide RZ
+        for c in self.cells:
+            self.cells[c] = self.sortZones(self.cells[c] + self.wide)
+        self.wide = self.sortZones(self.wide)
+
+        ## Arrays of all circular RZ, and the positions of the RZ of each cell in these arrays
+        circles = [rz for rz in zones if not rz.isPolygon()]
+        self.la = np.array([rz.getLatitude() for rz in circles], dtype=float)
+        self.lo = np.array([rz.getLongitude() for rz in circles], dtype=float)
+        self.radius = np.array([rz.getRadius() for rz in circles], dtype=float)
+        self.risk = np.array([rz.getRZ() for rz in circles], dtype=float)
+
+        position = {id(rz): k for k, rz in enumerate(circles)}
+        self.cellPositions = {c: self.getPositions(self.cells[c], position) for c in self.cells}
+        self.widePositions = self.getPositions(self.wide, position)
+
+        ## Polygon RZ of each cell
+        self.cellPolygons = {c: [rz for rz in self.cells[c] if rz.isPolygon()] for c in self.cells}
+        self.widePolygons = [rz for rz in self.wide if rz.isPolygon()]
+
+    def getPositions(self, zones, position):
+        return np.array([position[id(rz)] for rz in zones if id(rz) in position], dtype=np.intp)
+
+    def sortZones(self, zones):
+        return sorted(zones, key=lambda rz: rz.getRZ(), reverse=True)
+
+    def cell(self, la, lo):
+        return (math.floor(la / self.cellSize), math.floor(lo / self.cellSize))
+
+    def putZone(self, rz):
+        if rz.isPolygon():
+            self.putPolygon(rz)
+            return
+
+        la = rz.getLatitude()
+        lo = rz.getLongitude()
+
+        ## Angular radius of the RZ (radians)
+        d = (rz.getRadius() / earthRadius) * margin
+
+        dla = math.degrees(d)
+        if abs(la) + dla >= 90:
+            self.wide.append(rz)
+            return
+
+        ## Largest longitude difference of a point of the circle
+        ratio = math.sin(d) / math.cos(math.radians(la))
+        if ratio >= 1:
+            self.wide.append(rz)
+            return
+        dlo = math.degrees(math.asin(ratio))
+        if abs(lo) + dlo >= 180:
+            self.wide.append(rz)
+            return
+
+        (minLa, minLo) = self.cell(la - dla, lo - dlo)
+        (maxLa, maxLo) = self.cell(la + dla, lo + dlo)
+        self.putCells(rz, minLa, minLo, maxLa, maxLo)
+
+    ## Polygon RZ are registered in the cells of their bounding box
+    ## (GeoJSON polygons do not cross the antimeridian, they are split in a multipolygon)
+    def putPolygon(self, rz):
+        self.tables[id(rz)] = polygonTable(rz.getPolygons())
+
+        (minLa, minLo, maxLa, maxLo) = computeBoundingBox(rz.getPolygons())
+        (minLa, minLo) = self.cell(minLa, minLo)
+        (maxLa, maxLo) = self.cell(maxLa, maxLo)
+        self.putCells(rz, minLa, minLo, maxLa, maxLo)
+
+    ## Register a RZ in a range of cells (or as a wide RZ, if the range is too large)
+    def putCells(self, rz, minLa, minLo, maxLa, maxLo):
+        if (maxLa - minLa + 1) * (maxLo - minLo + 1) > maxCells:
+            self.wide.append(rz)
+            return
+
+        for i in range(minLa, maxLa + 1):
+            for j in range(minLo, maxLo + 1):
+                self.cells.setdefault((i, j), []).append(rz)
+
+    ## Test of a position against a polygon RZ (the circular RZ are tested with the distance)
+    def containsPolygon(self, rz, la, lo):
+        return self.tables[id(rz)].contains(la, lo)
+
+    ## RZ that may contain the given position, sorted by decreasing risk
+    def getCandidates(self, la, lo):
+        return self.cells.get(self.cell(la, lo), self.wide)
+
+    ## Risk level of many positions at once (arrays of latitudes and longitudes)
+    ## The distances are computed, as arrays, between each position and the RZ of its cell
+    ## The positions tested against the same polygon RZ are tested together
+    def computeBatchRZ(self, las, los):
+        las = np.asarray(las, dtype=float)
+        los = np.asarray(los, dtype=float)
+        risk = np.zeros(len(las))
+
+        cells = [self.cell(la, lo) for la, lo in zip(las.tolist(), los.tolist())]
+
+        if len(self.tables) > 0:
+            owners = {}  # id of the RZ -> (RZ, positions)
+            for k, c in enumerate(cells):
+                for rz in self.cellPolygons.get(c, self.widePolygons):
+                    owners.setdefault(id(rz), (rz, []))[1].append(k)
+            for (rz, positions) in owners.values():
+                positions = np.array(positions, dtype=np.intp)
+                inside = self.tables[id(rz)].containsMany(las[positions], los[positions])
+                risk[positions[inside]] = np.maximum(risk[positions[inside]], rz.getRZ())
+
+        candidates = [self.cellPositions.get(c, self.widePositions) for c in cells]
+        counts = np.array([len(c) for c in candidates], dtype=np.intp)
+        if counts.sum() == 0:
+            return risk
+
+        ## One entry for each pair (position, candidate RZ)
+        zones = np.concatenate(candidates)
+        owner = np.repeat(np.arange(len(las)), counts)
+
+        distance = haversineDistance(las[owner], los[owner], self.la[zones], self.lo[zones])
+        inside = np.where(distance < self.radius[zones], self.risk[zones], 0.0)
+
+        ## Highest risk among the pairs of each position
+        np.maximum.at(risk, owner, inside)
+        return risk
+
+    def getNumberCells(self):
+        return len(self.cells)
+
+########################################################
+
+## Distances (km) between the positions (la, lo) and the RZ centers (zla, zlo), element by element
+## It is the same formula of the haversine lib, computed over arrays
+def haversineDistance(la, lo, zla, zlo):
+    la = np.radians(la)
+    lo = np.radians(lo)
+    zla = np.radians(zla)
+    zlo = np.radians(zlo)
+
+    d = np.sin((zla - la) * 0.5) ** 2 + np.cos(la) * np.cos(zla) * np.sin((zlo - lo) * 0.5) ** 2
+    return 2 * earthRadius * np.arcsin(np.sqrt(d))
@@ -0,0 +1,14 @@
+# *********************************************************************
+# The modules of the EPU import each other by name, as when epu.py runs
+# from its directory, and the shared package from the root of the repository
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import os
+import sys
+
+directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(directory))
+sys.path.insert(0, directory)
@@ -0,0 +1,91 @@
+# *********************************************************************
+# Tests of the table of active Emergency Alarms (alarmTable)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import itertools
+
+from alarmTable import alarmTable
+from elementsEPU import EA
+
+########################################################
+
+## Clock of the tests, moved by hand
+class fakeClock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def createEA(events, sl):
+    ea = EA(None, "Sat Oct 17 09:05:03 2026", 41.18, -8.6)
+    for y in events:
+        ea.putEvent(y)
+    ea.setSeverityLevel(sl)
+    return ea
+
+def createTable(timeout=180):
+    clock = fakeClock()
+    ids = itertools.count(1)
+    return (alarmTable(timeout, clock), clock, lambda: next(ids))
+
+def testRefreshesArePublishedOnlyWhenChanged():
+    (table, clock, newId) = createTable()
+
+    [ea] = table.update(7, createEA([1, 4], 50), newId)
+    assert (ea.getId(), ea.getState()) == (1, "active")
+
+    clock.now += 10
+    assert table.update(7, createEA([4, 1], 50), newId) == []
+
+    clock.now += 10
+    [refresh] = table.update(7, createEA([1, 4], 60), newId)
+    assert (refresh.getId(), refresh.getSeverityLevel()) == (1, 60)
+    assert table.isActive(7, [1, 4]) and table.getNumberAlarms() == 1
+
+def testActiveEAIsPublishedAgainEveryTimeout():
+    (table, clock, newId) = createTable(timeout=100)
+    table.update(7, createEA([1], 50), newId)
+
+    clock.now += 60
+    assert table.update(7, createEA([1], 50), newId) == []
+    clock.now += 50
+    assert [ea.getId() for ea in table.update(7, createEA([1], 50), newId)] == [1]
+
+def testNewEventsClearThePreviousEA():
+    (table, clock, newId) = createTable()
+    table.update(7, createEA([1], 50), newId)
+
+    [old, new] = table.update(7, createEA([1, 8], 70), newId)
+    assert (old.getId(), old.getState()) == (1, "cleared")
+    assert (new.getId(), new.getState()) == (2, "active")
+    assert not table.isActive(7, [1]) and table.isActive(7, [1, 8])
+
+def testSourcesKeyedWithoutEvents():
+    (table, clock, newId) = createTable()
+    table.update("cluster3", createEA([1], 50), newId, byEvents=False)
+
+    [ea] = table.update("cluster3", createEA([1, 4], 50), newId, byEvents=False)
+    assert ea.getId() == 1
+    assert table.isActive("cluster3", [16])
+
+    [cleared] = table.remove("cluster3")
+    assert (cleared.getId(), cleared.getState()) == (1, "cleared")
+    assert table.remove("cluster3") == []
+
+def testEAExpireWhenNotRefreshed():
+    (table, clock, newId) = createTable(timeout=100)
+    table.update(1, createEA([1], 50), newId)
+    clock.now += 60
+    table.update(2, createEA([1], 50), newId)
+
+    clock.now += 50
+    assert [ea.getId() for ea in table.expire()] == [1]
+    assert not table.isActive(1, [1]) and table.isActive(2, [1])
+
+    clock.now += 60
+    assert [(ea.getId(), ea.getState()) for ea in table.expire()] == [(2, "cleared")]
+    assert table.getNumberAlarms() == 0
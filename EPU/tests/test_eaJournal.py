@@ -0,0 +1,71 @@
+# *********************************************************************
+# Tests of the recovery of the journal of ER and EA (eaJournal)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import glob
+import os
+
+from eaJournal import eaJournal, readJournal
+from elementsEPU import EA
+
+########################################################
+
+def createEA(i, sl=50):
+    ea = EA(i, "Sat Oct 17 09:05:03 2026", 41.18, -8.6)
+    ea.putEvent(1)
+    ea.setSeverityLevel(sl)
+    return ea
+
+def testUnacknowledgedEAAreRecovered(tmp_path):
+    journal = eaJournal(str(tmp_path))
+    journal.putER(b'{"edu": 1}')
+    first = journal.putEA(createEA(1))
+    journal.putEA(createEA(2))
+    journal.putEA(createEA(2, sl=80))  # Refresh: replaces the previous version
+    journal.putAck(first)
+    journal.close()
+
+    (lastId, lastSequence, pending) = readJournal(str(tmp_path))
+    assert (lastId, lastSequence) == (2, 3)
+    assert [(ea["id"], ea["sl"]) for ea in pending.values()] == [(2, 80)]
+
+    journal = eaJournal(str(tmp_path))
+    assert journal.getLastId() == 2
+    assert [s for (s, ea) in journal.getRecovered()] == [3]
+    assert journal.putEA(createEA(3)) == 4
+    journal.close()
+
+def testInterruptedRecordEndsTheJournal(tmp_path):
+    journal = eaJournal(str(tmp_path))
+    journal.putEA(createEA(1))
+    journal.putEA(createEA(2))
+    journal.close()
+
+    ## A crash in the middle of the last record: its crc does not match
+    [name] = glob.glob(os.path.join(str(tmp_path), "journal-*.log"))
+    with open(name, "r+b") as f:
+        data = f.read()
+        end = data.rindex(b"}")
+        f.seek(end - 3)
+        f.write(b"###")
+
+    (lastId, lastSequence, pending) = readJournal(str(tmp_path))
+    assert (lastId, list(pending)) == (1, [1])
+
+def testSegmentsCarryTheStateAndAreBounded(tmp_path):
+    journal = eaJournal(str(tmp_path), segmentSize=4096, maxSegments=2)
+    for i in range(1, 200):
+        journal.putEA(createEA(i))
+    journal.putAck(1)
+    journal.close()
+
+    assert len(glob.glob(os.path.join(str(tmp_path), "journal-*.log"))) == 2
+    assert journal.size > 4096  # Enlarged for the unacknowledged EA
+    assert journal.errors == 0
+
+    (lastId, lastSequence, pending) = readJournal(str(tmp_path))
+    assert (lastId, lastSequence) == (199, 199)
+    assert sorted(pending) == list(range(2, 200))
@@ -0,0 +1,89 @@
+# *********************************************************************
+# Tests of the correlation of neighbouring ER (erCorrelator)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+from erCorrelator import erCorrelator, erCluster
+
+########################################################
+
+## Clock of the tests, moved by hand
+class fakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+## About 0.0066 degrees of longitude at latitude 41 is 0.55 km
+la = 41.0
+step = 0.004  # About 0.34 km
+
+def testNeighboursWithCommonEventsAreCorrelated():
+    correlator = erCorrelator(0.5, 120)
+
+    ((a, _, _, _, _, n), absorbed) = correlator.add(1, la, -8.0, [1, 4], 5, now=0)
+    assert n == 1 and absorbed == []
+
+    ((b, cla, clo, events, context, n), _) = correlator.add(2, la, -8.0 + step, [4, 8], 7, now=1)
+    assert b == a and n == 2
+    assert events == [1, 4, 8] and context == 7
+    assert abs(clo - (-8.0 + step / 2)) < 1e-9
+
+    ## Far away, or without common events
+    assert correlator.add(3, la, -7.9, [1], 5, now=2)[0][0] != a
+    assert correlator.add(4, la, -8.0 - step, [16], 5, now=3)[0][0] != a
+
+def testClustersAreMergedAndCleared():
+    correlator = erCorrelator(0.5, 120, fakeClock())
+    first = correlator.add(1, la, -8.0, [1], 5)[0][0]
+    second = correlator.add(2, la, -8.0 + 2 * step, [1], 9)[0][0]
+    assert first != second
+    absorbedCluster = correlator.latest[2].cluster
+
+    ## An ER between them links the two clusters: the oldest one absorbs the other
+    ((merged, _, _, _, context, n), absorbed) = correlator.add(3, la, -8.0 + step, [1], 3)
+    assert (merged, absorbed, n, context) == (first, [second], 3, 9)
+    assert correlator.getCluster(2, [1]) == first
+
+    ## The absorbed cluster keeps no ER
+    assert absorbedCluster.members == {} and absorbedCluster.contexts == []
+    assert absorbedCluster.find().id == first
+
+def testMergeMovesTheSmallerCluster():
+    large = erCluster(1)
+    small = erCluster(2)
+    correlator = erCorrelator(0.5, 120)
+    for k in range(3):
+        correlator.add(k, la + k * 0.01, -8.0, [1], k, now=k)
+    for edu in range(3):
+        point = correlator.latest[edu]
+        point.cluster.find().removePoint(point)
+        (large if edu > 0 else small).putPoint(point)
+
+    correlator.merge(small, large)
+    assert small.getNumberEDU() == 3 and small.getContext() == 2
+    assert large.members == {} and large.contexts == [] and (large.sumLa, large.sumLo) == (0.0, 0.0)
+    assert large.find() is small
+
+def testERExpireAfterTheWindow():
+    clock = fakeClock()
+    correlator = erCorrelator(0.5, 120, clock)
+    cluster = correlator.add(1, la, -8.0, [1], 5)[0][0]
+    assert correlator.getCluster(1, [1]) == cluster
+
+    clock.now = 200
+    assert correlator.getCluster(1, [1]) is None
+    ((other, _, _, _, _, n), _) = correlator.add(2, la, -8.0 + step, [1], 5)
+    assert other != cluster and n == 1
+    assert correlator.getNumberEDU() == 1
+
+def testRefreshKeepsTheEDUInItsCluster():
+    correlator = erCorrelator(0.5, 120)
+    cluster = correlator.add(1, la, -8.0, [1, 4], 5, now=0)[0][0]
+    correlator.add(2, la, -8.0 + step, [4], 5, now=1)
+
+    ((same, _, _, events, _, n), _) = correlator.add(1, la, -8.0, [1, 4], 6, now=2)
+    assert (same, n, events) == (cluster, 2, [1, 4])
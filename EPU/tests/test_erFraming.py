@@ -0,0 +1,50 @@
+# *********************************************************************
+# Tests of the framing of persistent connections (erFraming)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import random
+
+import pytest
+
+from erFraming import frameDecoder, encodeFrame, encodeBusy, HEADER
+
+########################################################
+
+def testFramesSplitAnywhere():
+    payloads = [b"{}", b"x" * 1000, b"", b"\xca\x01\x01" + bytes(30), b"last"]
+    stream = b"".join(encodeFrame(p) for p in payloads)
+
+    rng = random.Random(5)
+    for _ in range(20):
+        decoder = frameDecoder()
+        frames = []
+        position = 0
+        while position < len(stream):
+            step = rng.randint(1, 64)
+            frames.extend(decoder.feed(stream[position:position + step]))
+            position = position + step
+
+        ## Keep-alive frames (length 0) carry no ER
+        assert frames == [p for p in payloads if p]
+        assert decoder.pending() == 0
+
+def testIncompleteFrameIsPending():
+    decoder = frameDecoder()
+    data = encodeFrame(b"abcdef")
+
+    assert decoder.feed(data[:-2]) == []
+    assert decoder.pending() == len(data) - 2
+    assert decoder.feed(data[-2:]) == [b"abcdef"]
+
+def testOversizedFrameIsRefused():
+    decoder = frameDecoder(limit=16)
+    assert decoder.feed(encodeFrame(b"a" * 16)) == [b"a" * 16]
+    with pytest.raises(ValueError):
+        decoder.feed(HEADER.pack(17))
+
+def testBusyReplies():
+    assert encodeBusy(3) == b"BUSY 3"
+    assert encodeBusy(2.7, 41) == b"BUSY 2 41"
@@ -0,0 +1,82 @@
+# *********************************************************************
+# Tests of the polygon Risk Zones (geoZones): GeoJSON files and edge tables
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import json
+import random
+
+import numpy as np
+import pytest
+
+from geoZones import loadGeoJSON, polygonTable
+
+########################################################
+
+## Square of side 1 (degrees) with a hole of side 0.5 in its center. Coordinates are (longitude, latitude)
+square = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+hole = [(0.25, 0.25), (0.75, 0.25), (0.75, 0.75), (0.25, 0.75), (0.25, 0.25)]
+
+## Even-odd test of a position against the rings, edge by edge
+def evenOdd(rings, la, lo):
+    inside = False
+    for ring in rings:
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+            if (y1 > la) != (y2 > la) and lo < x1 + (la - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+    return inside
+
+def writeFile(tmp_path, data):
+    path = tmp_path / "zones.geojson"
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def testHolesAreOutside():
+    table = polygonTable([[square, hole]])
+
+    assert table.contains(0.1, 0.1)
+    assert not table.contains(0.5, 0.5)
+    assert not table.contains(1.5, 0.5)
+    assert table.containsMany([0.1, 0.5, 1.5, 0.9], [0.1, 0.5, 0.5, 0.9]).tolist() == [True, False, False, True]
+
+def testTableMatchesEvenOdd():
+    rng = random.Random(3)
+    ring = []
+    for k in range(200):
+        angle = 2 * np.pi * k / 200
+        r = rng.uniform(0.5, 1.0)
+        ring.append((r * np.cos(angle), r * np.sin(angle)))
+    table = polygonTable([[ring]])
+    assert table.numberBands > 1
+
+    las = [rng.uniform(-1.1, 1.1) for _ in range(2000)]
+    los = [rng.uniform(-1.1, 1.1) for _ in range(2000)]
+    expected = [evenOdd([ring], la, lo) for la, lo in zip(las, los)]
+
+    assert [table.contains(la, lo) for la, lo in zip(las, los)] == expected
+    assert table.containsMany(las, los).tolist() == expected
+
+def testLoadFeatureCollection(tmp_path):
+    data = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"id": "park", "risk": 3}, "geometry": {"type": "Polygon", "coordinates": [square, hole]}},
+        {"type": "Feature", "properties": {"risk": 2, "radius": 1.5}, "geometry": {"type": "Point", "coordinates": [-8.6, 41.18]}}]}
+    zones = loadGeoJSON(writeFile(tmp_path, data))
+
+    assert [rz.getId() for rz in zones] == ["park", 2]
+    assert zones[0].isPolygon() and zones[0].getRZ() == 3
+    assert not zones[1].isPolygon()
+    assert (zones[1].getLatitude(), zones[1].getLongitude(), zones[1].getRadius()) == (41.18, -8.6, 1.5)
+
+@pytest.mark.parametrize("data", [
+    [],
+    {"type": "FeatureCollection", "features": [1]},
+    {"type": "FeatureCollection", "features": {}},
+    {"type": "Feature", "properties": {"risk": 1}, "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}},
+    {"type": "Feature", "properties": {"risk": 1}, "geometry": {"type": "Point", "coordinates": [0, 0]}},
+    {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [square]}},
+    {"type": "Feature", "properties": {"risk": 1}, "geometry": {"type": "Polygon", "coordinates": [[(0, 0), (1, 1)]]}}])
+def testInvalidFilesRaiseValueError(tmp_path, data):
+    with pytest.raises(ValueError):
+        loadGeoJSON(writeFile(tmp_path, data))
@@ -0,0 +1,67 @@
+# *********************************************************************
+# Tests of the spatial index of the Risk Zones (riskIndex)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import random
+
+import haversine
+import numpy as np
+
+import riskIndex as ri
+from elementsEPU import RiskZone
+
+########################################################
+
+## rz of a position testing every RZ, as the EPU did before the index
+def bruteForce(zones, la, lo):
+    risk = 0
+    for rz in zones:
+        if haversine.haversine((la, lo), (rz.getLatitude(), rz.getLongitude())) < rz.getRadius():
+            risk = max(risk, rz.getRZ())
+    return risk
+
+def testCandidatesAreSortedByRisk():
+    zones = [RiskZone(1, 41.18, -8.60, 2.0, 2), RiskZone(2, 41.18, -8.60, 1.0, 5), RiskZone(3, -12.0, -38.9, 1.0, 3)]
+    index = ri.riskIndex(zones)
+
+    candidates = index.getCandidates(41.18, -8.60)
+    assert [rz.getId() for rz in candidates] == [2, 1]
+    assert index.getCandidates(0.0, 0.0) == []
+
+def testBatchMatchesBruteForce():
+    rng = random.Random(7)
+    zones = [RiskZone(k, 41 + rng.uniform(0, 0.5), -8.6 + rng.uniform(0, 0.5), rng.uniform(0.2, 5), rng.randint(1, 5)) for k in range(60)]
+    index = ri.riskIndex(zones)
+
+    las = [41 + rng.uniform(-0.1, 0.6) for _ in range(500)]
+    los = [-8.6 + rng.uniform(-0.1, 0.6) for _ in range(500)]
+    expected = [bruteForce(zones, la, lo) for la, lo in zip(las, los)]
+
+    assert index.computeBatchRZ(np.array(las), np.array(los)).tolist() == expected
+    for la, lo, risk in zip(las, los, expected):
+        best = 0
+        for rz in index.getCandidates(la, lo):
+            if haversine.haversine((la, lo), (rz.getLatitude(), rz.getLongitude())) < rz.getRadius():
+                best = rz.getRZ()
+                break
+        assert best == risk
+
+def testLargeZonesAreWide(monkeypatch):
+    monkeypatch.setattr(ri, "maxCells", 100)
+    large = RiskZone(1, 41.0, -8.0, 200.0, 1)
+    index = ri.riskIndex([large, RiskZone(2, 41.0, -8.0, 1.0, 4)], cellSize=0.01)
+
+    assert index.wide == [large]
+    assert index.getNumberCells() <= 100
+    assert [rz.getId() for rz in index.getCandidates(41.0, -8.0)] == [2, 1]
+    assert [rz.getId() for rz in index.getCandidates(42.0, -8.0)] == [1]
+
+def testZonesNearThePoleAreWide():
+    polar = RiskZone(1, 89.99, 0.0, 5.0, 3)
+    index = ri.riskIndex([polar])
+
+    assert index.wide == [polar]
+    assert index.computeBatchRZ(np.array([89.99, 0.0]), np.array([10.0, 0.0])).tolist() == [3.0, 0.0]
@@ -0,0 +1,10 @@
+# *********************************************************************
+# Shared model of CityAlarm, used by the EDU, the EPU and the EACs
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+from cityalarm.elements import ER, EA, RiskZone, GPS
+from cityalarm.elements import erFromDict, eaFromDict, erFromBinary, eaFromBinary, isBinary
+from cityalarm.geohash import encodeGeohash, geohashSubtopic, geohashTopic, coverBox, boxTopics
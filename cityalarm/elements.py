@@ -0,0 +1,302 @@
+# *********************************************************************
+# Classes shared by the EDU, the EPU and the EACs
+# They model the concepts of Events Report, Emergency Alarm and Risk Zone
+# The classes use __slots__ and flat coordinates, since EPU and EACs may keep
+# many of them in memory, and are converted directly to and from dicts (JSON)
+# and the compact binary format
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import json
+import struct
+import datetime
+
+########################################################
+
+## Models an Events Report
+class ER:
+    __slots__ = ("edu", "id", "timestamp", "la", "lo", "events", "received")
+
+    def __init__(self, u, i, ts, latitude, longitude):
+        self.edu = u
+        self.id = i
+        self.timestamp = ts
+        self.la = latitude
+        self.lo = longitude
+        self.events = []  # array of integers (types of detected events)
+        self.received = None  # Time at which the EPU received the ER (not transmitted)
+
+    def putEvent(self, y):
+        self.events.append(y)
+
+    ## Name used by the EDU
+    def putEventType(self, y):
+        self.events.append(y)
+
+    def getEDU(self):
+        return self.edu
+
+    def getId(self):
+        return self.id
+
+    def getEventsTypes (self):
+        return self.events
+
+    def getTimestamp (self):
+        return self.timestamp
+
+    def setReceived(self, t):
+        self.received = t
+
+    def getReceived(self):
+        return self.received
+
+    def getLatitude (self):
+        return self.la
+
+    def getLongitude (self):
+        return self.lo
+
+    def getNumberEI(self):
+        return len(self.events)  # Number of EI in the ER
+
+    def printTypes(self):
+        print ("ER with the following EI types:")
+        for y in self.events:
+            print ("Type:",  y)
+
+    def printValues(self):
+        for y in self.events:
+            print ("Type =",  y)
+
+    def toDict(self):
+        return {"edu": self.edu, "events": self.events, "gps": {"la": self.la, "lo": self.lo}, "id": self.id, "timestamp": self.timestamp}
+
+    def toJSON(self):
+        return json.dumps(self.toDict(), sort_keys=True, indent=4)
+
+    ## Compact binary format. Raises ValueError if the ER can not be represented in it
+    def toBinary(self):
+        try:
+            return BINARY_ER.pack(BINARY_MARK, BINARY_VERSION, KIND_ER, int(self.edu), self.id, *packTimestamp(self.timestamp), \
+                                  packCoordinate(self.la), packCoordinate(self.lo), packEvents(self.events))
+        except struct.error as e:
+            raise ValueError(str(e))
+
+########################################################
+
+## Definition of an Emergency Alarm
+class EA:
+    __slots__ = ("id", "timestamp", "la", "lo", "events", "sl", "state")
+
+    def __init__(self, i, ts, latitude, longitude, state="active"):
+        self.id = i
+        self.timestamp = ts
+        self.la = latitude
+        self.lo = longitude
+        self.events = []
+        self.sl = 0
+        self.state = state  # "active", "cleared" when the EA is no longer being reported, or None if unknown
+
+    def getLatitude (self):
+        return self.la
+
+    def getLongitude (self):
+        return self.lo
+
+    def getTimestamp (self):
+        return self.timestamp
+
+    def putEvent(self, y):
+        self.events.append(y)
+
+    def getEventsTypes (self):
+        return self.events
+
+    def setSeverityLevel(self, sev):
+        self.sl = sev
+
+    def getSeverityLevel (self):
+        return self.sl
+
+    def getId(self):
+        return self.id
+
+    def setId(self, i):
+        self.id = i
+
+    def setCleared(self):
+        self.state = "cleared"
+
+    def setState(self, state):
+        self.state = state
+
+    def getState(self):
+        return self.state
+
+    def printValues(self):
+        print ("EA id:",self.id,", Timestamp:",self.timestamp,", Latitude:",self.la,", Longitude:",self.lo, " SL:", self.sl, " State:", self.state)
+        print ("This EA has the following EI types:")
+        for e in self.events:
+            print ("Type:",e)
+
+    def toDict(self):
+        return {"events": self.events, "gps": {"la": self.la, "lo": self.lo}, "id": self.id, "sl": self.sl, "state": self.state, "timestamp": self.timestamp}
+
+    def toJSON(self):
+        return json.dumps(self.toDict(), sort_keys=True, indent=4)
+
+    ## Compact binary format. Raises ValueError if the EA can not be represented in it
+    def toBinary(self):
+        try:
+            return BINARY_EA.pack(BINARY_MARK, BINARY_VERSION, KIND_EA, self.id, *packTimestamp(self.timestamp), \
+                                  packCoordinate(self.la), packCoordinate(self.lo), packEvents(self.events), \
+                                  max(0, min(255, int(self.sl))), binaryStates.get(self.state, 0))
+        except struct.error as e:
+            raise ValueError(str(e))
+
+########################################################
+
+class RiskZone:
+    __slots__ = ("id", "la", "lo", "dz", "rz", "polygons")
+
+    ## Basic definitions of the risk zones
+    ## A RZ is a circle (center and radius in km) or a list of polygons (multipolygon)
+    ## Each polygon is a list of rings (the first is the exterior, the others are holes)
+    ## and each ring is a list of (longitude, latitude), as in GeoJSON. For polygons, the
+    ## center and radius are those of a circle around the bounding box of the RZ
+    def __init__(self, i, latitude, longitude, radius, risk, polygons=None):
+        self.id = i
+        self.la = latitude
+        self.lo = longitude
+        self.dz = radius
+        self.rz = risk
+        self.polygons = polygons
+
+    def isPolygon(self):
+        return self.polygons is not None
+
+    def getPolygons(self):
+        return self.polygons
+
+    def getId(self):
+        return self.id
+
+    def getRZ(self):
+        return self.rz
+
+    def getLatitude (self):
+        return self.la
+
+    def getLongitude (self):
+        return self.lo
+
+    def getRadius(self):
+        return self.dz
+
+    def printValues(self):
+        if self.polygons is not None:
+            print ("Polygons:",len(self.polygons),", Latitude:",self.la,", Longitude:",self.lo,", Risk level:",self.rz)
+        else:
+            print ("Latitude:",self.la,", Longitude:",self.lo,", Radius",self.dz,", Risk level:",self.rz)
+
+########################################################
+
+## A position (used, for example, as the center of the maps of the EACs)
+class GPS:
+    __slots__ = ("la", "lo")
+
+    def __init__(self, latitude, longitude):
+        self.la = latitude
+        self.lo = longitude
+
+########################################################
+
+## ER from its dict (JSON) representation. Raises KeyError or TypeError if it is not valid
+def erFromDict(d):
+    er = ER(d["edu"], d["id"], d["timestamp"], d["gps"]["la"], d["gps"]["lo"])
+    er.events = list(d["events"])
+    return er
+
+## EA from its dict (JSON) representation. The state is None for EA of older EPUs
+def eaFromDict(d):
+    ea = EA(d["id"], d["timestamp"], d["gps"]["la"], d["gps"]["lo"], d.get("state"))
+    ea.events = list(d["events"])
+    ea.sl = d["sl"]
+    return ea
+
+########################################################
+
+## Compact binary format of ER and EA (version 1), an alternative to JSON
+## [mark, version, kind] + fixed fields; the timestamp (time.ctime) is sent as its
+## fields, the coordinates in 1e-7 degrees and the events as a bitmask (types 1 to 32)
+BINARY_MARK = 0xCA  # Never the first byte of a JSON document
+BINARY_VERSION = 1
+KIND_ER = 1
+KIND_EA = 2
+BINARY_HEADER = struct.Struct(">BBB")
+BINARY_ER = struct.Struct(">BBBIIHBBBBBiiI")    # header, edu, id, timestamp, la, lo, events
+BINARY_EA = struct.Struct(">BBBIHBBBBBiiIBB")   # header, id, timestamp, la, lo, events, sl, state
+binaryStates = {"active": 0, "cleared": 1, None: 2}  # None: the EA is not tracked by the EPU
+
+months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+weekdays = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def isBinary(data):
+    return len(data) >= BINARY_HEADER.size and data[0] == BINARY_MARK
+
+## "Wed Oct 14 16:01:40 2026" -> (2026, 10, 14, 16, 1, 40)
+def packTimestamp(ts):
+    (wd, mon, day, hms, year) = ts.split()
+    (h, m, s) = hms.split(":")
+    return (int(year), months.index(mon) + 1, int(day), int(h), int(m), int(s))
+
+def unpackTimestamp(year, mon, day, h, m, s):
+    wd = weekdays[datetime.date(year, mon, day).weekday()]
+    return "%s %s %2d %02d:%02d:%02d %d" % (wd, months[mon - 1], day, h, m, s, year)
+
+def packEvents(events):
+    mask = 0
+    for y in events:
+        if not 1 <= y <= 32:
+            raise ValueError("Event type " + str(y) + " can not be sent in the binary format")
+        mask = mask | (1 << (y - 1))
+    return mask
+
+def unpackEvents(mask):
+    return [y for y in range(1, 33) if mask & (1 << (y - 1))]
+
+def packCoordinate(c):
+    return int(round(c * 1e7))
+
+def unpackCoordinate(c):
+    return round(c / 1e7, 7)
+
+## ER from the compact binary format. Raises ValueError if the data is not a valid ER
+def erFromBinary(data):
+    try:
+        (mark, version, kind, edu, i, year, mon, day, h, m, s, la, lo, events) = BINARY_ER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(str(e))
+    if mark != BINARY_MARK or version != BINARY_VERSION or kind != KIND_ER:
+        raise ValueError("Unknown binary format")
+
+    er = ER(edu, i, unpackTimestamp(year, mon, day, h, m, s), unpackCoordinate(la), unpackCoordinate(lo))
+    er.events = unpackEvents(events)
+    return er
+
+## EA from the compact binary format. Raises ValueError if the data is not a valid EA
+def eaFromBinary(data):
+    try:
+        (mark, version, kind, i, year, mon, day, h, m, s, la, lo, events, sl, state) = BINARY_EA.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(str(e))
+    if mark != BINARY_MARK or version != BINARY_VERSION or kind != KIND_EA:
+        raise ValueError("Unknown binary format")
+
+    ea = EA(i, unpackTimestamp(year, mon, day, h, m, s), unpackCoordinate(la), unpackCoordinate(lo), {v: k for k, v in binaryStates.items()}.get(state))
+    ea.events = unpackEvents(events)
+    ea.sl = sl
+    return ea
@@ -0,0 +1,173 @@
+# *********************************************************************
+# Structured log of the CityAlarm components
+# Records (time, level, subsystem, event and fields) are appended to an
+# in-memory ring buffer (a bounded deque, whose append is atomic, so no
+# lock is taken by the threads that log) and a background thread writes
+# them as JSON lines. Fields are only formatted by the writer
+# Each subsystem has its own level, and the logs of each message (ER, EA)
+# can be sampled (1 of every N), so tracing stays on in production
+# When the writer falls behind, the oldest records are overwritten
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import atexit
+import collections
+import datetime
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+########################################################
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+levelNames = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+levelValues = {name: level for (level, name) in levelNames.items()}
+
+## Records waiting for the writer
+capacity = 65536
+ring = collections.deque(maxlen=capacity)
+
+## Level and sampling of each subsystem ("*" is the default)
+settings = {"*": (INFO, 1)}
+loggers = {}
+
+## Where the records are written (None is the current standard output), and how often (s)
+stream = None
+interval = 0.05
+
+writer = None
+lockWriter = threading.Lock()
+
+########################################################
+
+class subsystemLog():
+    def __init__(self, name):
+        self.name = name
+        self.counters = {}  # event -> count of its traces (sampling)
+        self.configure()
+
+    def configure(self):
+        (self.level, self.sampling) = settings.get(self.name, settings["*"])
+
+    def isEnabled(self, level):
+        return level >= self.level
+
+    def debug(self, event, **fields):
+        if DEBUG >= self.level:
+            putRecord(DEBUG, self.name, event, fields)
+
+    def info(self, event, **fields):
+        if INFO >= self.level:
+            putRecord(INFO, self.name, event, fields)
+
+    def warning(self, event, **fields):
+        if WARNING >= self.level:
+            putRecord(WARNING, self.name, event, fields)
+
+    def error(self, event, **fields):
+        if ERROR >= self.level:
+            putRecord(ERROR, self.name, event, fields)
+
+    ## Debug log of each message (ER, EA): only 1 of every sampling of each event is kept
+    def trace(self, event, **fields):
+        if DEBUG >= self.level:
+            counter = self.counters.get(event)
+            if counter is None:
+                counter = self.counters.setdefault(event, itertools.count())
+            if next(counter) % self.sampling == 0:
+                putRecord(DEBUG, self.name, event, fields)
+
+########################################################
+
+## The log of a subsystem (ingest, rz, publish, ...)
+def getLogger(name):
+    logger = loggers.get(name)
+    if logger is None:
+        logger = loggers.setdefault(name, subsystemLog(name))
+    return logger
+
+## spec: subsystem=level[:sampling], separated by commas. For example, "*=info,ingest=debug:100"
+## With debug, the default level is debug. path is the file of the records (None is the standard output)
+def configureLog(spec=None, debug=False, path=None):
+    global stream
+
+    if debug:
+        settings["*"] = (DEBUG, 1)
+
+    if spec:
+        for item in spec.split(","):
+            (name, value) = item.split("=")
+            (level, _, sampling) = value.partition(":")
+            if level not in levelValues:
+                raise ValueError("Unknown log level: " + level)
+            settings[name.strip()] = (levelValues[level], max(1, int(sampling or 1)))
+
+    if path is not None:
+        stream = open(path, "a", buffering=1024 * 1024)
+
+    for logger in loggers.values():
+        logger.configure()
+
+########################################################
+
+def putRecord(level, subsystem, event, fields):
+    ring.append((time.time(), level, subsystem, event, fields))
+    if writer is None:
+        startWriter()
+
+def formatRecord(record):
+    (t, level, subsystem, event, fields) = record
+    line = {"time": datetime.datetime.fromtimestamp(t).isoformat(timespec="microseconds"),
+            "level": levelNames[level], "subsystem": subsystem, "event": event}
+    line.update(fields)
+    return json.dumps(line, default=str)
+
+## Write all records in the ring buffer
+def drain():
+    lines = []
+    while True:
+        try:
+            lines.append(formatRecord(ring.popleft()))
+        except IndexError:
+            break
+
+    if len(lines) > 0:
+        output = stream if stream is not None else sys.stdout
+        output.write("\n".join(lines) + "\n")
+        output.flush()
+
+class logWriter(threading.Thread):
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+
+    def run(self):
+        while True:
+            time.sleep(interval)
+            drain()
+
+def startWriter():
+    global writer
+
+    with lockWriter:
+        if writer is None:
+            writer = logWriter()
+            writer.start()
+            ## The last records are written when the component exits
+            atexit.register(drain)
+
+## A forked process (EPU workers) starts its own writer
+def resetWriter():
+    global writer, lockWriter
+
+    writer = None
+    lockWriter = threading.Lock()
+
+os.register_at_fork(after_in_child=resetWriter)
@@ -0,0 +1,92 @@
+# *********************************************************************
+# Geohash of positions, used to partition the MQTT topics of the EA
+# The EPU publishes each EA in the subtopic "geo" of its topic, with one
+# level for each character of the geohash of the EA position (for example,
+# CityAlarm_EPU1/geo/e/z/3/f/x), so an EAC subscribes only to the cells
+# covering its area of interest (CityAlarm_EPU1/geo/e/z/3/#)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import math
+
+########################################################
+
+## Characters of the geohash (base 32)
+alphabet = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+########################################################
+
+## Geohash of a position with the given number of characters
+def encodeGeohash(la, lo, precision):
+    minLa, maxLa = -90.0, 90.0
+    minLo, maxLo = -180.0, 180.0
+
+    geohash = ""
+    value = 0
+    bits = 0
+    even = True  # Bits alternate between longitude and latitude, starting with longitude
+    while len(geohash) < precision:
+        if even:
+            middle = (minLo + maxLo) / 2
+            if lo >= middle:
+                value = (value << 1) | 1
+                minLo = middle
+            else:
+                value = value << 1
+                maxLo = middle
+        else:
+            middle = (minLa + maxLa) / 2
+            if la >= middle:
+                value = (value << 1) | 1
+                minLa = middle
+            else:
+                value = value << 1
+                maxLa = middle
+        even = not even
+
+        bits = bits + 1
+        if bits == 5:
+            geohash = geohash + alphabet[value]
+            value = 0
+            bits = 0
+
+    return geohash
+
+## Size (degrees of latitude, degrees of longitude) of the cells of a precision
+def getCellSize(precision):
+    bits = 5 * precision
+    return (180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2))
+
+## Subtopic of a position: geo/c/h/a/r/s
+def geohashSubtopic(la, lo, precision):
+    return "geo/" + "/".join(encodeGeohash(la, lo, precision))
+
+def geohashTopic(topic, la, lo, precision):
+    return topic + "/" + geohashSubtopic(la, lo, precision)
+
+########################################################
+
+## Geohashes covering a bounding box, with the largest precision (up to the given one)
+## for which at most maxCells cells are needed
+def coverBox(la1, lo1, la2, lo2, precision, maxCells=32):
+    (la1, la2) = (max(-90.0, min(la1, la2)), min(90.0, max(la1, la2)))
+    (lo1, lo2) = (max(-180.0, min(lo1, lo2)), min(180.0, max(lo1, lo2)))
+
+    cells = [""]
+    for p in range(1, precision + 1):
+        (height, width) = getCellSize(p)
+        rows = range(math.floor((la1 + 90) / height), math.floor((min(la2, 89.999999) + 90) / height) + 1)
+        columns = range(math.floor((lo1 + 180) / width), math.floor((min(lo2, 179.999999) + 180) / width) + 1)
+        if len(rows) * len(columns) > maxCells:
+            break
+
+        ## The geohash of the center of each cell
+        cells = [encodeGeohash((i + 0.5) * height - 90, (j + 0.5) * width - 180, p) for i in rows for j in columns]
+
+    return cells
+
+## Topic filters of the EA of a bounding box
+def boxTopics(topic, la1, lo1, la2, lo2, precision, maxCells=32):
+    return [(topic + "/geo/" + "/".join(cell)).rstrip("/") + "/#" for cell in coverBox(la1, lo1, la2, lo2, precision, maxCells)]
@@ -0,0 +1,69 @@
+# *********************************************************************
+# Tests of the compact binary format of ER and EA (cityalarm.elements)
+# Author      : Daniel G. Costa
+# E-mail      : danielgcosta@uefs.br
+# Date        : 2026/10/18
+# *********************************************************************
+
+import json
+import time
+
+import pytest
+
+from cityalarm.elements import ER, EA, erFromBinary, eaFromBinary, isBinary, BINARY_ER, BINARY_EA
+
+########################################################
+
+timestamp = "Sat Oct 17 09:05:03 2026"
+
+def testERRoundTrip():
+    er = ER(42, 7, timestamp, -12.2664523, -38.9663381)
+    for y in (1, 4, 32):
+        er.putEventType(y)
+
+    data = er.toBinary()
+    assert isBinary(data) and len(data) == BINARY_ER.size
+
+    decoded = erFromBinary(data)
+    assert (decoded.getEDU(), decoded.getId(), decoded.getTimestamp()) == (42, 7, timestamp)
+    assert (decoded.getLatitude(), decoded.getLongitude()) == (-12.2664523, -38.9663381)
+    assert decoded.getEventsTypes() == [1, 4, 32]
+
+@pytest.mark.parametrize("state", ["active", "cleared", None])
+def testEARoundTrip(state):
+    ea = EA(1234, timestamp, 41.1579, -8.6291, state)
+    ea.putEvent(3)
+    ea.putEvent(8)
+    ea.setSeverityLevel(87)
+
+    data = ea.toBinary()
+    assert isBinary(data) and len(data) == BINARY_EA.size
+
+    decoded = eaFromBinary(data)
+    assert (decoded.getId(), decoded.getTimestamp(), decoded.getSeverityLevel(), decoded.getState()) == (1234, timestamp, 87, state)
+    assert (decoded.getLatitude(), decoded.getLongitude()) == (41.1579, -8.6291)
+    assert decoded.getEventsTypes() == [3, 8]
+
+def testTimestampOfTheDayIsKept():
+    now = time.ctime()
+    assert erFromBinary(ER(1, 1, now, 0.0, 0.0).toBinary()).getTimestamp() == now
+
+def testJSONIsNotBinary():
+    er = ER(1, 1, timestamp, 0.0, 0.0)
+    assert not isBinary(er.toJSON().encode())
+    assert json.loads(er.toJSON())["edu"] == 1
+
+def testEventsOutOfRangeAreRefused():
+    er = ER(1, 1, timestamp, 0.0, 0.0)
+    er.putEventType(33)
+    with pytest.raises(ValueError):
+        er.toBinary()
+
+def testInvalidDataRaiseValueError():
+    data = ER(1, 1, timestamp, 0.0, 0.0).toBinary()
+    with pytest.raises(ValueError):
+        erFromBinary(data[:-1])
+    with pytest.raises(ValueError):
+        eaFromBinary(data)
+    with pytest.raises(ValueError):
+        erFromBinary(data[:1] + b"\x09" + data[2:])